@@ -0,0 +1,153 @@
+"""
+Risk Alerting with Hysteresis
+Turns streams of disease risk scores per field into de-duplicated level-change events.
+Levels use the interpret_risk cut points, with hysteresis bands and minimum dwell times
+so that a score oscillating around a threshold does not cause alert storms.
+"""
+
+import numpy as np
+from knowledge.batch_inference import RISK_LEVELS
+
+
+DEFAULT_ALERT_CONFIG = {
+    'thresholds': (0.4, 0.6),   # Entry thresholds for Moderate and High (as interpret_risk)
+    'hysteresis': 0.05,         # A level is kept until the score drops this far below its threshold
+    'min_dwell': 2,             # Consecutive ticks a new level must persist before it is committed
+    'cooldown': 6,              # Minimum ticks between two events for the same field and disease
+}
+
+# Structured dtype of the events returned by RiskAlertTracker.update
+EVENT_DTYPE = np.dtype([
+    ('field', np.int64),
+    ('disease', np.int16),
+    ('from_level', np.int8),
+    ('to_level', np.int8),
+    ('tick', np.int64),
+])
+
+
+class RiskAlertTracker:
+    """
+    Per-field, per-disease alert state kept in compact arrays.
+
+    State is one (n_fields, n_diseases) array per quantity, so a tick over the
+    whole fleet is a handful of vectorized NumPy operations.
+
+    Args:
+        n_fields: Number of tracked fields (fields are addressed by index)
+        diseases: Disease names (columns of the score matrices)
+        config: Overrides for DEFAULT_ALERT_CONFIG
+    """
+
+    def __init__(self, n_fields, diseases, config=None):
+        self.diseases = list(diseases)
+        self.config = dict(DEFAULT_ALERT_CONFIG, **(config or {}))
+        self.thresholds = np.asarray(self.config['thresholds'], dtype=np.float32)
+
+        shape = (n_fields, len(self.diseases))
+        self.level = np.zeros(shape, dtype=np.int8)
+        self.candidate = np.zeros(shape, dtype=np.int8)
+        self.dwell = np.zeros(shape, dtype=np.uint16)
+        self.last_event_level = np.zeros(shape, dtype=np.int8)
+        self.last_event_tick = np.full(shape, np.iinfo(np.int32).min // 2, dtype=np.int32)
+        self.tick = 0
+
+    def target_levels(self, scores, current):
+        """
+        Level each score should move to, given the current level.
+
+        Upward moves use the nominal thresholds; downward moves only happen
+        once the score falls below a threshold minus the hysteresis band.
+        """
+        raw = np.zeros(scores.shape, dtype=np.int8)
+        lowered = np.zeros(scores.shape, dtype=np.int8)
+        for threshold in self.thresholds:
+            raw += scores >= threshold
+            lowered += scores >= threshold - self.config['hysteresis']
+        return np.where(raw >= current, raw, np.minimum(current, lowered))
+
+    def update(self, scores, field_indices=None):
+        """
+        Consume one tick of risk scores and return the alert events.
+
+        A new level is committed once it has been the target for min_dwell
+        consecutive ticks. An event is emitted when the committed level differs
+        from the last alerted level, at most once per cooldown window; flapping
+        inside the window is folded into one net transition.
+
+        Args:
+            scores: Array of shape (n_fields, n_diseases), or (len(field_indices), n_diseases)
+            field_indices: Optional indices of the fields present in this tick
+
+        Returns:
+            np.ndarray: Structured array of EVENT_DTYPE, one row per emitted transition
+        """
+        self.tick += 1
+        scores = np.asarray(scores, dtype=np.float32)
+        if field_indices is None:
+            rows = slice(None)
+        else:
+            rows = np.asarray(field_indices, dtype=np.int64)
+
+        level = self.level[rows]
+        candidate = self.candidate[rows]
+        dwell = self.dwell[rows]
+
+        target = self.target_levels(scores, level)
+        changing = target != level
+        dwell = np.where(changing & (target == candidate), dwell + 1, changing).astype(np.uint16)
+        commit = changing & (dwell >= self.config['min_dwell'])
+        dwell[commit] = 0
+        candidate = target
+        level = np.where(commit, target, level)
+
+        alerted = self.last_event_level[rows]
+        last_tick = self.last_event_tick[rows]
+        emit = (level != alerted) & (self.tick - last_tick >= self.config['cooldown'])
+
+        event_rows, event_diseases = np.nonzero(emit)
+        events = np.empty(len(event_rows), dtype=EVENT_DTYPE)
+        events['field'] = event_rows if field_indices is None else rows[event_rows]
+        events['disease'] = event_diseases
+        events['from_level'] = alerted[event_rows, event_diseases]
+        events['to_level'] = level[event_rows, event_diseases]
+        events['tick'] = self.tick
+
+        if field_indices is None:
+            self.level = level
+            self.candidate = candidate
+            self.dwell = dwell
+            alerted[event_rows, event_diseases] = events['to_level']
+            last_tick[event_rows, event_diseases] = self.tick
+        else:
+            self.level[rows] = level
+            self.candidate[rows] = candidate
+            self.dwell[rows] = dwell
+            self.last_event_level[events['field'], event_diseases] = events['to_level']
+            self.last_event_tick[events['field'], event_diseases] = self.tick
+
+        return events
+
+    def format_events(self, events, field_ids=None):
+        """
+        Convert events to readable dictionaries.
+
+        Args:
+            events: Structured array returned by update
+            field_ids: Optional sequence mapping field index to an external field id
+
+        Returns:
+            list: Dicts with field, disease, transition (e.g. 'Moderate→High') and tick
+        """
+        formatted = []
+        for event in events:
+            field = int(event['field'])
+            formatted.append({
+                'field': field_ids[field] if field_ids is not None else field,
+                'disease': self.diseases[event['disease']],
+                'from': RISK_LEVELS[event['from_level']],
+                'to': RISK_LEVELS[event['to_level']],
+                'transition': f"{RISK_LEVELS[event['from_level']]}→{RISK_LEVELS[event['to_level']]}",
+                'tick': int(event['tick']),
+            })
+        return formatted
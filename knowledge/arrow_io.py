@@ -0,0 +1,250 @@
+"""
+Arrow Batch Scoring
+Scores Arrow record batches (or any buffer-protocol column arrays) without converting rows
+to dicts: the nine input columns are read as NumPy views where the data allows it, and the
+results come back as Arrow columns (ten scores plus risk-level categories). Record-batch
+readers and writers are streamed so memory stays bounded on large Parquet / IPC files.
+
+pyarrow is optional; only the Arrow functions need it.
+"""
+
+import os
+
+import numpy as np
+from knowledge.batch_inference import RISK_LEVELS, interpret_risk_batch
+from knowledge.validation import STATUS_REJECTED, diagnose_batch_validated
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+# Rows assembled into one input matrix per scoring pass
+ARROW_CHUNK_SIZE = 65536
+
+# Record batch size when reading Parquet files
+DEFAULT_BATCH_SIZE = 65536
+
+
+def _require_pyarrow():
+    """Raise a helpful error when pyarrow is missing."""
+    if pa is None:
+        raise ImportError("Arrow scoring requires pyarrow (pip install pyarrow)")
+
+
+def column_to_numpy(column):
+    """
+    One input column as a 1D float64 NumPy array.
+
+    Float64 Arrow arrays without nulls and float64 buffer-protocol objects are
+    returned as zero-copy views; other types are converted, with Arrow nulls
+    becoming NaN (which validation then flags as non-finite).
+
+    Args:
+        column: pyarrow Array / single-chunk ChunkedArray, NumPy array or buffer-protocol object
+
+    Returns:
+        np.ndarray: 1D float64 array
+    """
+    if pa is not None and isinstance(column, pa.ChunkedArray):
+        column = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+    if pa is not None and isinstance(column, pa.Array):
+        if column.null_count == 0 and pa.types.is_float64(column.type):
+            return column.to_numpy(zero_copy_only=True)
+        if pa.types.is_integer(column.type) or pa.types.is_floating(column.type):
+            return column.cast(pa.float64()).to_numpy(zero_copy_only=False)
+        raise TypeError(f"Input column of type {column.type} is not numeric")
+    return np.asarray(column, dtype=np.float64).reshape(-1)
+
+
+def input_columns(data, input_names):
+    """
+    The input columns of a record batch, table or mapping of columns.
+
+    Args:
+        data: pyarrow RecordBatch / Table, or a dict of column name -> array
+        input_names: Input names in engine order
+
+    Returns:
+        list: One 1D float64 array per input (views where possible)
+
+    Raises:
+        KeyError: If an input column is missing
+    """
+    if pa is not None and isinstance(data, (pa.RecordBatch, pa.Table)):
+        missing = [name for name in input_names if name not in data.schema.names]
+        if missing:
+            raise KeyError(f"Missing input columns: {missing}")
+        return [column_to_numpy(data.column(name)) for name in input_names]
+    return [column_to_numpy(data[name]) for name in input_names]
+
+
+def score_columns(columns, engine, policy='reject', chunk_size=ARROW_CHUNK_SIZE, **kwargs):
+    """
+    Score column arrays chunk by chunk with diagnose_batch_validated.
+
+    Only one (chunk_size, n_inputs) matrix is assembled at a time.
+
+    Args:
+        columns: One 1D array per input, in engine['input_names'] order
+        engine: Compiled engine from compile_rule_base
+        policy: Validation policy (see knowledge.validation.POLICIES)
+        chunk_size: Rows per scoring pass
+        **kwargs: Passed on to diagnose_batch_validated
+
+    Returns:
+        tuple: (scores of shape (N, n_diseases) as float32, row status of shape (N,) as uint8)
+    """
+    n_rows = len(columns[0]) if columns else 0
+    scores = np.empty((n_rows, len(engine['diseases'])), dtype=np.float32)
+    status = np.empty(n_rows, dtype=np.uint8)
+    for start in range(0, n_rows, chunk_size):
+        rows = slice(start, min(start + chunk_size, n_rows))
+        chunk = np.column_stack([column[rows] for column in columns])
+        scores[rows], status[rows] = diagnose_batch_validated(chunk, engine, policy, **kwargs)
+    return scores, status
+
+
+def results_to_arrow(scores, status, engine, passthrough=None):
+    """
+    Build an Arrow record batch from scoring results.
+
+    Columns: the passthrough columns, one float32 score column per disease (null for
+    rejected rows), one dictionary-encoded '<disease> level' column per disease
+    (Low / Moderate / High) and the uint8 validation 'status'.
+
+    Args:
+        scores: Array of shape (N, n_diseases)
+        status: Row status of shape (N,)
+        engine: Compiled engine from compile_rule_base
+        passthrough: Optional dict of column name -> Arrow array copied from the input (e.g. field ids)
+
+    Returns:
+        pyarrow.RecordBatch
+    """
+    _require_pyarrow()
+    scores = np.asarray(scores, dtype=np.float32)
+    rejected = np.isnan(scores).any(axis=1)
+    mask = rejected if rejected.any() else None
+    levels = interpret_risk_batch(np.nan_to_num(scores)).astype(np.int8)
+    dictionary = pa.array(RISK_LEVELS)
+
+    names, arrays = [], []
+    for name, array in (passthrough or {}).items():
+        names.append(name)
+        arrays.append(array if isinstance(array, pa.Array) else pa.array(array))
+    for d, disease in enumerate(engine['diseases']):
+        names.append(disease)
+        arrays.append(pa.array(scores[:, d], mask=mask))
+    for d, disease in enumerate(engine['diseases']):
+        names.append(f"{disease} level")
+        arrays.append(pa.DictionaryArray.from_arrays(pa.array(levels[:, d], mask=mask), dictionary))
+    names.append('status')
+    arrays.append(pa.array(np.asarray(status, dtype=np.uint8)))
+    return pa.RecordBatch.from_arrays(arrays, names=names)
+
+
+def diagnose_arrow(data, engine, policy='reject', keep_columns=(), **kwargs):
+    """
+    Score a record batch or table into Arrow result columns.
+
+    Args:
+        data: pyarrow RecordBatch or Table (or a dict of columns) with the input columns
+        engine: Compiled engine from compile_rule_base
+        policy: Validation policy
+        keep_columns: Input columns copied to the output (zero-copy), e.g. ('field_id',)
+        **kwargs: Passed on to score_columns
+
+    Returns:
+        pyarrow.RecordBatch (pyarrow.Table for a Table input, one batch per input batch)
+    """
+    _require_pyarrow()
+    if isinstance(data, pa.Table):
+        batches = [diagnose_arrow(batch, engine, policy, keep_columns, **kwargs) for batch in data.to_batches()]
+        if not batches:
+            # An empty table may have no batches; score a zero-row one for the output schema
+            batches = [diagnose_arrow(pa.RecordBatch.from_pylist([], schema=data.schema),
+                                      engine, policy, keep_columns, **kwargs)]
+        return pa.Table.from_batches(batches)
+    scores, status = score_columns(input_columns(data, engine['input_names']), engine, policy, **kwargs)
+    passthrough = {name: data[name] if isinstance(data, dict) else data.column(name) for name in keep_columns}
+    return results_to_arrow(scores, status, engine, passthrough)
+
+
+def diagnose_batches(batches, engine, policy='reject', keep_columns=(), **kwargs):
+    """
+    Score a stream of record batches lazily.
+
+    Args:
+        batches: Iterable of record batches (e.g. a RecordBatchReader or ParquetFile.iter_batches())
+        engine: Compiled engine from compile_rule_base
+        policy: Validation policy
+        keep_columns: Input columns copied to the output
+        **kwargs: Passed on to score_columns
+
+    Yields:
+        pyarrow.RecordBatch: Result batch per input batch
+    """
+    for batch in batches:
+        yield diagnose_arrow(batch, engine, policy, keep_columns, **kwargs)
+
+
+def _open_batches(path, batch_size):
+    """Record batches of a Parquet or Arrow IPC file (memory-mapped), read lazily."""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        with pq.ParquetFile(path) as parquet:
+            yield from parquet.iter_batches(batch_size=batch_size)
+        return
+    with pa.memory_map(path, 'r') as source:
+        try:
+            reader = pa.ipc.open_file(source)
+        except pa.ArrowInvalid:
+            source.seek(0)
+            yield from pa.ipc.open_stream(source)
+        else:
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i)
+
+
+def diagnose_file(input_path, output_path, engine, policy='reject', keep_columns=(),
+                  batch_size=DEFAULT_BATCH_SIZE, **kwargs):
+    """
+    Score a Parquet or Arrow IPC file into another, one record batch at a time.
+
+    Args:
+        input_path: .parquet file, or Arrow IPC file / stream
+        output_path: .parquet file, or Arrow IPC file for any other suffix
+        engine: Compiled engine from compile_rule_base
+        policy: Validation policy
+        keep_columns: Input columns copied to the output
+        batch_size: Rows per record batch when reading Parquet
+        **kwargs: Passed on to score_columns
+
+    Returns:
+        dict: rows, rejected (rows not scored) and batches written; no output file
+              is created for an input without record batches
+    """
+    _require_pyarrow()
+    input_path, output_path = os.fspath(input_path), os.fspath(output_path)
+    summary = {'rows': 0, 'rejected': 0, 'batches': 0}
+    writer = None
+    batches = _open_batches(input_path, batch_size)
+    try:
+        for result in diagnose_batches(batches, engine, policy, keep_columns, **kwargs):
+            if writer is None:
+                if output_path.endswith('.parquet'):
+                    import pyarrow.parquet as pq
+                    writer = pq.ParquetWriter(output_path, result.schema)
+                else:
+                    writer = pa.ipc.new_file(output_path, result.schema)
+            writer.write_batch(result)
+            summary['rows'] += result.num_rows
+            summary['rejected'] += int(np.count_nonzero(result.column('status').to_numpy() & STATUS_REJECTED))
+            summary['batches'] += 1
+    finally:
+        batches.close()  # Closes the input file even when scoring stopped early
+        if writer is not None:
+            writer.close()
+    return summary
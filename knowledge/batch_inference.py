@@ -0,0 +1,790 @@
+"""
+Batched Fuzzy Inference Engine
+Vectorized NumPy re-implementation of the skfuzzy Mamdani pipeline used in fuzzy_system.py.
+Scores many input vectors in one pass while reproducing the reference results.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from knowledge.disease_knowledge import FUZZY_RULES
+from knowledge.fuzzy_system import trimf_membership, universe_bounds
+
+
+# Order of the risk levels returned by interpret_risk_batch
+RISK_LEVELS = ['Low', 'Moderate', 'High']
+
+# Default number of rows scored at once (bounds the temporary arrays of defuzzification)
+DEFAULT_CHUNK_SIZE = 4096
+
+# Decimals kept when recovering trimf parameters from sampled membership functions
+_PARAM_DECIMALS = 9
+
+# Disease-subset engines built in this process, keyed by (rule-base version, diseases),
+# least recently used first; every specialized engine has its own version, so the
+# cache is capped at MAX_CACHED_SUBSETS entries
+MAX_CACHED_SUBSETS = 256
+_SUBSETS = OrderedDict()
+_SUBSETS_LOCK = threading.Lock()
+
+
+def _fit_trimf(universe, mf):
+    """
+    Recover the (a, b, c) parameters of a sampled triangular membership function.
+
+    Raises:
+        ValueError: If the sampled function is not a triangle
+    """
+    peak = int(mf.argmax())
+    b = universe[peak]
+    a = b - (universe[peak] - universe[peak - 1]) / (mf[peak] - mf[peak - 1]) if peak > 0 else b
+    c = b + (universe[peak + 1] - universe[peak]) / (mf[peak] - mf[peak + 1]) if peak < len(mf) - 1 else b
+    params = tuple(round(float(value), _PARAM_DECIMALS) for value in (a, b, c))
+    if not np.allclose(trimf_membership(universe, params), mf, atol=1e-9):
+        raise ValueError("Only triangular (trimf) input membership functions can be compiled")
+    return params
+
+
+def input_parameters(input_vars):
+    """
+    Universe bounds and trimf parameters of every input variable.
+
+    Args:
+        input_vars: Dictionary of input Antecedent objects (from create_input_variables)
+                    or of parameter dicts in INPUT_MF_PARAMS format
+
+    Returns:
+        dict: Variable name -> {'bounds': (low, high), 'terms': {term name: (a, b, c)}}
+    """
+    params = {}
+    for var_name, var in input_vars.items():
+        if isinstance(var, dict):
+            params[var_name] = {
+                'bounds': universe_bounds(var),
+                'terms': {term: tuple(float(p) for p in abc) for term, abc in var['terms'].items()},
+            }
+        else:
+            universe = var.universe
+            params[var_name] = {
+                'bounds': (round(float(universe.min()), _PARAM_DECIMALS),
+                           round(float(universe.max()), _PARAM_DECIMALS)),
+                'terms': {term_name: _fit_trimf(universe, term.mf) for term_name, term in var.terms.items()},
+            }
+    return params
+
+
+def compile_rule_base(input_vars, output_vars, rules=None):
+    """
+    Compile the fuzzy variables and rule base into flat NumPy arrays.
+
+    Every input term becomes one column of a membership matrix, every rule becomes
+    a row of column indices that are AND-ed (minimum) together, and every rule
+    consequent becomes a (disease, risk term) pair. Input terms are kept as their
+    trimf parameters only; sampled input universes are not stored.
+
+    Args:
+        input_vars: Dictionary of input Antecedent objects (from create_input_variables)
+                    or of parameter dicts in INPUT_MF_PARAMS format
+        output_vars: Dictionary of output Consequent objects (from create_output_variables)
+        rules: Rule definitions in FUZZY_RULES format (defaults to FUZZY_RULES)
+
+    Returns:
+        dict: Compiled engine used by all *_batch functions
+    """
+    if rules is None:
+        rules = FUZZY_RULES
+
+    input_names = list(input_vars.keys())
+    diseases = list(output_vars.keys())
+    params = input_parameters(input_vars)
+
+    # Flatten input terms into membership-matrix columns
+    term_columns = {}
+    term_owner = []
+    term_params = []
+    for var_idx, var_name in enumerate(input_names):
+        for term_name, abc in params[var_name]['terms'].items():
+            term_columns[(var_name, term_name)] = len(term_owner)
+            term_owner.append(var_idx)
+            term_params.append(abc)
+
+    # Extra always-one column pads rules with fewer conditions
+    pad_column = len(term_owner)
+    max_conditions = max(len(rule['conditions']) for rule in rules)
+
+    output_terms = list(next(iter(output_vars.values())).terms.keys())
+    rule_terms = np.full((len(rules), max_conditions), pad_column, dtype=np.intp)
+    rule_disease = np.zeros(len(rules), dtype=np.intp)
+    rule_risk = np.zeros(len(rules), dtype=np.intp)
+    output_term_used = np.zeros((len(diseases), len(output_terms)), dtype=bool)
+
+    for rule_idx, rule_def in enumerate(rules):
+        for cond_idx, (var_name, term_name) in enumerate(rule_def['conditions'].items()):
+            rule_terms[rule_idx, cond_idx] = term_columns[(var_name, term_name)]
+        rule_disease[rule_idx] = diseases.index(rule_def['disease'])
+        rule_risk[rule_idx] = output_terms.index(rule_def['risk'])
+        output_term_used[rule_disease[rule_idx], rule_risk[rule_idx]] = True
+
+    return {
+        'input_names': input_names,
+        'input_params': params,
+        'input_bounds': np.array([params[name]['bounds'] for name in input_names]),
+        'term_params': np.array(term_params, dtype=np.float64).reshape(-1, 3),
+        'term_owner': np.array(term_owner, dtype=np.intp),
+        'term_columns': term_columns,
+        'n_terms': len(term_owner),
+        'fixed_memberships': np.zeros(0),
+        'rules': list(rules),
+        'rule_ids': np.array([rule['id'] for rule in rules]),
+        'rule_terms': rule_terms,
+        'rule_disease': rule_disease,
+        'rule_risk': rule_risk,
+        'diseases': diseases,
+        'output_terms': output_terms,
+        'output_universes': [output_vars[d].universe for d in diseases],
+        'output_mfs': [np.array([t.mf for t in output_vars[d].terms.values()]) for d in diseases],
+        'output_term_used': output_term_used,
+        'output_weights': [_centroid_weights(output_vars[d].universe) for d in diseases],
+        'version': rule_base_version(input_vars, output_vars, rules),
+    }
+
+
+def rule_base_version(input_vars, output_vars, rules=None):
+    """
+    Fingerprint of the rule base and membership functions.
+
+    Any change to a rule, a universe or a membership function changes the
+    version, so it can key caches of inference results. Inputs are hashed by
+    their bounds and trimf parameters, so sampled Antecedents and INPUT_MF_PARAMS
+    style dicts describing the same variables share a version.
+
+    Args:
+        input_vars: Dictionary of input Antecedent objects or INPUT_MF_PARAMS style dicts
+        output_vars: Dictionary of output Consequent objects
+        rules: Rule definitions in FUZZY_RULES format (defaults to FUZZY_RULES)
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    if rules is None:
+        rules = FUZZY_RULES
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps([{k: rule[k] for k in ('id', 'disease', 'conditions', 'risk')} for rule in rules],
+                             sort_keys=True).encode())
+    digest.update(json.dumps(input_parameters(input_vars), sort_keys=True).encode())
+    for var_name, var in output_vars.items():
+        digest.update(var_name.encode())
+        digest.update(np.ascontiguousarray(var.universe, dtype=np.float64).tobytes())
+        for term_name, term in var.terms.items():
+            digest.update(term_name.encode())
+            digest.update(np.ascontiguousarray(term.mf, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def specialize(engine, fixed_inputs):
+    """
+    Partially evaluate an engine for inputs that are fixed (e.g. per-field attributes).
+
+    The memberships of the fixed inputs are folded into the rules: each rule's
+    fixed conditions collapse into one constant column (the minimum of their
+    memberships), rules whose constant is 0 are dropped, and the remaining
+    engine only takes the dynamic inputs. Scores are identical to running the
+    full engine with the fixed values filled in.
+
+    Args:
+        engine: Compiled engine from compile_rule_base (or an already specialized engine)
+        fixed_inputs: Dictionary of input name -> fixed crisp value
+
+    Returns:
+        dict: Specialized engine usable with all *_batch functions; 'rule_indices'
+              maps its rules to those of the original engine
+    """
+    unknown = set(fixed_inputs) - set(engine['input_names'])
+    if unknown:
+        raise ValueError(f"Unknown inputs: {sorted(unknown)}")
+
+    # Memberships of the fixed terms, computed exactly as during full inference
+    row = engine['input_bounds'][:, 0].copy()
+    for name, value in fixed_inputs.items():
+        row[engine['input_names'].index(name)] = value
+    full_memberships = fuzzify_batch(row, engine)[0]
+
+    dynamic_names = [name for name in engine['input_names'] if name not in fixed_inputs]
+    dynamic_vars = [engine['input_names'].index(name) for name in dynamic_names]
+    is_fixed_column = np.ones(len(full_memberships), dtype=bool)
+    column_map = {}
+    for old_column, owner in enumerate(engine['term_owner']):
+        if owner in dynamic_vars:
+            column_map[old_column] = len(column_map)
+            is_fixed_column[old_column] = False
+    n_terms = len(column_map)
+    pad_column = len(engine['term_owner']) + len(engine['fixed_memberships'])
+    is_fixed_column[pad_column] = False
+
+    # Fold every rule's fixed conditions into a constant; drop rules that can never fire
+    kept, constants, rule_terms = [], [], []
+    for rule_idx, columns in enumerate(engine['rule_terms']):
+        fixed_columns = columns[is_fixed_column[columns]]
+        constant = full_memberships[fixed_columns].min() if len(fixed_columns) else 1.0
+        if constant <= 0:
+            continue
+        terms = [column_map[c] for c in columns if c in column_map]
+        if constant < 1.0:
+            terms.append(n_terms + len(constants))
+            constants.append(constant)
+        kept.append(rule_idx)
+        rule_terms.append(terms)
+
+    # Pad with the always-one column, which follows the constant columns
+    rule_terms_array = np.full((len(kept), max([len(terms) for terms in rule_terms] + [1])),
+                               n_terms + len(constants), dtype=np.intp)
+    for i, terms in enumerate(rule_terms):
+        rule_terms_array[i, :len(terms)] = terms
+
+    kept = np.array(kept, dtype=np.intp)
+    term_owner_map = {old: new for new, old in enumerate(dynamic_vars)}
+    dynamic_columns = sorted(column_map, key=column_map.get)
+    output_term_used = engine['output_term_used'].copy()
+    output_term_used[~np.isin(np.arange(len(engine['diseases'])), engine['rule_disease'][kept])] = False
+
+    # Versioned by the unspecialized rule base and all fixed values, however they were applied
+    base_version = engine.get('base_version', engine['version'])
+    all_fixed = dict(engine.get('fixed_inputs', {}), **fixed_inputs)
+    digest = hashlib.sha256(base_version.encode())
+    digest.update(json.dumps({name: float(value) for name, value in all_fixed.items()}, sort_keys=True).encode())
+
+    return dict(
+        engine,
+        input_names=dynamic_names,
+        input_params={name: engine['input_params'][name] for name in dynamic_names},
+        input_bounds=engine['input_bounds'][dynamic_vars],
+        term_params=engine['term_params'][dynamic_columns],
+        term_owner=np.array([term_owner_map[engine['term_owner'][c]] for c in dynamic_columns], dtype=np.intp),
+        term_columns={key: column_map[column] for key, column in engine['term_columns'].items()
+                      if column in column_map},
+        n_terms=n_terms,
+        fixed_memberships=np.array(constants, dtype=np.float64),
+        fixed_inputs=all_fixed,
+        base_version=base_version,
+        rules=[engine['rules'][i] for i in kept],
+        rule_indices=engine.get('rule_indices', np.arange(len(engine['rules'])))[kept],
+        rule_ids=engine['rule_ids'][kept],
+        rule_terms=rule_terms_array,
+        rule_disease=engine['rule_disease'][kept],
+        rule_risk=engine['rule_risk'][kept],
+        output_term_used=output_term_used,
+        version=digest.hexdigest(),
+    )
+
+
+def disease_subset(engine, diseases):
+    """
+    Restrict an engine to the rule subgraph of some diseases.
+
+    Only the rules of the selected diseases are kept, and only the input terms
+    and input variables those rules reference, so the cost of inference scales
+    with the subset rather than the full rule base.
+
+    Args:
+        engine: Compiled engine from compile_rule_base (or a specialized engine)
+        diseases: Disease names; the output columns follow this order
+
+    Returns:
+        dict: Engine usable with all *_batch functions, taking only the needed inputs;
+              'input_indices' are their positions in the original engine's inputs
+              and 'rule_indices' maps its rules to those of the original engine
+    """
+    diseases = list(diseases)
+    unknown = [name for name in diseases if name not in engine['diseases']]
+    if unknown:
+        raise ValueError(f"Unknown diseases: {unknown}")
+
+    parent_diseases = [engine['diseases'].index(name) for name in diseases]
+    kept = np.flatnonzero(np.isin(engine['rule_disease'], parent_diseases))
+    rule_terms = engine['rule_terms'][kept]
+
+    # New columns: the referenced input terms, then the referenced constant columns, then the pad
+    n_terms = engine['n_terms']
+    pad_column = n_terms + len(engine['fixed_memberships'])
+    used = np.unique(rule_terms)
+    term_columns_used = used[used < n_terms]
+    fixed_columns_used = used[(used >= n_terms) & (used < pad_column)]
+    column_map = np.full(pad_column + 1, len(term_columns_used) + len(fixed_columns_used), dtype=np.intp)
+    column_map[term_columns_used] = np.arange(len(term_columns_used))
+    column_map[fixed_columns_used] = len(term_columns_used) + np.arange(len(fixed_columns_used))
+
+    input_indices = np.unique(engine['term_owner'][term_columns_used])
+    input_names = [engine['input_names'][i] for i in input_indices]
+    owner_map = {old: new for new, old in enumerate(input_indices)}
+    disease_map = {old: new for new, old in enumerate(parent_diseases)}
+
+    output_term_used = engine['output_term_used'][parent_diseases].copy()
+    has_rules = np.isin(np.arange(len(diseases)), [disease_map[d] for d in engine['rule_disease'][kept]])
+    output_term_used[~has_rules] = False
+
+    digest = hashlib.sha256(engine['version'].encode())
+    digest.update(json.dumps(diseases).encode())
+
+    return dict(
+        engine,
+        input_names=input_names,
+        input_indices=input_indices,
+        input_params={name: engine['input_params'][name] for name in input_names},
+        input_bounds=engine['input_bounds'][input_indices],
+        term_params=engine['term_params'][term_columns_used],
+        term_owner=np.array([owner_map[engine['term_owner'][c]] for c in term_columns_used], dtype=np.intp),
+        term_columns={key: int(column_map[column]) for key, column in engine['term_columns'].items()
+                      if column in term_columns_used},
+        n_terms=len(term_columns_used),
+        fixed_memberships=engine['fixed_memberships'][fixed_columns_used - n_terms],
+        rules=[engine['rules'][i] for i in kept],
+        rule_indices=engine.get('rule_indices', np.arange(len(engine['rules'])))[kept],
+        rule_ids=engine['rule_ids'][kept],
+        rule_terms=column_map[rule_terms],
+        rule_disease=np.array([disease_map[d] for d in engine['rule_disease'][kept]], dtype=np.intp),
+        rule_risk=engine['rule_risk'][kept],
+        diseases=diseases,
+        output_universes=[engine['output_universes'][d] for d in parent_diseases],
+        output_mfs=[engine['output_mfs'][d] for d in parent_diseases],
+        output_term_used=output_term_used,
+        output_weights=[engine['output_weights'][d] for d in parent_diseases],
+        version=digest.hexdigest(),
+    )
+
+
+def get_disease_subset(engine, diseases):
+    """
+    Cached disease_subset, keyed by engine version and disease list.
+
+    The cache keeps the MAX_CACHED_SUBSETS most recently used subsets.
+
+    Args:
+        engine: Compiled engine from compile_rule_base
+        diseases: Disease names
+
+    Returns:
+        dict: Subset engine from disease_subset
+    """
+    key = (engine['version'], tuple(diseases))
+    with _SUBSETS_LOCK:
+        subset = _SUBSETS.get(key)
+        if subset is not None:
+            _SUBSETS.move_to_end(key)
+            return subset
+
+    subset = disease_subset(engine, diseases)
+    with _SUBSETS_LOCK:
+        _SUBSETS[key] = subset
+        while len(_SUBSETS) > MAX_CACHED_SUBSETS:
+            _SUBSETS.popitem(last=False)
+    return subset
+
+
+def inputs_to_array(input_records, engine):
+    """
+    Convert input dictionaries (as accepted by diagnose_diseases) to a 2D array.
+
+    Args:
+        input_records: A single input dict or a list of input dicts
+        engine: Compiled engine from compile_rule_base
+
+    Returns:
+        np.ndarray: Array of shape (N, n_inputs) in engine input order
+    """
+    if isinstance(input_records, dict):
+        input_records = [input_records]
+    return np.array([[record[name] for name in engine['input_names']] for record in input_records],
+                    dtype=np.float64).reshape(-1, len(engine['input_names']))
+
+
+def scores_to_dicts(scores, engine):
+    """
+    Convert a score matrix back to the {disease: score} dicts returned by diagnose_diseases.
+
+    Args:
+        scores: Array of shape (N, n_diseases)
+        engine: Compiled engine from compile_rule_base
+
+    Returns:
+        list: One dictionary per row
+    """
+    return [dict(zip(engine['diseases'], row.tolist())) for row in np.atleast_2d(scores)]
+
+
+def fuzzify_batch(inputs, engine):
+    """
+    Compute the membership degree of every input term for every row.
+
+    Inputs are clipped to their universe, like skfuzzy's CrispValueCalculator.fuzz,
+    and the triangular memberships are evaluated in closed form for all terms
+    at once. A NaN input has membership 0 in every term. This equals interpolation over the sampled membership functions,
+    since every triangle corner lies on the sampled universe.
+
+    Args:
+        inputs: Array of shape (N, n_inputs)
+        engine: Compiled engine from compile_rule_base
+
+    Returns:
+        np.ndarray: Memberships of shape (N, n_terms + n_fixed + 1): the term columns, the
+                    constant columns of a specialized engine (n_fixed is 0 otherwise) and
+                    a last column of all ones
+    """
+    inputs = np.asarray(inputs, dtype=np.float64).reshape(-1, len(engine['input_names']))
+    n_terms = engine['n_terms']
+    fixed = engine['fixed_memberships']
+    memberships = np.ones((inputs.shape[0], n_terms + len(fixed) + 1))
+    memberships[:, n_terms:n_terms + len(fixed)] = fixed
+
+    owner = engine['term_owner']
+    bounds = engine['input_bounds'][owner]
+    values = np.clip(inputs[:, owner], bounds[:, 0], bounds[:, 1])
+    a, b, c = engine['term_params'].T
+    has_rise, has_fall = b > a, c > b
+    rising = np.where(has_rise, (values - a) / np.where(has_rise, b - a, 1.0), values >= b)
+    falling = np.where(has_fall, (c - values) / np.where(has_fall, c - b, 1.0), values <= b)
+    membership = np.minimum(rising, falling)
+    # fmax maps the NaN of a missing input to 0, so such a value matches no term
+    # (the generated evaluator does the same); validation rejects these rows anyway
+    np.fmax(membership, 0.0, out=membership)
+    np.minimum(membership, 1.0, out=memberships[:, :n_terms])
+
+    return memberships
+
+
+def rule_strengths_batch(memberships, engine):
+    """
+    Compute the firing strength of every rule (fuzzy AND = minimum).
+
+    Args:
+        memberships: Output of fuzzify_batch
+        engine: Compiled engine from compile_rule_base
+
+    Returns:
+        np.ndarray: Firing strengths of shape (N, n_rules)
+    """
+    return memberships[:, engine['rule_terms']].min(axis=2)
+
+
+def term_cuts_batch(strengths, engine):
+    """
+    Accumulate rule firing strengths into a cut level per output term (maximum).
+
+    Args:
+        strengths: Output of rule_strengths_batch
+        engine: Compiled engine from compile_rule_base
+
+    Returns:
+        np.ndarray: Cut levels of shape (N, n_diseases, n_output_terms)
+    """
+    n_rows = strengths.shape[0]
+    cuts = np.zeros((n_rows, len(engine['diseases']), len(engine['output_terms'])))
+    for rule_idx in range(strengths.shape[1]):
+        d = engine['rule_disease'][rule_idx]
+        t = engine['rule_risk'][rule_idx]
+        np.maximum(cuts[:, d, t], strengths[:, rule_idx], out=cuts[:, d, t])
+    return cuts
+
+
+def _cut_points(universe, mf, cut):
+    """
+    Find where a sampled membership function crosses each row's cut level.
+
+    Vectorized equivalent of skfuzzy's _interp_universe_fast for unimodal
+    (triangular) terms: the rising and falling flanks are each monotonic, so
+    the crossing segment is found with a binary search. Returns the rising
+    and falling crossing per row; missing crossings repeat the first universe
+    point, which only adds a zero-width segment to the centroid.
+    """
+    peak = int(mf.argmax())
+    rising = mf[:peak + 1]
+    falling_reversed = mf[peak:][::-1]
+    zero_cut = cut == 0
+    in_range = cut <= mf[peak]
+
+    # skfuzzy uses "mf > 0" for a zero cut and "mf >= cut" otherwise
+    first_above = np.where(zero_cut, np.searchsorted(rising, 0.0, side='right'),
+                           np.searchsorted(rising, cut, side='left'))
+    trailing_below = np.where(zero_cut, np.searchsorted(falling_reversed, 0.0, side='right'),
+                              np.searchsorted(falling_reversed, cut, side='left'))
+
+    crossings = [
+        (first_above - 1, in_range & (first_above > 0) & (first_above <= peak)),
+        (len(mf) - trailing_below - 1, in_range & (trailing_below > 0)),
+    ]
+
+    points = []
+    for idx, exists in crossings:
+        idx = np.clip(idx, 0, len(mf) - 2)
+        x0, x1 = universe[idx], universe[idx + 1]
+        y0, y1 = mf[idx], mf[idx + 1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            point = x0 + (cut - y0) * (x1 - x0) / (y1 - y0)
+        points.append(np.where(exists, point, universe[0]))
+    return points
+
+
+def _segment_moments(xa, xb, ya, yb):
+    """
+    Area and first moment of the linear segments (xa, ya)-(xb, yb).
+
+    skfuzzy.defuzzify.centroid sums moment*area over trapezoid segments with
+    separate cases for rectangles and triangles; the closed form
+    (xb - xa)^2 * (ya + 2*yb) / 6 + xa * area covers all of them (and is zero
+    for empty or zero-width segments).
+    """
+    dx = xb - xa
+    area = 0.5 * dx * (ya + yb)
+    return area, dx * dx * (ya + 2.0 * yb) / 6.0 + xa * area
+
+
+def _centroid_weights(universe):
+    """
+    Per-point weights turning sampled membership values into centroid sums.
+
+    Area and moment of a piecewise-linear function are linear in its sampled
+    values, so both sums over the whole universe reduce to dot products.
+    """
+    area_weights = np.zeros(len(universe))
+    moment_weights = np.zeros(len(universe))
+    left, right = universe[:-1], universe[1:]
+    dx = right - left
+    area_weights[:-1] += 0.5 * dx
+    area_weights[1:] += 0.5 * dx
+    moment_weights[:-1] += dx * dx / 6.0 + left * 0.5 * dx
+    moment_weights[1:] += dx * dx / 3.0 + left * 0.5 * dx
+    return area_weights, moment_weights
+
+
+def defuzzify_batch(cuts, engine, disease_indices=None):
+    """
+    Centroid defuzzification of the clipped and aggregated output terms.
+
+    Follows skfuzzy's CrispValueCalculator.defuzz: the output universe is
+    upsampled with the points where each term crosses its cut level, the
+    clipped terms are combined with maximum, and the centroid is taken.
+    Rather than sorting every upsampled universe, the centroid sums of the
+    sampled universe are corrected for the few segments split by cut points.
+    Diseases whose aggregated output is empty score 0.0, matching diagnose_diseases.
+
+    Args:
+        cuts: Output of term_cuts_batch
+        engine: Compiled engine from compile_rule_base
+        disease_indices: Optional indices of the diseases to defuzzify (others stay 0.0)
+
+    Returns:
+        np.ndarray: Risk scores of shape (N, n_diseases)
+    """
+    n_rows = cuts.shape[0]
+    rows = np.arange(n_rows)[:, None]
+    scores = np.zeros((n_rows, len(engine['diseases'])))
+    if disease_indices is None:
+        disease_indices = range(len(engine['diseases']))
+
+    for d in disease_indices:
+        universe = engine['output_universes'][d]
+        used_terms = np.flatnonzero(engine['output_term_used'][d])
+        if len(used_terms) == 0:
+            continue
+
+        # Clipped and aggregated output on the sampled universe
+        term_mfs = engine['output_mfs'][d][used_terms]
+        term_cuts = cuts[:, d, used_terms]
+        base_mf = np.minimum(term_cuts[:, :, None], term_mfs[None, :, :]).max(axis=1)
+        area_weights, moment_weights = engine['output_weights'][d]
+        sum_area = base_mf @ area_weights
+        sum_moment = base_mf @ moment_weights
+
+        # Cut crossings of every used term upsample the universe
+        extra_points = []
+        for mf, cut in zip(term_mfs, term_cuts.T):
+            extra_points.extend(_cut_points(universe, mf, cut))
+        extra_x = np.sort(np.column_stack(extra_points), axis=1)
+        extra_mf = np.zeros_like(extra_x)
+        for mf, cut in zip(term_mfs, term_cuts.T):
+            np.maximum(extra_mf, np.minimum(cut[:, None], np.interp(extra_x, universe, mf)), out=extra_mf)
+
+        # Replace every segment that contains crossings by its refined pieces
+        segment = np.clip(np.searchsorted(universe, extra_x, side='right') - 1, 0, len(universe) - 2)
+        seg_left_x, seg_right_x = universe[segment], universe[segment + 1]
+        seg_left_mf, seg_right_mf = base_mf[rows, segment], base_mf[rows, segment + 1]
+
+        first_in_segment = np.ones_like(segment, dtype=bool)
+        first_in_segment[:, 1:] = segment[:, 1:] != segment[:, :-1]
+        last_in_segment = np.ones_like(segment, dtype=bool)
+        last_in_segment[:, :-1] = first_in_segment[:, 1:]
+
+        prev_x = np.where(first_in_segment, seg_left_x, np.roll(extra_x, 1, axis=1))
+        prev_mf = np.where(first_in_segment, seg_left_mf, np.roll(extra_mf, 1, axis=1))
+        piece_area, piece_moment = _segment_moments(prev_x, extra_x, prev_mf, extra_mf)
+        tail_area, tail_moment = _segment_moments(extra_x, seg_right_x, extra_mf, seg_right_mf)
+        old_area, old_moment = _segment_moments(seg_left_x, seg_right_x, seg_left_mf, seg_right_mf)
+
+        sum_area = sum_area + (piece_area + np.where(last_in_segment, tail_area, 0.0)
+                               - np.where(first_in_segment, old_area, 0.0)).sum(axis=1)
+        sum_moment = sum_moment + (piece_moment + np.where(last_in_segment, tail_moment, 0.0)
+                                   - np.where(first_in_segment, old_moment, 0.0)).sum(axis=1)
+
+        nonempty = (base_mf.sum(axis=1) + extra_mf.sum(axis=1)) > 0
+        scores[:, d] = np.where(nonempty, sum_moment / np.fmax(sum_area, np.finfo(float).eps), 0.0)
+
+    return scores
+
+
+def diagnose_batch(inputs, engine, chunk_size=DEFAULT_CHUNK_SIZE, return_strengths=False,
+                   disease_indices=None, diseases=None):
+    """
+    Vectorized counterpart of diagnose_diseases for many input rows at once.
+
+    Args:
+        inputs: Array of shape (N, n_inputs) in engine['input_names'] order
+        engine: Compiled engine from compile_rule_base
+        chunk_size: Maximum number of rows processed per vectorized pass
+        return_strengths: Also return the rule firing strengths
+        disease_indices: Optional indices of the diseases to defuzzify (others stay 0.0)
+        diseases: Optional disease names; only their rules and inputs are evaluated
+                  (see get_disease_subset) and only their score columns are returned
+
+    Returns:
+        np.ndarray: Risk scores of shape (N, n_diseases), columns in engine['diseases'] order
+                    (or in the order of diseases). If return_strengths is True, a tuple
+                    (scores, strengths) where strengths has shape (N, n_rules); with
+                    diseases, only the subset's rules are included.
+    """
+    inputs = np.asarray(inputs, dtype=np.float64).reshape(-1, len(engine['input_names']))
+    if diseases is not None:
+        if disease_indices is not None:
+            raise ValueError("Pass either diseases or disease_indices, not both")
+        subset = get_disease_subset(engine, diseases)
+        return diagnose_batch(inputs[:, subset['input_indices']], subset, chunk_size, return_strengths)
+
+    n_rows = inputs.shape[0]
+    scores = np.zeros((n_rows, len(engine['diseases'])))
+    strengths = np.zeros((n_rows, len(engine['rule_ids']))) if return_strengths else None
+
+    for start in range(0, n_rows, chunk_size):
+        stop = min(start + chunk_size, n_rows)
+        chunk_strengths = rule_strengths_batch(fuzzify_batch(inputs[start:stop], engine), engine)
+        scores[start:stop] = defuzzify_batch(term_cuts_batch(chunk_strengths, engine), engine, disease_indices)
+        if return_strengths:
+            strengths[start:stop] = chunk_strengths
+
+    if return_strengths:
+        return scores, strengths
+    return scores
+
+
+def explain_from_strengths(strengths, engine, threshold=0.01):
+    """
+    Build the explain_diagnosis structure from one row of rule firing strengths.
+
+    Args:
+        strengths: 1D array of rule strengths (one row of diagnose_batch(..., return_strengths=True))
+        engine: Compiled engine from compile_rule_base
+        threshold: Minimum strength for a rule to be listed (as in explain_diagnosis)
+
+    Returns:
+        dict: Disease name -> list of fired rule dicts sorted by descending strength
+    """
+    fired_rules_by_disease = {}
+    for rule_idx in np.flatnonzero(strengths > threshold):
+        rule_def = engine['rules'][rule_idx]
+        fired_rules_by_disease.setdefault(rule_def['disease'], []).append({
+            'rule_id': rule_def['id'],
+            'strength': float(strengths[rule_idx]),
+            'conditions': rule_def['conditions'],
+            'risk': rule_def['risk'],
+            'description': rule_def['description']
+        })
+    for fired in fired_rules_by_disease.values():
+        fired.sort(key=lambda x: x['strength'], reverse=True)
+    return fired_rules_by_disease
+
+
+# Engine shared by the worker processes of diagnose_parallel
+_WORKER_ENGINE = None
+
+
+def _init_worker(engine):
+    global _WORKER_ENGINE
+    _WORKER_ENGINE = engine
+
+
+def _diagnose_worker_chunk(inputs):
+    return diagnose_batch(inputs, _WORKER_ENGINE)
+
+
+def diagnose_parallel(inputs, engine, workers=None, chunk_size=65536):
+    """
+    Score a large input array across several processes.
+
+    Each worker receives the engine once and then scores chunks of rows with
+    diagnose_batch. Falls back to a single in-process call for small inputs
+    or workers=1.
+
+    Args:
+        inputs: Array of shape (N, n_inputs)
+        engine: Compiled engine from compile_rule_base
+        workers: Number of worker processes (defaults to os.cpu_count())
+        chunk_size: Rows sent to a worker per task
+
+    Returns:
+        np.ndarray: Risk scores of shape (N, n_diseases)
+    """
+    inputs = np.asarray(inputs, dtype=np.float64).reshape(-1, len(engine['input_names']))
+    if workers == 1 or len(inputs) <= chunk_size:
+        return diagnose_batch(inputs, engine)
+
+    chunks = [inputs[start:start + chunk_size] for start in range(0, len(inputs), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(engine,)) as pool:
+        return np.concatenate(list(pool.map(_diagnose_worker_chunk, chunks)))
+
+
+def interpret_risk_batch(scores):
+    """
+    Vectorized interpret_risk: map scores to indices into RISK_LEVELS.
+
+    Args:
+        scores: Array of risk scores (any shape)
+
+    Returns:
+        np.ndarray: Integer level codes (0=Low, 1=Moderate, 2=High), same shape
+    """
+    return np.digitize(scores, [0.4, 0.6]).astype(np.int8)
+
+
+def evaluate_grid(base_inputs, x_var, x_values, y_var, y_values, disease, engine,
+                  chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Risk of one disease over a grid of two inputs, all other inputs held fixed.
+
+    Args:
+        base_inputs: Input dictionary providing the fixed values
+        x_var: Name of the input varied along the grid columns
+        x_values: 1D array of x_var values
+        y_var: Name of the input varied along the grid rows
+        y_values: 1D array of y_var values
+        disease: Disease name to score
+        engine: Compiled engine from compile_rule_base
+        chunk_size: Rows per vectorized pass
+
+    Returns:
+        np.ndarray: Risk scores of shape (len(y_values), len(x_values))
+    """
+    if x_var == y_var:
+        raise ValueError(f"Grid axes must be two different inputs, got {x_var} twice")
+
+    x_values = np.asarray(x_values, dtype=np.float64)
+    y_values = np.asarray(y_values, dtype=np.float64)
+    grid = np.repeat(inputs_to_array(base_inputs, engine), len(x_values) * len(y_values), axis=0)
+    xx, yy = np.meshgrid(x_values, y_values)
+    grid[:, engine['input_names'].index(x_var)] = xx.ravel()
+    grid[:, engine['input_names'].index(y_var)] = yy.ravel()
+
+    disease_idx = engine['diseases'].index(disease)
+    scores = diagnose_batch(grid, engine, chunk_size=chunk_size, disease_indices=[disease_idx])
+    return scores[:, disease_idx].reshape(len(y_values), len(x_values))
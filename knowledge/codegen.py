@@ -0,0 +1,382 @@
+"""
+Generated Straight-Line Evaluator
+Emits a pure-Python module computing all disease risks for a single reading with the
+rule base unrolled into straight-line code: inline trimf expressions, one min per rule,
+one max per output term and a closed-form centroid. Intended for interactive single-call
+scoring, where NumPy dispatch overhead dominates; results match the batch engine.
+"""
+
+import importlib.util
+import os
+import types
+
+import numpy as np
+from knowledge.batch_inference import _fit_trimf, diagnose_batch
+
+
+# Evaluators built in this process, keyed by rule-base version
+_EVALUATORS = {}
+
+GENERATED_HEADER = '# Generated by knowledge/codegen.py - do not edit.'
+
+# Helpers shared by every generated module. _trimf mirrors skfuzzy's trimf, _term_sums
+# integrates one clipped output term exactly and _seg is the trapezoid area / first moment.
+_PRELUDE = '''
+def _trimf(x, a, b, c):
+    if x < b:
+        return (x - a) / (b - a) if x > a else 0.0
+    if x > b:
+        return (c - x) / (c - b) if x < c else 0.0
+    return 1.0
+
+
+def _clipped(x, k, a, b, c):
+    t = _trimf(x, a, b, c)
+    return t if t < k else k
+
+
+def _seg(xa, xb, ya, yb):
+    dx = xb - xa
+    area = 0.5 * dx * (ya + yb)
+    return area, dx * dx * (ya + 2.0 * yb) / 6.0 + xa * area
+
+
+def _term_sums(lo, hi, k, a, b, c, p, q):
+    """Area and first moment of min(k, trimf) over [lo, hi]; p, q are its cut crossings."""
+    area = moment = 0.0
+    x0, y0 = lo, _clipped(lo, k, a, b, c)
+    for x1 in (p, q):
+        if x0 < x1 < hi:
+            da, dm = _seg(x0, x1, y0, k)
+            area += da
+            moment += dm
+            x0, y0 = x1, k
+    da, dm = _seg(x0, hi, y0, _clipped(hi, k, a, b, c))
+    return area + da, moment + dm
+
+
+def _chord_correction(s, left, right, f_left, f_s, f_right):
+    """Difference between the sampled chord over [left, right] and the exact kink at s."""
+    chord_area, chord_moment = _seg(left, right, f_left, f_right)
+    left_area, left_moment = _seg(left, s, f_left, f_s)
+    right_area, right_moment = _seg(s, right, f_s, f_right)
+    return chord_area - left_area - right_area, chord_moment - left_moment - right_moment
+'''
+
+
+def _membership_expression(x, a, b, c):
+    """Inline expression for the membership of x in trimf (a, b, c), as in fuzzify_batch."""
+    if a < b < c:
+        body = f"({x} - {a!r}) / {b - a!r} if {x} < {b!r} else ({c!r} - {x}) / {c - b!r}"
+    elif a == b < c:
+        body = f"0.0 if {x} < {b!r} else ({c!r} - {x}) / {c - b!r}"
+    elif a < b == c:
+        body = f"0.0 if {x} > {b!r} else ({x} - {a!r}) / {b - a!r}"
+    else:
+        return f"1.0 if {x} == {b!r} else 0.0"
+    return body
+
+
+def _min_expression(names):
+    if len(names) == 1:
+        return names[0]
+    if len(names) == 2:
+        return f"{names[0]} if {names[0]} < {names[1]} else {names[1]}"
+    return f"min({', '.join(names)})"
+
+
+def _max_expression(names):
+    if not names:
+        return '0.0'
+    if len(names) == 1:
+        return names[0]
+    if len(names) == 2:
+        return f"{names[0]} if {names[0]} > {names[1]} else {names[1]}"
+    return f"max({', '.join(names)})"
+
+
+def _defuzz_source(index, universe, params):
+    """
+    Source of a centroid function for one output universe and its used terms.
+
+    skfuzzy samples the aggregated output on the universe plus every term's cut
+    crossings, so its trapezoid centroid equals the exact integral except in
+    the sampled segment containing a switch point between two overlapping
+    terms, which the samples replace by a chord. The exact integral is summed
+    per term over the interval it dominates, then the chord is corrected for.
+    """
+    order = sorted(range(len(params)), key=lambda i: params[i][1])
+    for left, right in zip(order, order[1:]):
+        a_l, b_l, c_l = params[left]
+        a_r, b_r, c_r = params[right]
+        if a_r < b_l or c_l > b_r:
+            raise ValueError("Overlapping output terms must only overlap on their flanks")
+    for i, j in zip(order, order[2:]):
+        if params[i][2] > params[j][0]:
+            raise ValueError("Only neighbouring output terms may overlap")
+    for a, _, c in params:
+        if a < universe[0] - 1e-9 or c > universe[-1] + 1e-9:
+            raise ValueError("Output terms must lie within the output universe")
+
+    name, grid_name = f"_defuzz{index}", f"_GRID{index}"
+    start, step = float(universe[0]), float(universe[-1] - universe[0]) / (len(universe) - 1)
+    args = ', '.join(f"k{i}" for i in range(len(params)))
+    lines = [f"def {name}({args}):"]
+    lines.append(f"    if {' and '.join(f'k{i} <= 0.0' for i in range(len(params)))}:")
+    lines.append("        return 0.0")
+    lines.append("    area = moment = 0.0")
+    for i, (a, b, c) in enumerate(params):
+        lines.append(f"    p{i} = {a!r} + k{i} * {b - a!r}")
+        lines.append(f"    q{i} = {c!r} - k{i} * {c - b!r}")
+        lines.append(f"    lo{i}, hi{i} = {a!r}, {c!r}")
+
+    for left, right in zip(order, order[1:]):
+        a_l, b_l, c_l = params[left]
+        a_r, b_r, c_r = params[right]
+        if a_r >= c_l:
+            continue
+        d_l, d_r = c_l - b_l, b_r - a_r
+        x0 = (c_l * d_r + a_r * d_l) / (d_l + d_r)
+        v0 = (c_l - x0) / d_l
+        kl, kr = f"k{left}", f"k{right}"
+        lines += [
+            f"    if {kl} > 0.0 and {kr} > 0.0:",
+            f"        if {kl} >= {v0!r} and {kr} >= {v0!r}:",
+            f"            s = {x0!r}",
+            f"        elif {kl} <= {kr}:",
+            f"            s = {a_r!r} + {kl} * {d_r!r}",
+            "        else:",
+            f"            s = {c_l!r} - {kr} * {d_l!r}",
+            f"        hi{left} = lo{right} = s",
+            f"        j = int((s - {start!r}) / {step!r})",
+            f"        j = {len(universe) - 2} if j > {len(universe) - 2} else (0 if j < 0 else j)",
+            f"        while j < {len(universe) - 2} and {grid_name}[j + 1] < s:",
+            "            j += 1",
+            f"        while j > 0 and {grid_name}[j] > s:",
+            "            j -= 1",
+            f"        left, right = {grid_name}[j], {grid_name}[j + 1]",
+            f"        for e in (p{left}, q{left}, p{right}, q{right}):",
+            "            if left < e < right:",
+            "                if e <= s:",
+            "                    left = e",
+            "                else:",
+            "                    right = e",
+            f"        f_left = max(_clipped(left, {kl}, {a_l!r}, {b_l!r}, {c_l!r}), "
+            f"_clipped(left, {kr}, {a_r!r}, {b_r!r}, {c_r!r}))",
+            f"        f_right = max(_clipped(right, {kl}, {a_l!r}, {b_l!r}, {c_l!r}), "
+            f"_clipped(right, {kr}, {a_r!r}, {b_r!r}, {c_r!r}))",
+            f"        f_s = _clipped(s, {kl}, {a_l!r}, {b_l!r}, {c_l!r})",
+            "        da, dm = _chord_correction(s, left, right, f_left, f_s, f_right)",
+            "        area += da",
+            "        moment += dm",
+        ]
+
+    for i, (a, b, c) in enumerate(params):
+        lines += [
+            f"    if k{i} > 0.0:",
+            f"        da, dm = _term_sums(lo{i}, hi{i}, k{i}, {a!r}, {b!r}, {c!r}, p{i}, q{i})",
+            "        area += da",
+            "        moment += dm",
+        ]
+    lines.append("    return moment / area if area > 0.0 else 0.0")
+    grid = f"{grid_name} = ({', '.join(repr(float(x)) for x in universe)},)"
+    return grid + "\n\n\n" + "\n".join(lines)
+
+
+def generate_evaluator_source(engine):
+    """
+    Generate the source of a straight-line evaluator module for a compiled engine.
+
+    The module defines diagnose(*inputs) returning a tuple of risk scores in
+    engine['diseases'] order, and diagnose_with_strengths(*inputs) returning
+    (scores, rule strengths in engine['rules'] order). Inputs are positional
+    in engine['input_names'] order. As in fuzzify_batch, a NaN input has
+    membership 0 in every term (the "m if m > 0.0 else 0.0" guard maps NaN to 0).
+
+    Args:
+        engine: Compiled engine from compile_rule_base
+
+    Returns:
+        str: Python source code
+    """
+    input_names = engine['input_names']
+    args = [f"x{i}" for i in range(len(input_names))]
+    body = []
+
+    # Fuzzification, only for terms some rule refers to
+    used_columns = set(int(c) for c in np.unique(engine['rule_terms']))
+    for var_idx, name in enumerate(input_names):
+        low, high = (float(v) for v in engine['input_bounds'][var_idx])
+        columns = [c for c in np.flatnonzero(engine['term_owner'] == var_idx) if c in used_columns]
+        if not columns:
+            continue
+        x = args[var_idx]
+        body.append(f"    # {name}")
+        body.append(f"    {x} = {low!r} if {x} < {low!r} else ({high!r} if {x} > {high!r} else {x})")
+        for column in columns:
+            a, b, c = (float(v) for v in engine['term_params'][column])
+            body.append(f"    m{column} = {_membership_expression(x, a, b, c)}")
+            body.append(f"    m{column} = m{column} if m{column} > 0.0 else 0.0")
+
+    # Rule firing strengths (AND = min), constant columns of specialized engines inlined
+    n_terms = engine['n_terms']
+    fixed = engine['fixed_memberships']
+    pad_column = n_terms + len(fixed)
+    body.append("    # Rules")
+    for rule_idx, columns in enumerate(engine['rule_terms']):
+        operands = []
+        for column in columns:
+            column = int(column)
+            if column == pad_column:
+                continue
+            operands.append(f"m{column}" if column < n_terms else repr(float(fixed[column - n_terms])))
+        rule = engine['rules'][rule_idx]
+        body.append(f"    r{rule_idx} = {_min_expression(operands) if operands else '1.0'}"
+                    f"  # {rule['id']}: {rule['disease']} {rule['risk']}")
+
+    # Output term cut levels (accumulation = max) and defuzzification
+    defuzzifiers = {}
+    helpers = []
+    scores = []
+    for d, disease in enumerate(engine['diseases']):
+        used_terms = np.flatnonzero(engine['output_term_used'][d])
+        if len(used_terms) == 0:
+            scores.append('0.0')
+            continue
+        universe = engine['output_universes'][d]
+        params = tuple(_fit_trimf(universe, engine['output_mfs'][d][t]) for t in used_terms)
+        key = (universe.tobytes(), params)
+        if key not in defuzzifiers:
+            helpers.append(_defuzz_source(len(defuzzifiers), universe, params))
+            defuzzifiers[key] = f"_defuzz{len(defuzzifiers)}"
+
+        cut_names = []
+        for t in used_terms:
+            rules = [f"r{r}" for r in np.flatnonzero((engine['rule_disease'] == d) & (engine['rule_risk'] == t))]
+            cut_names.append(f"k{d}_{t}")
+            body.append(f"    k{d}_{t} = {_max_expression(rules)}")
+        scores.append(f"{defuzzifiers[key]}({', '.join(cut_names)})")
+        body.append(f"    s{d} = {scores[-1]}  # {disease}")
+        scores[-1] = f"s{d}"
+
+    strengths = ', '.join(f"r{i}" for i in range(len(engine['rules'])))
+    signature = ', '.join(args)
+    source = [
+        GENERATED_HEADER,
+        f"RULE_BASE_VERSION = {engine['version']!r}",
+        f"INPUT_NAMES = {tuple(input_names)!r}",
+        f"DISEASES = {tuple(engine['diseases'])!r}",
+        f"RULE_IDS = {tuple(int(i) for i in engine['rule_ids'])!r}",
+        _PRELUDE,
+        *("\n" + helper + "\n" for helper in helpers),
+        f"\ndef diagnose_with_strengths({signature}):",
+        *body,
+        f"    return ({', '.join(scores)},), ({strengths}{',' if len(engine['rules']) == 1 else ''})",
+        "",
+        "",
+        f"def diagnose({signature}):",
+        f"    return diagnose_with_strengths({signature})[0]",
+        "",
+    ]
+    return "\n".join(source)
+
+
+def verify_evaluator(evaluator, engine, n_samples=500, seed=0, atol=1e-9):
+    """
+    Compare a generated evaluator with the batch engine on random inputs.
+
+    Inputs are drawn uniformly over (and slightly beyond) the input bounds,
+    with a share snapped to triangle corners where memberships switch pieces
+    and a few NaN values.
+
+    Returns:
+        float: Largest absolute score difference
+
+    Raises:
+        RuntimeError: If any score differs by more than atol
+    """
+    rng = np.random.default_rng(seed)
+    low, high = engine['input_bounds'].T
+    margin = 0.05 * (high - low)
+    inputs = rng.uniform(low - margin, high + margin, size=(n_samples, len(low)))
+    snap = rng.random((n_samples, len(low))) < 0.3
+    for var_idx in range(len(low)):
+        columns = np.flatnonzero(engine['term_owner'] == var_idx)
+        corners = engine['term_params'][rng.choice(columns, size=n_samples), rng.integers(3, size=n_samples)]
+        inputs[:, var_idx] = np.where(snap[:, var_idx], corners, inputs[:, var_idx])
+    # Missing values must match no term in either engine
+    inputs[rng.random(inputs.shape) < 0.02] = np.nan
+
+    expected = diagnose_batch(inputs, engine)
+    actual = np.array([evaluator.diagnose(*row) for row in inputs.tolist()])
+    difference = float(np.abs(actual - expected).max()) if len(inputs) else 0.0
+    if difference > atol:
+        raise RuntimeError(f"Generated evaluator differs from the batch engine by {difference:.3g}")
+    return difference
+
+
+def build_evaluator(engine, path=None, verify=True):
+    """
+    Build (or load) the generated evaluator for an engine.
+
+    If path points to a previously generated module for the same rule-base
+    version it is imported as is; otherwise (including an empty or truncated
+    file) the module is regenerated and, if path is given, atomically written
+    to it.
+
+    Args:
+        engine: Compiled engine from compile_rule_base
+        path: Optional .py file to write the generated module to / reuse it from
+        verify: Check the evaluator against the batch engine before returning it
+
+    Returns:
+        module: Module with diagnose and diagnose_with_strengths
+    """
+    source = None
+    if path and os.path.exists(path):
+        with open(path) as f:
+            existing = f.read()
+        # Line 2 holds the version; empty or truncated files are regenerated
+        if f"RULE_BASE_VERSION = {engine['version']!r}" in (existing.splitlines()[1:2] or [''])[0]:
+            source = existing
+    if source is None:
+        source = generate_evaluator_source(engine)
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            # Written next to path and renamed into place, so an interrupted write leaves no partial module
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(source)
+            os.replace(tmp_path, path)
+
+    if path:
+        spec = importlib.util.spec_from_file_location(f"_fuzzy_evaluator_{engine['version'][:12]}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    else:
+        module = types.ModuleType(f"_fuzzy_evaluator_{engine['version'][:12]}")
+        exec(compile(source, module.__name__, 'exec'), module.__dict__)
+
+    if verify:
+        verify_evaluator(module, engine)
+    return module
+
+
+def get_evaluator(engine, path=None):
+    """
+    Generated evaluator for an engine, built once per rule-base version.
+
+    Any change to the rules or membership functions changes engine['version'],
+    so a new evaluator is generated and verified automatically.
+
+    Args:
+        engine: Compiled engine from compile_rule_base
+        path: Optional .py file passed to build_evaluator
+
+    Returns:
+        module: Module with diagnose and diagnose_with_strengths
+    """
+    evaluator = _EVALUATORS.get(engine['version'])
+    if evaluator is None:
+        evaluator = _EVALUATORS[engine['version']] = build_evaluator(engine, path)
+    return evaluator
@@ -0,0 +1,133 @@
+"""
+Counterfactual Search
+Finds the smallest weighted change to the controllable inputs (soil moisture, drainage,
+seed health, vector pressure) that brings a disease's interpret_risk level down, with the
+weather inputs held fixed. Candidates are scored in populations with single batched
+inference calls over only the chosen disease's rules.
+"""
+
+import itertools
+
+import numpy as np
+from knowledge.batch_inference import RISK_LEVELS, diagnose_batch, inputs_to_array, interpret_risk_batch
+
+
+# Inputs a grower can act on; all others (weather, crop stage) stay fixed
+CONTROLLABLE_INPUTS = ('SoilM', 'Drain', 'SeedHealth', 'Vector')
+
+# Random candidates per subset of changed inputs in the initial population
+DEFAULT_POPULATION = 256
+
+# Candidates refined per round, and fractions tried when shrinking a change
+_N_REFINE = 8
+_SHRINK_STEPS = np.linspace(0.0, 1.0, 33)[:-1]
+
+
+def change_cost(deltas, weights, ranges):
+    """
+    Weighted L1 size of input changes, each normalized by its universe width.
+
+    Args:
+        deltas: Array of shape (..., n_controllable) of changes
+        weights: Array of shape (n_controllable,)
+        ranges: Universe widths of shape (n_controllable,)
+
+    Returns:
+        np.ndarray: Costs of shape (...)
+    """
+    return (np.abs(deltas) / ranges * weights).sum(axis=-1)
+
+
+def find_counterfactual(input_values, disease, engine, target_level=None, controllable=CONTROLLABLE_INPUTS,
+                        weights=None, population=DEFAULT_POPULATION, rounds=3, seed=0):
+    """
+    Search the smallest weighted change of the controllable inputs that lowers a disease's risk level.
+
+    The initial population samples new values for every subset of the
+    controllable inputs (so changing fewer inputs is explored explicitly).
+    The cheapest feasible candidates are then refined: each is moved back
+    toward the current inputs along its change, and each changed input is
+    shrunk separately, keeping the cheapest candidates that stay feasible.
+    Every population is scored with one diagnose_batch call on the disease's
+    rule subset.
+
+    Args:
+        input_values: Dictionary of current input values (as for diagnose_diseases)
+        disease: Disease name
+        engine: Compiled engine from compile_rule_base
+        target_level: Level to reach or go below ('Low' or 'Moderate'); defaults to
+                      one level below the current one
+        controllable: Names of the inputs that may change
+        weights: Dictionary of input name -> cost weight (default 1 each)
+        population: Random candidates per subset of changed inputs
+        rounds: Refinement rounds
+        seed: Random seed
+
+    Returns:
+        dict: disease, score, level, target_level, found, cost, changes (name -> (old, new)),
+              new_score, new_level and evaluations (candidates scored)
+    """
+    x0 = inputs_to_array(input_values, engine)[0]
+    columns = [engine['input_names'].index(name) for name in controllable]
+    low, high = engine['input_bounds'][columns].T
+    ranges = high - low
+    weight_vector = np.array([(weights or {}).get(name, 1.0) for name in controllable], dtype=np.float64)
+    base = x0[columns]
+
+    def score(candidates):
+        rows = np.repeat(x0[None, :], len(candidates), axis=0)
+        rows[:, columns] = candidates
+        return diagnose_batch(rows, engine, diseases=[disease])[:, 0]
+
+    current = float(score(base[None, :])[0])
+    level = int(interpret_risk_batch(current))
+    target = level - 1 if target_level is None else RISK_LEVELS.index(target_level)
+    result = {'disease': disease, 'score': current, 'level': RISK_LEVELS[level],
+              'target_level': RISK_LEVELS[max(target, 0)], 'evaluations': 1}
+    if level <= target or target < 0:
+        return dict(result, found=level <= max(target, 0), cost=0.0, changes={},
+                    new_score=current, new_level=RISK_LEVELS[level])
+
+    rng = np.random.default_rng(seed)
+    candidates = []
+    for size in range(1, len(columns) + 1):
+        for subset in itertools.combinations(range(len(columns)), size):
+            block = np.repeat(base[None, :], population, axis=0)
+            block[:, subset] = rng.uniform(low[list(subset)], high[list(subset)], size=(population, size))
+            candidates.append(block)
+    candidates = np.concatenate(candidates)
+
+    best, best_cost, best_score = None, np.inf, None
+    for round_idx in range(rounds + 1):
+        scores = score(candidates)
+        result['evaluations'] += len(candidates)
+        feasible = interpret_risk_batch(scores) <= target
+        if not feasible.any():
+            if best is None:
+                break
+            continue
+
+        costs = change_cost(candidates[feasible] - base, weight_vector, ranges)
+        order = np.argsort(costs)[:_N_REFINE]
+        if costs[order[0]] < best_cost:
+            best, best_cost = candidates[feasible][order[0]].copy(), float(costs[order[0]])
+            best_score = float(scores[feasible][order[0]])
+        if round_idx == rounds:
+            break
+
+        # Next population: move each good candidate toward the current inputs, as a whole and per input
+        elite = candidates[feasible][order]
+        deltas = elite - base
+        shrunk = [base + deltas[:, None, :] * _SHRINK_STEPS[None, :, None]]
+        for j in range(len(columns)):
+            per_input = np.repeat(elite[:, None, :], len(_SHRINK_STEPS), axis=1)
+            per_input[:, :, j] = base[j] + deltas[:, None, j] * _SHRINK_STEPS[None, :]
+            shrunk.append(per_input)
+        candidates = np.concatenate([s.reshape(-1, len(columns)) for s in shrunk] + [elite])
+
+    if best is None:
+        return dict(result, found=False, cost=None, changes={}, new_score=None, new_level=None)
+
+    changes = {name: (float(base[j]), float(best[j])) for j, name in enumerate(controllable) if best[j] != base[j]}
+    return dict(result, found=True, cost=best_cost, changes=changes, new_score=best_score,
+                new_level=RISK_LEVELS[int(interpret_risk_batch(best_score))])
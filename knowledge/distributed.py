@@ -0,0 +1,624 @@
+"""
+Sharded Batch Scoring Over TCP
+A coordinator splits an input array or file into shards and hands them to worker processes
+over TCP (on other hosts, or on localhost for testing). Workers score shards with the batch
+engine and stream the scores back in chunks. Frames carry raw binary arrays with a small
+JSON header, lost workers have their shard retried elsewhere, and shard commits are atomic
+and idempotent so retries and resumed jobs never write a shard twice.
+
+Frames are size-capped and only float arrays of the expected shape are accepted. With a
+shared secret, coordinator and worker prove it to each other (HMAC challenge-response)
+before any shard is sent; without one, workers should only listen on localhost.
+"""
+
+import collections
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+import numpy as np
+from knowledge.validation import diagnose_batch_validated
+
+
+# Rows per shard handed to a worker
+DEFAULT_SHARD_SIZE = 50000
+
+# Rows per score frame streamed back by a worker
+STREAM_CHUNK_SIZE = 8192
+
+# Largest shard a worker accepts (rows); bounds the memory one frame can claim
+DEFAULT_MAX_SHARD_ROWS = 1_000_000
+
+# Largest JSON header accepted in a frame (bytes)
+MAX_HEADER_BYTES = 65536
+
+# Seconds a worker waits for a connecting coordinator to complete the handshake
+HANDSHAKE_TIMEOUT = 30.0
+
+# Frame prefix: message type, JSON header length, payload length
+_FRAME = struct.Struct('!BIQ')
+
+# Message types
+MSG_HELLO = 1     # Handshake in both directions (carries the rule-base version)
+MSG_SHARD = 2     # Coordinator -> worker: shard_id, attempt + float64 input array
+MSG_SCORES = 3    # Worker -> coordinator: shard_id, offset + float32 score array
+MSG_DONE = 4      # Worker -> coordinator: shard_id, rows, seconds
+MSG_ERROR = 5     # Worker -> coordinator: shard_id, message
+MSG_AUTH = 6      # Coordinator -> worker: proof of the shared secret
+
+# Seconds of commits used for the recent throughput figure
+THROUGHPUT_WINDOW = 10.0
+
+
+def send_message(sock, kind, header, array=None):
+    """
+    Send one frame: prefix, JSON header and the raw bytes of an optional array.
+
+    Args:
+        sock: Connected socket
+        kind: Message type (MSG_*)
+        header: JSON-serializable dict
+        array: Optional NumPy array (sent C-contiguous; dtype and shape go in the header)
+    """
+    if array is not None:
+        array = np.ascontiguousarray(array)
+        header = dict(header, dtype=array.dtype.str, shape=list(array.shape))
+    encoded = json.dumps(header).encode()
+    payload_size = array.nbytes if array is not None else 0
+    sock.sendall(_FRAME.pack(kind, len(encoded), payload_size) + encoded)
+    if payload_size:
+        sock.sendall(memoryview(array).cast('B'))
+
+
+def _recv_exact(sock, n_bytes):
+    """Read exactly n_bytes; raises ConnectionError if the peer closes first."""
+    buffer = bytearray(n_bytes)
+    view = memoryview(buffer)
+    received = 0
+    while received < n_bytes:
+        n = sock.recv_into(view[received:], n_bytes - received)
+        if n == 0:
+            raise ConnectionError("Connection closed by peer")
+        received += n
+    return buffer
+
+
+def recv_message(sock, max_payload=0, dtype=None, columns=None):
+    """
+    Receive one frame sent by send_message.
+
+    Sizes are checked before anything is allocated: the header is capped at
+    MAX_HEADER_BYTES and the payload at max_payload, and a payload must be a
+    2D array of the given dtype and column count that exactly fills it.
+
+    Args:
+        sock: Connected socket
+        max_payload: Largest payload accepted in bytes (0 rejects any array)
+        dtype: The only dtype accepted for the array (e.g. '<f8')
+        columns: Required number of array columns
+
+    Returns:
+        tuple: (message type, header dict, array or None)
+
+    Raises:
+        ConnectionError: If the connection closes mid-frame
+        ValueError: If the frame breaks the limits or is malformed
+    """
+    kind, header_size, payload_size = _FRAME.unpack(_recv_exact(sock, _FRAME.size))
+    if header_size > MAX_HEADER_BYTES:
+        raise ValueError(f"Frame header of {header_size} bytes exceeds {MAX_HEADER_BYTES}")
+    if payload_size > max_payload:
+        raise ValueError(f"Frame payload of {payload_size} bytes exceeds {max_payload}")
+    header = json.loads(_recv_exact(sock, header_size))
+    if not isinstance(header, dict):
+        raise ValueError("Frame header is not a JSON object")
+    array = None
+    if payload_size:
+        shape = header.get('shape')
+        if (header.get('dtype') != np.dtype(dtype).str or not isinstance(shape, list) or len(shape) != 2
+                or not all(isinstance(n, int) and n >= 0 for n in shape) or shape[1] != columns
+                or shape[0] * shape[1] * np.dtype(dtype).itemsize != payload_size):
+            raise ValueError(f"Unexpected array {header.get('dtype')} {shape} in frame")
+        array = np.frombuffer(_recv_exact(sock, payload_size), dtype=dtype).reshape(shape)
+    return kind, header, array
+
+
+def _proof(secret, role, nonce):
+    """HMAC proving knowledge of the shared secret for a role and a peer's hex nonce."""
+    return hmac.new(secret, role.encode() + bytes.fromhex(nonce), hashlib.sha256).hexdigest()
+
+
+def _secret_bytes(secret):
+    return secret.encode() if isinstance(secret, str) else secret
+
+
+class _ShardHandler(socketserver.BaseRequestHandler):
+    """Serves one coordinator connection: handshake, then shards until the connection closes."""
+
+    def handle(self):
+        sock = self.request
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        engine = self.server.engine
+        n_inputs = len(engine['input_names'])
+        try:
+            sock.settimeout(HANDSHAKE_TIMEOUT)
+            if not self._handshake(sock):
+                return
+            sock.settimeout(None)
+            max_payload = self.server.max_shard_rows * n_inputs * 8
+            while True:
+                kind, header, inputs = recv_message(sock, max_payload, '<f8', n_inputs)
+                if kind != MSG_SHARD or inputs is None:
+                    continue
+                self._score_shard(sock, header.get('shard_id'), inputs)
+        except (ConnectionError, OSError, ValueError):
+            return
+
+    def _handshake(self, sock):
+        """Exchange HELLO frames (and proofs of the shared secret, if set); True when accepted."""
+        secret = self.server.secret
+        kind, header, _ = recv_message(sock)
+        if kind != MSG_HELLO:
+            return False
+        reply = {'version': self.server.engine['version'], 'worker': self.server.name}
+        if secret is not None:
+            challenge = secrets.token_hex(16)
+            reply['challenge'] = challenge
+            reply['proof'] = _proof(secret, 'worker', str(header.get('nonce', '')))
+        send_message(sock, MSG_HELLO, reply)
+        if secret is None:
+            return True
+        kind, header, _ = recv_message(sock)
+        return kind == MSG_AUTH and hmac.compare_digest(str(header.get('proof', '')),
+                                                         _proof(secret, 'coordinator', challenge))
+
+    def _score_shard(self, sock, shard_id, inputs):
+        """Score a shard and stream its scores in chunks, then DONE (or ERROR)."""
+        started = time.perf_counter()
+        try:
+            for offset in range(0, len(inputs), self.server.chunk_size):
+                chunk = inputs[offset:offset + self.server.chunk_size]
+                if self.server.statistics is not None:
+                    scores, _ = self.server.statistics.observe_validated(chunk)
+                else:
+                    scores, _ = diagnose_batch_validated(chunk, self.server.engine)
+                send_message(sock, MSG_SCORES, {'shard_id': shard_id, 'offset': offset}, scores.astype(np.float32))
+        except (ConnectionError, OSError):
+            raise
+        except Exception as e:
+            send_message(sock, MSG_ERROR, {'shard_id': shard_id, 'message': f"{type(e).__name__}: {e}"})
+            return
+        self.server.shards_scored += 1
+        send_message(sock, MSG_DONE, {'shard_id': shard_id, 'rows': len(inputs),
+                                      'seconds': time.perf_counter() - started})
+
+
+class ShardWorker(socketserver.ThreadingTCPServer):
+    """
+    TCP server scoring shards with the batch engine.
+
+    Args:
+        address: (host, port) to listen on; port 0 picks a free port
+        engine: Compiled engine from compile_rule_base
+        chunk_size: Rows per streamed score frame
+        statistics: Optional FleetRecorder (knowledge.fleet_stats) for the scored rows
+        secret: Optional shared secret (str or bytes) coordinators must prove before sending shards
+        max_shard_rows: Largest shard accepted
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, engine, chunk_size=STREAM_CHUNK_SIZE, statistics=None, secret=None,
+                 max_shard_rows=DEFAULT_MAX_SHARD_ROWS):
+        super().__init__(address, _ShardHandler)
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.statistics = statistics
+        self.secret = _secret_bytes(secret)
+        self.max_shard_rows = max_shard_rows
+        self.shards_scored = 0
+        self.name = f"{socket.gethostname()}:{os.getpid()}:{self.server_address[1]}"
+
+    def start(self):
+        """Serve in a daemon thread (e.g. for tests); returns the thread."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        """Stop serving, close the listening socket and write a final statistics snapshot."""
+        self.shutdown()
+        self.server_close()
+        if self.statistics is not None:
+            self.statistics.save()
+
+
+def open_source(source, input_names, shard_size=DEFAULT_SHARD_SIZE):
+    """
+    Shard an input array or file.
+
+    Args:
+        source: Array of shape (N, n_inputs), a .npy file (memory-mapped) or a
+                .parquet file (one shard per row group, needs pyarrow)
+        input_names: Input columns, in engine order (for Parquet)
+        shard_size: Rows per shard for arrays and .npy files
+
+    Returns:
+        tuple: (n_rows, list of (shard_id, start, stop), load(shard_id) -> float64 array)
+    """
+    if isinstance(source, (str, os.PathLike)) and os.fspath(source).endswith('.parquet'):
+        import pyarrow.parquet as pq
+        from knowledge.arrow_io import input_columns
+        parquet = pq.ParquetFile(source)
+        sizes = [parquet.metadata.row_group(i).num_rows for i in range(parquet.num_row_groups)]
+        starts = np.concatenate([[0], np.cumsum(sizes)]).astype(int)
+        shards = [(i, int(starts[i]), int(starts[i + 1])) for i in range(len(sizes))]
+
+        def load(shard_id):
+            table = pq.ParquetFile(source).read_row_group(shard_id, columns=list(input_names))
+            return np.column_stack(input_columns(table, input_names))
+        return int(starts[-1]), shards, load
+
+    if isinstance(source, (str, os.PathLike)):
+        source = np.load(source, mmap_mode='r')
+    inputs = np.asarray(source).reshape(-1, len(input_names))
+    shards = [(i, start, min(start + shard_size, len(inputs)))
+              for i, start in enumerate(range(0, len(inputs), shard_size))]
+    return len(inputs), shards, lambda shard_id: np.asarray(inputs[shards[shard_id][1]:shards[shard_id][2]],
+                                                           dtype=np.float64)
+
+
+class ShardStore:
+    """
+    Committed shard scores, in memory or as one .npy file per shard.
+
+    Commits are idempotent: the first complete result of a shard wins and
+    later duplicates are ignored. On disk, a shard is written to a temporary
+    file and renamed, so a crash never leaves a partial shard behind, and a
+    job restarted on the same directory skips the shards already committed.
+
+    Args:
+        n_rows: Total rows of the job
+        shards: List of (shard_id, start, stop)
+        n_diseases: Score columns
+        version: Rule-base version of the scores
+        output_dir: Optional directory for the shard files
+
+    Raises:
+        ValueError: If output_dir holds shards of a different job
+    """
+
+    def __init__(self, n_rows, shards, n_diseases, version, output_dir=None):
+        self.shards = {shard_id: (start, stop) for shard_id, start, stop in shards}
+        self.n_rows = n_rows
+        self.n_diseases = n_diseases
+        self.output_dir = output_dir
+        self.committed = set()
+        self._lock = threading.Lock()
+        self._scores = None if output_dir else np.full((n_rows, n_diseases), np.nan, dtype=np.float32)
+        if output_dir:
+            self._open_directory({'n_rows': n_rows, 'shards': [list(shard) for shard in shards],
+                                  'n_diseases': n_diseases, 'version': version})
+
+    def _open_directory(self, manifest):
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, 'job.json')
+        if os.path.exists(path):
+            with open(path) as f:
+                if json.load(f) != manifest:
+                    raise ValueError(f"{self.output_dir} holds the shards of a different job")
+            self.committed = {shard_id for shard_id in self.shards if os.path.exists(self._path(shard_id))}
+        else:
+            with open(path, 'w') as f:
+                json.dump(manifest, f)
+
+    def _path(self, shard_id):
+        return os.path.join(self.output_dir, f"shard_{shard_id:06d}.npy")
+
+    def commit(self, shard_id, scores):
+        """
+        Store a shard's scores unless the shard is already committed.
+
+        Returns:
+            bool: True if this call committed the shard
+        """
+        start, stop = self.shards[shard_id]
+        scores = np.asarray(scores, dtype=np.float32).reshape(stop - start, self.n_diseases)
+        with self._lock:
+            if shard_id in self.committed:
+                return False
+            if self.output_dir:
+                temporary = self._path(shard_id) + f".{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(temporary, 'wb') as f:
+                    np.save(f, scores)
+                os.replace(temporary, self._path(shard_id))
+            else:
+                self._scores[start:stop] = scores
+            self.committed.add(shard_id)
+            return True
+
+    def scores(self):
+        """All scores of shape (n_rows, n_diseases); NaN for shards not committed."""
+        if self.output_dir is None:
+            return self._scores
+        scores = np.full((self.n_rows, self.n_diseases), np.nan, dtype=np.float32)
+        for shard_id in sorted(self.committed):
+            start, stop = self.shards[shard_id]
+            scores[start:stop] = np.load(self._path(shard_id))
+        return scores
+
+
+class ShardCoordinator:
+    """
+    Hands shards to TCP workers and commits their scores.
+
+    One thread per worker keeps a connection open and processes one shard
+    at a time. When a worker fails (connection loss, timeout or an error
+    frame) its shard goes back to the front of the queue for another
+    attempt, and the thread reconnects with exponential backoff; a worker
+    that loses max_reconnects shards in a row is given up, and a shard that
+    fails max_attempts times fails the job. Scores are committed only once
+    a worker reports the shard complete.
+
+    Args:
+        workers: List of (host, port) worker addresses
+        engine: Compiled engine (workers must run the same rule-base version)
+        shard_size: Rows per shard for arrays and .npy files
+        max_attempts: Attempts per shard
+        shard_timeout: Seconds without a frame before a worker counts as lost
+        reconnect_delay: Seconds between reconnection attempts
+        max_reconnects: Consecutive failed connections (or lost shards) before a worker is given up
+        secret: Optional shared secret (str or bytes); workers must prove it, and it is proven to them
+    """
+
+    def __init__(self, workers, engine, shard_size=DEFAULT_SHARD_SIZE, max_attempts=3, shard_timeout=300.0,
+                 reconnect_delay=1.0, max_reconnects=5, secret=None):
+        self.workers = [tuple(address) for address in workers]
+        self.engine = engine
+        self.shard_size = shard_size
+        self.max_attempts = max_attempts
+        self.shard_timeout = shard_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnects = max_reconnects
+        self.secret = _secret_bytes(secret)
+        self._condition = threading.Condition()
+        self._reset(0, [])
+
+    def _reset(self, n_rows, shards):
+        self.n_rows = n_rows
+        self._sizes = {shard_id: stop - start for shard_id, start, stop in shards}
+        self._pending = collections.deque()
+        self._attempts = collections.Counter()
+        self._inflight = {}
+        self._failed = {}
+        self._commits = collections.deque()
+        self.rows_done = 0
+        self.retries = 0
+        self.duplicates = 0
+        self.started = None
+        self.finished = None
+        self.worker_stats = {f"{host}:{port}": {'state': 'idle', 'name': None, 'shards': 0, 'rows': 0, 'busy_s': 0.0,
+                                                'failures': 0, 'last_error': None} for host, port in self.workers}
+        self.store = None
+
+    def run(self, source, output_dir=None):
+        """
+        Score a source across the workers.
+
+        Args:
+            source: Input array, .npy or .parquet file (see open_source)
+            output_dir: Optional directory for shard files (enables resuming)
+
+        Returns:
+            ShardStore: The committed scores
+
+        Raises:
+            RuntimeError: If shards failed or no worker was left to score them
+        """
+        n_rows, shards, self._load = open_source(source, self.engine['input_names'], self.shard_size)
+        with self._condition:
+            self._reset(n_rows, shards)
+            self.store = ShardStore(n_rows, shards, len(self.engine['diseases']), self.engine['version'], output_dir)
+            self._pending.extend(shard_id for shard_id, _, _ in shards if shard_id not in self.store.committed)
+            self.rows_done = sum(self._sizes[shard_id] for shard_id in self.store.committed)
+            self.started = time.time()
+
+        threads = [threading.Thread(target=self._worker_loop, args=(address,), daemon=True) for address in self.workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.finished = time.time()
+
+        missing = sorted(set(self._sizes) - self.store.committed)
+        if missing:
+            errors = {shard_id: self._failed.get(shard_id, 'no worker left') for shard_id in missing[:10]}
+            raise RuntimeError(f"{len(missing)} shard(s) not scored, e.g. {errors}")
+        return self.store
+
+    def _next_shard(self, key):
+        """
+        Next shard id to score, registered as in flight on worker key; waits while other
+        workers hold the last shards (one may fail and come back) and returns None when done.
+        """
+        with self._condition:
+            while True:
+                if self._pending:
+                    shard_id = self._pending.popleft()
+                    self._attempts[shard_id] += 1
+                    self._inflight[shard_id] = key
+                    return shard_id
+                if not self._inflight:
+                    return None
+                self._condition.wait(timeout=1.0)
+
+    def _release(self, shard_id, error):
+        """Return a failed shard to the front of the queue, or fail it after max_attempts."""
+        with self._condition:
+            self._inflight.pop(shard_id, None)
+            if shard_id in self.store.committed:
+                pass
+            elif self._attempts[shard_id] >= self.max_attempts:
+                self._failed[shard_id] = error
+            else:
+                self._pending.appendleft(shard_id)
+                self.retries += 1
+            self._condition.notify_all()
+
+    def _commit(self, shard_id, scores, key, seconds):
+        with self._condition:
+            self._inflight.pop(shard_id, None)
+            if self.store.commit(shard_id, scores):
+                self.rows_done += self._sizes[shard_id]
+                self._commits.append((time.time(), self._sizes[shard_id]))
+                stats = self.worker_stats[key]
+                stats['shards'] += 1
+                stats['rows'] += self._sizes[shard_id]
+                stats['busy_s'] += seconds
+            else:
+                self.duplicates += 1
+            self._condition.notify_all()
+
+    def _connect(self, address, key):
+        """Open and handshake a connection; None after max_reconnects failures."""
+        stats = self.worker_stats[key]
+        for _ in range(self.max_reconnects):
+            stats['state'] = 'connecting'
+            sock = None
+            try:
+                sock = socket.create_connection(address, timeout=self.shard_timeout)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                nonce = secrets.token_hex(16)
+                send_message(sock, MSG_HELLO, {'version': self.engine['version'], 'nonce': nonce})
+                kind, header, _ = recv_message(sock)
+                problem = self._check_hello(kind, header, nonce)
+                if problem:
+                    sock.close()
+                    stats['state'], stats['last_error'] = 'incompatible', problem
+                    return None
+                if self.secret is not None:
+                    send_message(sock, MSG_AUTH, {'proof': _proof(self.secret, 'coordinator', header['challenge'])})
+                stats['name'], stats['state'] = header.get('worker'), 'idle'
+                return sock
+            except (OSError, ConnectionError, ValueError) as e:
+                if sock is not None:
+                    sock.close()
+                stats['failures'] += 1
+                stats['last_error'] = f"{type(e).__name__}: {e}"
+                time.sleep(self.reconnect_delay)
+        stats['state'] = 'lost'
+        return None
+
+    def _check_hello(self, kind, header, nonce):
+        """Reason to reject a worker's HELLO reply, or None."""
+        if kind != MSG_HELLO or header.get('version') != self.engine['version']:
+            return "Worker runs another rule-base version"
+        if self.secret is None:
+            return "Worker requires a shared secret" if 'challenge' in header else None
+        if not isinstance(header.get('challenge'), str) or not hmac.compare_digest(
+                str(header.get('proof', '')), _proof(self.secret, 'worker', nonce)):
+            return "Worker failed shared-secret authentication"
+        return None
+
+    def _worker_loop(self, address):
+        key = f"{address[0]}:{address[1]}"
+        stats = self.worker_stats[key]
+        sock = None
+        consecutive_failures = 0
+        while True:
+            if sock is None:
+                sock = self._connect(address, key)
+                if sock is None:
+                    return
+            shard_id = self._next_shard(key)
+            if shard_id is None:
+                break
+            stats['state'] = 'busy'
+            try:
+                scores, seconds = self._score_remote(sock, shard_id)
+            except (OSError, ConnectionError, ValueError) as e:
+                stats['failures'] += 1
+                stats['last_error'] = f"{type(e).__name__}: {e}"
+                self._release(shard_id, stats['last_error'])
+                sock.close()
+                sock = None
+                consecutive_failures += 1
+                if consecutive_failures >= self.max_reconnects:
+                    stats['state'] = 'lost'
+                    return
+                stats['state'] = 'reconnecting'
+                time.sleep(self.reconnect_delay * 2 ** (consecutive_failures - 1))
+                continue
+            except RuntimeError as e:
+                stats['failures'] += 1
+                stats['last_error'] = str(e)
+                self._release(shard_id, str(e))
+                continue
+            self._commit(shard_id, scores, key, seconds)
+            consecutive_failures = 0
+            stats['state'] = 'idle'
+        stats['state'] = 'done'
+        sock.close()
+
+    def _score_remote(self, sock, shard_id):
+        """Send a shard and collect its streamed scores; RuntimeError on a worker error frame."""
+        inputs = self._load(shard_id)
+        send_message(sock, MSG_SHARD, {'shard_id': shard_id, 'attempt': self._attempts[shard_id]}, inputs)
+        n_diseases = len(self.engine['diseases'])
+        scores = np.empty((len(inputs), n_diseases), dtype=np.float32)
+        while True:
+            kind, header, array = recv_message(sock, scores.nbytes, '<f4', n_diseases)
+            if header.get('shard_id') != shard_id:
+                raise ValueError(f"Unexpected frame for shard {header.get('shard_id')}")
+            if kind == MSG_SCORES:
+                offset = header.get('offset')
+                if array is None or not isinstance(offset, int) or not 0 <= offset <= len(inputs) - len(array):
+                    raise ValueError(f"Score frame outside shard {shard_id}")
+                scores[offset:offset + len(array)] = array
+            elif kind == MSG_DONE:
+                if header['rows'] != len(inputs):
+                    raise ValueError(f"Worker scored {header['rows']} of {len(inputs)} rows")
+                return scores, header['seconds']
+            elif kind == MSG_ERROR:
+                raise RuntimeError(header['message'])
+
+    def status(self):
+        """
+        Progress and throughput, e.g. for the dashboard.
+
+        Returns:
+            dict: rows, rows_done, shards, committed, inflight, pending, failed, retries,
+                  duplicates, elapsed_s, rows_per_s, recent_rows_per_s and workers
+                  (address -> state, name, shards, rows, rows_per_s, failures, last_error)
+        """
+        with self._condition:
+            now = time.time()
+            while self._commits and self._commits[0][0] < now - THROUGHPUT_WINDOW:
+                self._commits.popleft()
+            elapsed = ((self.finished or now) - self.started) if self.started else 0.0
+            window = min(THROUGHPUT_WINDOW, elapsed) or 1.0
+            workers = {key: dict(stats, rows_per_s=stats['rows'] / stats['busy_s'] if stats['busy_s'] else None)
+                       for key, stats in self.worker_stats.items()}
+            return {
+                'rows': self.n_rows,
+                'rows_done': self.rows_done,
+                'shards': len(self._sizes),
+                'committed': len(self.store.committed) if self.store else 0,
+                'inflight': len(self._inflight),
+                'pending': len(self._pending),
+                'failed': len(self._failed),
+                'retries': self.retries,
+                'duplicates': self.duplicates,
+                'elapsed_s': elapsed,
+                'rows_per_s': self.rows_done / elapsed if elapsed else None,
+                'recent_rows_per_s': sum(rows for _, rows in self._commits) / window,
+                'workers': workers,
+            }
@@ -0,0 +1,421 @@
+"""
+Fleet-Wide Streaming Statistics
+Fixed-memory histograms of rule firing strengths, disease scores and input values, updated
+from every scored batch. Snapshots from several worker processes merge exactly (counts add
+up), and the rule statistics are exported as a table for the Rule Base tab.
+"""
+
+import os
+import socket
+import threading
+import time
+import zipfile
+
+import numpy as np
+from knowledge.batch_inference import diagnose_batch
+from knowledge.validation import STATUS_REJECTED, validate_inputs
+
+
+# Bins per histogram; quantiles are exact to 1 / DEFAULT_BINS of each range
+DEFAULT_BINS = 100
+
+# Seconds between the snapshots a FleetRecorder writes
+DEFAULT_SNAPSHOT_SECONDS = 60.0
+
+# Errors of unreadable or incompatible snapshot files, which merging skips
+_SNAPSHOT_ERRORS = (ValueError, KeyError, IndexError, OSError, EOFError, zipfile.BadZipFile)
+
+
+class StreamingHistograms:
+    """
+    Fixed-width histograms of several bounded quantities (one row each).
+
+    Besides the bin counts, count, sum, sum of squares, min, max and the
+    number of values below / above the range are tracked; values outside the
+    range are counted in the first / last bin.
+
+    Args:
+        low: Lower bounds of shape (n,)
+        high: Upper bounds of shape (n,)
+        bins: Number of bins
+    """
+
+    _ARRAYS = ('counts', 'count', 'total', 'total_sq', 'minimum', 'maximum', 'below', 'above')
+
+    def __init__(self, low, high, bins=DEFAULT_BINS):
+        self.low = np.asarray(low, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.bins = bins
+        n = len(self.low)
+        self.counts = np.zeros((n, bins), dtype=np.int64)
+        self.count = np.zeros(n, dtype=np.int64)
+        self.total = np.zeros(n)
+        self.total_sq = np.zeros(n)
+        self.minimum = np.full(n, np.inf)
+        self.maximum = np.full(n, -np.inf)
+        self.below = np.zeros(n, dtype=np.int64)
+        self.above = np.zeros(n, dtype=np.int64)
+
+    def update(self, values, mask=None):
+        """
+        Add a batch of observations.
+
+        Args:
+            values: Array of shape (N, n)
+            mask: Optional boolean array of shape (N, n); only True entries are added
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(-1, len(self.low))
+        if mask is None:
+            mask = np.ones(values.shape, dtype=bool)
+        mask = mask & ~np.isnan(values)
+
+        rows = np.broadcast_to(np.arange(len(self.low)), values.shape)[mask]
+        kept = values[mask]
+        position = (kept - self.low[rows]) / (self.high[rows] - self.low[rows]) * self.bins
+        bin_index = np.clip(np.floor(position), 0, self.bins - 1).astype(np.intp)
+        self.counts += np.bincount(rows * self.bins + bin_index, minlength=self.counts.size).reshape(self.counts.shape)
+
+        n = len(self.low)
+        self.count += np.bincount(rows, minlength=n)
+        self.total += np.bincount(rows, weights=kept, minlength=n)
+        self.total_sq += np.bincount(rows, weights=kept * kept, minlength=n)
+        self.below += np.bincount(rows[kept < self.low[rows]], minlength=n)
+        self.above += np.bincount(rows[kept > self.high[rows]], minlength=n)
+        if len(values):
+            self.minimum = np.minimum(self.minimum, np.where(mask, values, np.inf).min(axis=0))
+            self.maximum = np.maximum(self.maximum, np.where(mask, values, -np.inf).max(axis=0))
+
+    def check_compatible(self, other):
+        """Raise ValueError unless other has the same ranges and bins."""
+        if (other.bins != self.bins or other.counts.shape != self.counts.shape
+                or not (np.array_equal(other.low, self.low) and np.array_equal(other.high, self.high))):
+            raise ValueError("Histograms have different ranges or bins")
+
+    def merge(self, other):
+        """Add another histogram set with the same ranges and bins."""
+        self.check_compatible(other)
+        for name in ('counts', 'count', 'total', 'total_sq', 'below', 'above'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.minimum = np.minimum(self.minimum, other.minimum)
+        self.maximum = np.maximum(self.maximum, other.maximum)
+
+    def mean(self):
+        """Mean per row (NaN for rows without observations)."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.total / self.count
+
+    def quantiles(self, q):
+        """
+        Quantiles per row, interpolated linearly within bins.
+
+        Args:
+            q: Quantile levels in [0, 1]
+
+        Returns:
+            np.ndarray: Shape (n, len(q)); NaN for rows without observations
+        """
+        q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        cumulative = np.cumsum(self.counts, axis=1)
+        result = np.full((len(self.low), len(q)), np.nan)
+        width = (self.high - self.low) / self.bins
+        for row in np.flatnonzero(self.count):
+            target = q * self.count[row]
+            index = np.clip(np.searchsorted(cumulative[row], target, side='left'), 0, self.bins - 1)
+            before = np.where(index > 0, cumulative[row][index - 1], 0)
+            in_bin = np.maximum(self.counts[row][index], 1)
+            fraction = np.clip((target - before) / in_bin, 0.0, 1.0)
+            result[row] = self.low[row] + (index + fraction) * width[row]
+        return np.clip(result, self.minimum[:, None], self.maximum[:, None])
+
+    def to_arrays(self, prefix):
+        """Arrays describing the state, keyed with a prefix (for np.savez)."""
+        arrays = {f"{prefix}_{name}": getattr(self, name) for name in self._ARRAYS}
+        arrays[f"{prefix}_low"], arrays[f"{prefix}_high"] = self.low, self.high
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix):
+        """Inverse of to_arrays."""
+        histograms = cls(arrays[f"{prefix}_low"], arrays[f"{prefix}_high"], arrays[f"{prefix}_counts"].shape[1])
+        for name in cls._ARRAYS:
+            setattr(histograms, name, np.array(arrays[f"{prefix}_{name}"]))
+        return histograms
+
+
+class FleetStatistics:
+    """
+    Streaming statistics of one rule base: rule firing strengths (positive
+    strengths only, with the number of rows each rule fired in), disease
+    scores and input values.
+
+    Args:
+        engine: Compiled engine from compile_rule_base
+        bins: Bins per histogram
+    """
+
+    def __init__(self, engine, bins=DEFAULT_BINS):
+        self.version = engine['version']
+        self.rule_ids = np.asarray(engine['rule_ids'])
+        self.rules = engine['rules']
+        self.diseases = list(engine['diseases'])
+        self.input_names = list(engine['input_names'])
+        self.rows = 0
+        n_rules, n_diseases = len(self.rule_ids), len(self.diseases)
+        self.strengths = StreamingHistograms(np.zeros(n_rules), np.ones(n_rules), bins)
+        self.scores = StreamingHistograms(np.zeros(n_diseases), np.ones(n_diseases), bins)
+        self.inputs = StreamingHistograms(engine['input_bounds'][:, 0], engine['input_bounds'][:, 1], bins)
+
+    def update(self, inputs, scores, strengths):
+        """
+        Add one scored batch.
+
+        Args:
+            inputs: Array of shape (N, n_inputs)
+            scores: Array of shape (N, n_diseases)
+            strengths: Rule firing strengths of shape (N, n_rules)
+        """
+        strengths = np.asarray(strengths, dtype=np.float64).reshape(-1, len(self.rule_ids))
+        self.rows += len(strengths)
+        self.strengths.update(strengths, strengths > 0)
+        self.scores.update(scores)
+        self.inputs.update(inputs)
+
+    def observe(self, inputs, engine, **kwargs):
+        """
+        Score a batch with diagnose_batch and add it.
+
+        Args:
+            inputs: Array of shape (N, n_inputs)
+            engine: Compiled engine (same version as the statistics)
+            **kwargs: Passed on to diagnose_batch
+
+        Returns:
+            np.ndarray: The risk scores
+        """
+        scores, strengths = diagnose_batch(inputs, engine, return_strengths=True, **kwargs)
+        self.update(inputs, scores, strengths)
+        return scores
+
+    def merge(self, other):
+        """
+        Add the statistics of another process for the same rule-base version.
+
+        Everything is checked before anything is added, so a rejected merge
+        leaves the statistics unchanged.
+
+        Raises:
+            ValueError: If the version, ranges or bins differ
+        """
+        if other.version != self.version:
+            raise ValueError("Cannot merge statistics of different rule-base versions")
+        for prefix in ('strengths', 'scores', 'inputs'):
+            getattr(self, prefix).check_compatible(getattr(other, prefix))
+        self.rows += other.rows
+        self.strengths.merge(other.strengths)
+        self.scores.merge(other.scores)
+        self.inputs.merge(other.inputs)
+
+    def save(self, path):
+        """
+        Write a snapshot (.npz) that load_snapshot and merge accept.
+
+        The file is written next to path and renamed into place, so readers
+        never see a partial snapshot.
+        """
+        arrays = {}
+        for prefix in ('strengths', 'scores', 'inputs'):
+            arrays.update(getattr(self, prefix).to_arrays(prefix))
+        path = os.fspath(path)
+        if not path.endswith('.npz'):
+            path += '.npz'
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, version=np.array(self.version), rows=np.array(self.rows), **arrays)
+        os.replace(tmp_path, path)
+
+    def rule_table(self, quantiles=(0.5, 0.9)):
+        """
+        Per-rule firing statistics, e.g. for the Rule Base tab.
+
+        Args:
+            quantiles: Quantile levels of the positive firing strengths
+
+        Returns:
+            list: One dict per rule with rule_id, disease, risk, fired (rows with a
+                  positive strength), fired_share, mean_strength (when fired), the
+                  quantiles as p50, p90, ... and max_strength
+        """
+        strength_quantiles = self.strengths.quantiles(quantiles)
+        means = self.strengths.mean()
+        table = []
+        for i, rule in enumerate(self.rules):
+            fired = int(self.strengths.count[i])
+            row = {
+                'rule_id': int(self.rule_ids[i]),
+                'disease': rule['disease'],
+                'risk': rule['risk'],
+                'fired': fired,
+                'fired_share': fired / self.rows if self.rows else 0.0,
+                'mean_strength': float(means[i]) if fired else None,
+                'max_strength': float(self.strengths.maximum[i]) if fired else None,
+            }
+            for level, value in zip(quantiles, strength_quantiles[i]):
+                row[f"p{int(round(level * 100))}"] = float(value) if fired else None
+            table.append(row)
+        return table
+
+    def never_fired(self):
+        """Ids of the rules that did not fire in any observed row."""
+        return [int(rule_id) for rule_id, count in zip(self.rule_ids, self.strengths.count) if count == 0]
+
+
+def load_snapshot(path, engine):
+    """
+    Read a snapshot written by FleetStatistics.save.
+
+    Args:
+        path: .npz file path
+        engine: Compiled engine of the same rule-base version
+
+    Returns:
+        FleetStatistics
+
+    Raises:
+        ValueError: If the snapshot belongs to another rule-base version
+    """
+    with np.load(path) as data:
+        if str(data['version']) != engine['version']:
+            raise ValueError(f"Snapshot {path} is for another rule-base version")
+        arrays = {name: data[name] for name in data.files}
+    stats = FleetStatistics(engine, bins=arrays['scores_counts'].shape[1])
+    stats.rows = int(arrays['rows'])
+    for prefix in ('strengths', 'scores', 'inputs'):
+        setattr(stats, prefix, StreamingHistograms.from_arrays(arrays, prefix))
+    return stats
+
+
+def merge_snapshots(paths, engine, bins=DEFAULT_BINS):
+    """
+    Merge the snapshots of several worker processes.
+
+    Snapshots with the given bins are merged; only when none has them, those
+    with the bins of the first readable snapshot are. Snapshots of other
+    rule-base versions or bins, or that cannot be read, are skipped.
+
+    Args:
+        paths: Snapshot file paths
+        engine: Compiled engine
+        bins: Preferred bins (and the bins used when there is no snapshot)
+
+    Returns:
+        tuple: (merged FleetStatistics, number of snapshots merged)
+    """
+    snapshots = []
+    for path in paths:
+        try:
+            snapshots.append(load_snapshot(path, engine))
+        except _SNAPSHOT_ERRORS:
+            continue
+    if snapshots and all(snapshot.strengths.bins != bins for snapshot in snapshots):
+        bins = snapshots[0].strengths.bins
+    merged = FleetStatistics(engine, bins)
+    n_merged = 0
+    for snapshot in snapshots:
+        try:
+            merged.merge(snapshot)
+        except ValueError:
+            continue
+        n_merged += 1
+    return merged, n_merged
+
+
+class FleetRecorder:
+    """
+    Thread-safe FleetStatistics of one process that writes itself to a
+    snapshot directory at most every snapshot_seconds (checked as batches
+    arrive), for merge_snapshots to combine with the other processes.
+
+    Args:
+        engine: Compiled engine from compile_rule_base
+        directory: Snapshot directory (created if missing)
+        snapshot_seconds: Minimum seconds between snapshots
+        name: Snapshot file name without suffix (defaults to <host>-<pid>)
+        bins: Bins per histogram
+    """
+
+    def __init__(self, engine, directory, snapshot_seconds=DEFAULT_SNAPSHOT_SECONDS, name=None, bins=DEFAULT_BINS):
+        os.makedirs(directory, exist_ok=True)
+        self.engine = engine
+        self.statistics = FleetStatistics(engine, bins)
+        self.snapshot_seconds = snapshot_seconds
+        self.path = os.path.join(directory, f"{name or f'{socket.gethostname()}-{os.getpid()}'}.npz")
+        self.snapshots = 0
+        self._lock = threading.Lock()
+        self._last_snapshot = time.monotonic()
+
+    def update(self, inputs, scores, strengths):
+        """Add one scored batch (see FleetStatistics.update) and snapshot if due."""
+        with self._lock:
+            self.statistics.update(inputs, scores, strengths)
+            if time.monotonic() - self._last_snapshot >= self.snapshot_seconds:
+                self._save()
+
+    def observe(self, inputs, engine=None, **kwargs):
+        """
+        Score a batch with diagnose_batch and add it.
+
+        Args:
+            inputs: Array of shape (N, n_inputs)
+            engine: Compiled engine (defaults to the recorder's)
+            **kwargs: Passed on to diagnose_batch
+
+        Returns:
+            np.ndarray: The risk scores
+        """
+        scores, strengths = diagnose_batch(inputs, engine or self.engine, return_strengths=True, **kwargs)
+        self.update(inputs, scores, strengths)
+        return scores
+
+    def observe_validated(self, inputs, policy='reject', impute_values=None):
+        """
+        diagnose_batch_validated that adds the accepted rows.
+
+        Returns:
+            tuple: (scores of shape (N, n_diseases) with NaN for rejected rows, row status of shape (N,))
+        """
+        values, status = validate_inputs(inputs, self.engine, policy, impute_values)
+        scores = np.full((len(values), len(self.engine['diseases'])), np.nan)
+        accepted = (status & STATUS_REJECTED) == 0
+        if accepted.any():
+            scores[accepted] = self.observe(values[accepted])
+        return scores, status
+
+    def save(self):
+        """Write the snapshot now."""
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        self.statistics.save(self.path)
+        self.snapshots += 1
+        self._last_snapshot = time.monotonic()
+
+
+def fleet_recorder_from_env(engine, name=None, environ=None):
+    """
+    FleetRecorder writing to DIAGNOSIS_STATS_DIR every DIAGNOSIS_STATS_SECONDS.
+
+    Args:
+        engine: Compiled engine from compile_rule_base
+        name: Snapshot file name (defaults to <host>-<pid>)
+        environ: Mapping to read instead of os.environ
+
+    Returns:
+        FleetRecorder, or None when DIAGNOSIS_STATS_DIR is not set
+    """
+    environ = os.environ if environ is None else environ
+    if not environ.get('DIAGNOSIS_STATS_DIR'):
+        return None
+    seconds = environ.get('DIAGNOSIS_STATS_SECONDS')
+    return FleetRecorder(engine, environ['DIAGNOSIS_STATS_DIR'],
+                         float(seconds) if seconds else DEFAULT_SNAPSHOT_SECONDS, name)
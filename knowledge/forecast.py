@@ -0,0 +1,104 @@
+"""
+Forecast Ensemble Risk Scoring
+Scores weather-forecast ensembles ([members, steps, 9] arrays) through the batched engine
+and summarizes the distribution of disease risk over the forecast horizon.
+"""
+
+import numpy as np
+from knowledge.batch_inference import diagnose_batch, DEFAULT_CHUNK_SIZE
+
+
+# How each input is reduced from hourly steps to one daily value.
+# Hourly Rain is mm per step and hourly LeafWet is wet hours per step (0-1),
+# so both are summed; everything else is averaged over the day.
+DAILY_AGGREGATIONS = {
+    'Temp': 'mean',
+    'RH': 'mean',
+    'Rain': 'sum',
+    'LeafWet': 'sum',
+    'SoilM': 'mean',
+    'Drain': 'mean',
+    'SeedHealth': 'mean',
+    'Vector': 'mean',
+    'Stage': 'mean'
+}
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Exceedance thresholds match the interpret_risk cut points (Moderate, High)
+DEFAULT_THRESHOLDS = (0.4, 0.6)
+
+
+def aggregate_daily(forecast, engine, steps_per_day=24):
+    """
+    Reduce an hourly ensemble forecast to daily model inputs.
+
+    Args:
+        forecast: Array of shape (members, steps, n_inputs); steps must be a multiple of steps_per_day
+        engine: Compiled engine from compile_rule_base (defines the input order)
+        steps_per_day: Number of forecast steps per day
+
+    Returns:
+        np.ndarray: Array of shape (members, days, n_inputs)
+    """
+    forecast = np.asarray(forecast, dtype=np.float64)
+    members, steps, n_inputs = forecast.shape
+    if steps % steps_per_day != 0:
+        raise ValueError(f"Forecast has {steps} steps, not a multiple of {steps_per_day} steps per day")
+
+    days = forecast.reshape(members, steps // steps_per_day, steps_per_day, n_inputs)
+    daily = np.empty((members, steps // steps_per_day, n_inputs))
+    for var_idx, var_name in enumerate(engine['input_names']):
+        if DAILY_AGGREGATIONS[var_name] == 'sum':
+            daily[..., var_idx] = days[..., var_idx].sum(axis=2)
+        else:
+            daily[..., var_idx] = days[..., var_idx].mean(axis=2)
+    return daily
+
+
+def score_ensemble(forecast, engine, percentiles=DEFAULT_PERCENTILES,
+                   thresholds=DEFAULT_THRESHOLDS, chunk_size=DEFAULT_CHUNK_SIZE,
+                   keep_scores=False):
+    """
+    Score every member and step of an ensemble forecast in one batched call.
+
+    Args:
+        forecast: Array of shape (members, steps, n_inputs), hourly or daily (see aggregate_daily)
+        engine: Compiled engine from compile_rule_base
+        percentiles: Percentiles of risk across members to report per step
+        thresholds: Risk levels for the exceedance probabilities
+        chunk_size: Rows per vectorized pass in diagnose_batch
+        keep_scores: Also return the raw (members, steps, n_diseases) score array
+
+    Returns:
+        dict: {
+            'diseases': list of disease names (last axis of every array),
+            'percentile_levels': the requested percentiles,
+            'percentiles': array (len(percentiles), steps, n_diseases),
+            'thresholds': the requested thresholds,
+            'exceedance': array (len(thresholds), steps, n_diseases) of P(risk >= threshold),
+            'mean': array (steps, n_diseases),
+            'scores': raw scores (only if keep_scores)
+        }
+    """
+    forecast = np.asarray(forecast, dtype=np.float64)
+    if forecast.ndim != 3 or forecast.shape[2] != len(engine['input_names']):
+        raise ValueError(f"Expected forecast of shape (members, steps, {len(engine['input_names'])}), "
+                         f"got {forecast.shape}")
+
+    members, steps, n_inputs = forecast.shape
+    scores = diagnose_batch(forecast.reshape(-1, n_inputs), engine, chunk_size=chunk_size)
+    scores = scores.reshape(members, steps, -1)
+
+    thresholds_arr = np.asarray(thresholds, dtype=np.float64)
+    result = {
+        'diseases': list(engine['diseases']),
+        'percentile_levels': list(percentiles),
+        'percentiles': np.percentile(scores, percentiles, axis=0),
+        'thresholds': list(thresholds),
+        'exceedance': (scores[None, ...] >= thresholds_arr[:, None, None, None]).mean(axis=1),
+        'mean': scores.mean(axis=0),
+    }
+    if keep_scores:
+        result['scores'] = scores
+    return result
@@ -4,23 +4,106 @@ Implements Mamdani fuzzy inference with triangular membership functions.
 Based on research paper fuzzy model with 9 input variables and 10 disease outputs.
 """
 
+import weakref
+
 import numpy as np
 import skfuzzy as fuzz
 from skfuzzy import control as ctrl
 from knowledge.disease_knowledge import FUZZY_RULES, get_all_diseases
 
 
+# Triangular membership function parameters of the 9 input variables.
+# 'universe' holds the np.arange(start, stop, step) arguments of the sampled universe,
+# each term maps to the [a, b, c] params of its triangle:
+# triangle starts at a, peak (100% membership) is at b, triangle ends at c
+INPUT_MF_PARAMS = {
+    # 1. Temperature (10-40°C)
+    'Temp': {'universe': (10, 40.1, 0.1), 'terms': {
+        'Low': (10, 10, 20),            # Left Shoulder
+        'Moderate': (18, 24, 30),       # Standard Triangle
+        'High': (28, 40, 40)}},         # Right Shoulder
+    # 2. Relative Humidity (10-100%)
+    'RH': {'universe': (10, 100.1, 0.1), 'terms': {
+        'Low': (10, 10, 45),
+        'Moderate': (40, 60, 80),
+        'High': (75, 100, 100)}},
+    # 3. Rainfall (0-200 mm)
+    'Rain': {'universe': (0, 200.1, 0.1), 'terms': {
+        'None': (0, 0, 10),
+        'Low': (5, 25, 50),
+        'High': (40, 100, 200)}},
+    # 4. Leaf Wetness Duration (0-24 hours/day)
+    'LeafWet': {'universe': (0, 24.1, 0.1), 'terms': {
+        'Short': (0, 0, 6),
+        'Medium': (4, 10, 16),
+        'Long': (12, 24, 24)}},
+    # 5. Soil Moisture (0-100%)
+    'SoilM': {'universe': (0, 100.1, 0.1), 'terms': {
+        'Dry': (0, 0, 30),
+        'Opt': (20, 45, 65),
+        'Wet': (55, 100, 100)}},
+    # 6. Soil Drainage (0-10 scale)
+    'Drain': {'universe': (0, 10.1, 0.1), 'terms': {
+        'Poor': (0, 0, 3),
+        'Moderate': (2.5, 5, 7.5),
+        'Good': (7, 10, 10)}},
+    # 7. Seed Health (0-10 scale)
+    'SeedHealth': {'universe': (0, 10.1, 0.1), 'terms': {
+        'Poor': (0, 0, 3),
+        'Fair': (2.5, 5, 7.5),
+        'Good': (7, 10, 10)}},
+    # 8. Vector Pressure (0-10 scale)
+    'Vector': {'universe': (0, 10.1, 0.1), 'terms': {
+        'None': (0, 0, 2),
+        'Moderate': (1.5, 5, 8.5),
+        'High': (7.5, 10, 10)}},
+    # 9. Crop Stage (0-3: Seedling=0, Vegetative=1, Flowering=2, Fruiting=3)
+    'Stage': {'universe': (0, 3.1, 0.1), 'terms': {
+        'Seedling': (0, 0, 0.5),
+        'Vegetative': (0.5, 1, 1.5),
+        'Flowering': (1.5, 2, 2.5),
+        'Fruiting': (2.5, 3, 3)}},
+}
+
+
+# Decimals kept in sampled input universes
+UNIVERSE_DECIMALS = 10
+
+# Disease-subset simulations per control system (see subset_simulation)
+_SUBSET_SIMULATIONS = weakref.WeakKeyDictionary()
+
+
+def create_input_variable(var_name, spec=None):
+    """
+    Create one sampled fuzzy input variable from its trimf parameters.
+
+    Args:
+        var_name: Input variable name (key of INPUT_MF_PARAMS)
+        spec: Parameter dict in INPUT_MF_PARAMS format (defaults to INPUT_MF_PARAMS[var_name])
+
+    Returns:
+        skfuzzy Antecedent object
+    """
+    if spec is None:
+        spec = INPUT_MF_PARAMS[var_name]
+    # Rounding removes np.arange drift (e.g. 79.99999999999997 for 80), so triangle
+    # corners fall exactly on universe points and memberships beyond them are exactly 0
+    var = ctrl.Antecedent(np.round(np.arange(*spec['universe']), UNIVERSE_DECIMALS), var_name)
+    for term_name, params in spec['terms'].items():
+        var[term_name] = fuzz.trimf(var.universe, list(params))
+    return var
+
+
 def create_input_variables():
     """
     Create all 9 fuzzy input variables with their membership functions.
     All membership functions use triangular (trimf) as per research paper.
     
     Explanation:
-    temp = ctrl.Antecedent creates the input variable
-    np.arange creates UoD with 10-40.1 being range and 0.1 is resolution
+    ctrl.Antecedent creates the input variable
+    np.arange creates the UoD, e.g. 10-40.1 being range and 0.1 is resolution for Temp
     
-    next 3 lines define fuzzy sets
-    temp.universe correspond to params [a,b,c] of triangle:
+    each term's params [a,b,c] (INPUT_MF_PARAMS) define its fuzzy set:
     triangle starts at a
     peak (100% membership) is at b
     triangle ends at c
@@ -28,73 +111,43 @@ def create_input_variables():
     Returns:
         dict: Dictionary of skfuzzy Antecedent objects
     """
-    
-    # 1. Temperature (10-40°C)
-    temp = ctrl.Antecedent(np.arange(10, 40.1, 0.1), 'Temp')
-    temp['Low'] = fuzz.trimf(temp.universe, [10, 10, 20]) # Left Shoulder
-    temp['Moderate'] = fuzz.trimf(temp.universe, [18, 24, 30]) # Standard Triangle
-    temp['High'] = fuzz.trimf(temp.universe, [28, 40, 40]) # Right Shoulder
-    
-    # 2. Relative Humidity (10-100%)
-    rh = ctrl.Antecedent(np.arange(10, 100.1, 0.1), 'RH')
-    rh['Low'] = fuzz.trimf(rh.universe, [10, 10, 45])
-    rh['Moderate'] = fuzz.trimf(rh.universe, [40, 60, 80])
-    rh['High'] = fuzz.trimf(rh.universe, [75, 100, 100])
-    
-    # 3. Rainfall (0-200 mm)
-    rain = ctrl.Antecedent(np.arange(0, 200.1, 0.1), 'Rain')
-    rain['None'] = fuzz.trimf(rain.universe, [0, 0, 10])
-    rain['Low'] = fuzz.trimf(rain.universe, [5, 25, 50])
-    rain['High'] = fuzz.trimf(rain.universe, [40, 100, 200])
-    
-    # 4. Leaf Wetness Duration (0-24 hours/day)
-    leafwet = ctrl.Antecedent(np.arange(0, 24.1, 0.1), 'LeafWet')
-    leafwet['Short'] = fuzz.trimf(leafwet.universe, [0, 0, 6])
-    leafwet['Medium'] = fuzz.trimf(leafwet.universe, [4, 10, 16])
-    leafwet['Long'] = fuzz.trimf(leafwet.universe, [12, 24, 24])
-    
-    # 5. Soil Moisture (0-100%)
-    soilm = ctrl.Antecedent(np.arange(0, 100.1, 0.1), 'SoilM')
-    soilm['Dry'] = fuzz.trimf(soilm.universe, [0, 0, 30])
-    soilm['Opt'] = fuzz.trimf(soilm.universe, [20, 45, 65])
-    soilm['Wet'] = fuzz.trimf(soilm.universe, [55, 100, 100])
-    
-    # 6. Soil Drainage (0-10 scale)
-    drain = ctrl.Antecedent(np.arange(0, 10.1, 0.1), 'Drain')
-    drain['Poor'] = fuzz.trimf(drain.universe, [0, 0, 3])
-    drain['Moderate'] = fuzz.trimf(drain.universe, [2.5, 5, 7.5])
-    drain['Good'] = fuzz.trimf(drain.universe, [7, 10, 10])
-    
-    # 7. Seed Health (0-10 scale)
-    seedhealth = ctrl.Antecedent(np.arange(0, 10.1, 0.1), 'SeedHealth')
-    seedhealth['Poor'] = fuzz.trimf(seedhealth.universe, [0, 0, 3])
-    seedhealth['Fair'] = fuzz.trimf(seedhealth.universe, [2.5, 5, 7.5])
-    seedhealth['Good'] = fuzz.trimf(seedhealth.universe, [7, 10, 10])
-    
-    # 8. Vector Pressure (0-10 scale)
-    vector = ctrl.Antecedent(np.arange(0, 10.1, 0.1), 'Vector')
-    vector['None'] = fuzz.trimf(vector.universe, [0, 0, 2])
-    vector['Moderate'] = fuzz.trimf(vector.universe, [1.5, 5, 8.5])
-    vector['High'] = fuzz.trimf(vector.universe, [7.5, 10, 10])
-    
-    # 9. Crop Stage (0-3: Seedling=0, Vegetative=1, Flowering=2, Fruiting=3)
-    stage = ctrl.Antecedent(np.arange(0, 3.1, 0.1), 'Stage')
-    stage['Seedling'] = fuzz.trimf(stage.universe, [0, 0, 0.5])
-    stage['Vegetative'] = fuzz.trimf(stage.universe, [0.5, 1, 1.5])
-    stage['Flowering'] = fuzz.trimf(stage.universe, [1.5, 2, 2.5])
-    stage['Fruiting'] = fuzz.trimf(stage.universe, [2.5, 3, 3])
-    
-    return {
-        'Temp': temp,
-        'RH': rh,
-        'Rain': rain,
-        'LeafWet': leafwet,
-        'SoilM': soilm,
-        'Drain': drain,
-        'SeedHealth': seedhealth,
-        'Vector': vector,
-        'Stage': stage
-    }
+    return {var_name: create_input_variable(var_name) for var_name in INPUT_MF_PARAMS}
+
+
+def universe_bounds(spec):
+    """
+    First and last point of a sampled universe, without sampling it.
+
+    Args:
+        spec: Parameter dict in INPUT_MF_PARAMS format
+
+    Returns:
+        tuple: (low, high) as floats
+    """
+    start, stop, step = spec['universe']
+    n_points = int(np.ceil((stop - start) / step))
+    return float(start), float(round(start + (n_points - 1) * step, UNIVERSE_DECIMALS))
+
+
+def trimf_membership(values, params):
+    """
+    Closed-form triangular membership, vectorized over values.
+
+    Equivalent to interpolating fuzz.trimf sampled on any universe that
+    contains a, b and c, without building the sampled arrays.
+
+    Args:
+        values: Array of crisp values
+        params: Triangle parameters (a, b, c) with a <= b <= c
+
+    Returns:
+        np.ndarray: Membership degrees in [0, 1], same shape as values
+    """
+    a, b, c = params
+    values = np.asarray(values, dtype=np.float64)
+    rising = (values - a) / (b - a) if b > a else (values >= b).astype(np.float64)
+    falling = (c - values) / (c - b) if c > b else (values <= b).astype(np.float64)
+    return np.clip(np.minimum(rising, falling), 0.0, 1.0)
 
 
 def create_output_variables():
@@ -166,7 +219,7 @@ def create_fuzzy_rules(input_vars, output_vars):
     return rules
 
 
-def create_control_systems(input_vars, output_vars, rules):
+def create_control_systems(input_vars, output_vars, rules, cache=True, flush_after_run=1000):
     """
     Create a single unified control system with all rules.
     All diseases are computed together with all inputs available.
@@ -175,31 +228,80 @@ def create_control_systems(input_vars, output_vars, rules):
         input_vars: Dictionary of input variables
         output_vars: Dictionary of output variables  
         rules: List of all fuzzy rules
+        cache: Keep per-input results for repeated inputs (skfuzzy caching)
+        flush_after_run: Distinct runs kept before skfuzzy flushes its state
     
     Returns:
         ControlSystemSimulation: Single simulation object for all diseases
     """
     # Create one unified control system with ALL rules
     ctrl_system = ctrl.ControlSystem(rules)
-    simulation = ctrl.ControlSystemSimulation(ctrl_system)
+    simulation = ctrl.ControlSystemSimulation(ctrl_system, cache=cache, flush_after_run=flush_after_run)
     
     print(f"🔍 Created unified control system with {len(rules)} rules for {len(output_vars)} diseases")
     
     return simulation
 
 
-def diagnose_diseases(input_values, disease_system):
+def subset_simulation(disease_system, diseases):
+    """
+    Simulation over only the rules of some diseases, sharing the given system's rules.
+
+    Built once per control system and disease subset; only the antecedents those
+    rules reference take part, so the other inputs are neither needed nor fuzzified.
+
+    Args:
+        disease_system: Unified ControlSystemSimulation object
+        diseases: Disease names
+
+    Returns:
+        ControlSystemSimulation: Simulation of the subset's rules
+    """
+    key = tuple(diseases)
+    subsets = _SUBSET_SIMULATIONS.setdefault(disease_system.ctrl, {})
+    if key not in subsets:
+        labels = {f"Rule {rule['id']}" for rule in FUZZY_RULES if rule['disease'] in key}
+        rules = [rule for rule in disease_system.ctrl.rules if str(rule.label) in labels]
+        if not rules:
+            raise ValueError(f"No rules for diseases {list(key)}")
+        subsets[key] = ctrl.ControlSystemSimulation(ctrl.ControlSystem(rules), cache=disease_system.cache,
+                                                    flush_after_run=disease_system._flush_after_run)
+    return subsets[key]
+
+
+def reset_simulation(disease_system):
+    """
+    Drop all per-input state of a simulation and of its disease-subset simulations.
+
+    The subsets share the system's rules and variables, so they are reset
+    together to keep their lookups of earlier runs consistent.
+
+    Args:
+        disease_system: Unified ControlSystemSimulation object
+    """
+    for simulation in [disease_system, *_SUBSET_SIMULATIONS.get(disease_system.ctrl, {}).values()]:
+        # skfuzzy's own flush: clears every StatePerSimulation of the control system
+        simulation._reset_simulation()
+
+
+def diagnose_diseases(input_values, disease_system, diseases=None):
     """
     Perform fuzzy inference to diagnose all diseases using unified system.
     
     Args:
         input_values: Dictionary of input variable values
         disease_system: Unified ControlSystemSimulation object
+        diseases: Optional disease names; only their rules are evaluated (see
+                  subset_simulation) and only the inputs they use are required
     
     Returns:
         dict: Dictionary of disease names to risk scores (0-1)
     """
     results = {}
+    if diseases is not None:
+        disease_system = subset_simulation(disease_system, diseases)
+        used_inputs = {antecedent.label for antecedent in disease_system.ctrl.antecedents}
+        input_values = {var: val for var, val in input_values.items() if var in used_inputs}
     
     # Debug: Print input values
     print("\n🔍 DEBUG - Input values received:")
@@ -215,7 +317,7 @@ def diagnose_diseases(input_values, disease_system):
         disease_system.compute()
         
         # Extract outputs for each disease
-        for disease in get_all_diseases():
+        for disease in diseases or get_all_diseases():
             try:
                 risk_score = disease_system.output[disease]
                 results[disease] = risk_score
@@ -230,7 +332,7 @@ def diagnose_diseases(input_values, disease_system):
         print(f"❌ Error during computation: {e}")
         import traceback
         traceback.print_exc()
-        for disease in get_all_diseases():
+        for disease in diseases or get_all_diseases():
             results[disease] = 0.0
     
     return results
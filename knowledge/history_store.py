@@ -0,0 +1,346 @@
+"""
+Diagnosis History Store
+Append-only, columnar storage of per-field diagnosis history (inputs and risk scores) in
+memory-mapped NumPy segments on local disk. Sealed segments are sorted by field and time
+and carry a sparse index of each field's row range, so a range query for one field is a
+binary search plus slices of the mapped columns, returned as views without copying.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Rows per segment (about 90 MB of columns per segment with float32 scores)
+DEFAULT_SEGMENT_ROWS = 1 << 20
+
+# Segments kept mapped at once
+DEFAULT_OPEN_SEGMENTS = 64
+
+# Score encodings: float32, or uint16 quantized over [0, 1] (max error 7.6e-6)
+SCORE_ENCODINGS = {'float32': np.float32, 'uint16': np.uint16}
+_UINT16_SCALE = 65535.0
+
+_COLUMNS = ('field', 'time', 'inputs', 'scores')
+_INDEX_DTYPE = np.dtype([('field', np.int32), ('start', np.int64), ('stop', np.int64),
+                         ('t_min', np.int64), ('t_max', np.int64)])
+
+
+def to_epoch_seconds(timestamps):
+    """Convert datetime64 values or numbers (seconds since the epoch) to int64 seconds."""
+    timestamps = np.asarray(timestamps)
+    if np.issubdtype(timestamps.dtype, np.datetime64):
+        return timestamps.astype('datetime64[s]').astype(np.int64)
+    return timestamps.astype(np.int64)
+
+
+def _write_json(path, data):
+    """Write a JSON file atomically (write to a temporary file, then rename)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class HistoryStore:
+    """
+    Append-only store of diagnosis rows: field id, timestamp, inputs and scores.
+
+    Rows go to the open (tail) segment in arrival order; when it is full it is
+    sealed: sorted by (field, time), written at its exact size and indexed by
+    field. Field ids are mapped to integer codes kept in fields.txt. One
+    process writes; any number may read.
+
+    Args:
+        path: Store directory (created if missing)
+        input_names: Input column names (required when creating a store)
+        diseases: Score column names (required when creating a store)
+        segment_rows: Rows per segment for a new store
+        score_encoding: One of SCORE_ENCODINGS for a new store
+        open_segments: Number of segments kept memory-mapped
+    """
+
+    def __init__(self, path, input_names=None, diseases=None, segment_rows=DEFAULT_SEGMENT_ROWS,
+                 score_encoding='float32', open_segments=DEFAULT_OPEN_SEGMENTS):
+        self.path = path
+        self._lock = threading.RLock()
+        self._mapped = OrderedDict()
+        self._open_segments = open_segments
+        meta_path = os.path.join(path, 'meta.json')
+
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            for name, given in (('input_names', input_names), ('diseases', diseases)):
+                if given is not None and list(given) != meta[name]:
+                    raise ValueError(f"Store at {path} has different {name}: {meta[name]}")
+        else:
+            if input_names is None or diseases is None:
+                raise ValueError("input_names and diseases are required to create a store")
+            if score_encoding not in SCORE_ENCODINGS:
+                raise ValueError(f"Unknown score encoding {score_encoding!r}")
+            os.makedirs(path, exist_ok=True)
+            meta = {'input_names': list(input_names), 'diseases': list(diseases),
+                    'segment_rows': int(segment_rows), 'score_encoding': score_encoding}
+            _write_json(meta_path, meta)
+
+        self.input_names = meta['input_names']
+        self.diseases = meta['diseases']
+        self.segment_rows = meta['segment_rows']
+        self.score_encoding = meta['score_encoding']
+
+        self._fields = []
+        fields_path = os.path.join(path, 'fields.txt')
+        if os.path.exists(fields_path):
+            with open(fields_path) as f:
+                self._fields = [line.rstrip('\n') for line in f if line.strip()]
+        self._field_codes = {field: code for code, field in enumerate(self._fields)}
+
+        # Sealed segments: name -> index; the tail segment is the last one if not sealed
+        self._segments = []
+        self._indexes = {}
+        self._tail = None
+        self._tail_rows = 0
+        for name in sorted(os.listdir(path)):
+            if not name.startswith('seg_'):
+                continue
+            with open(os.path.join(path, name, 'segment.json')) as f:
+                state = json.load(f)
+            self._segments.append(name)
+            if state['sealed']:
+                self._indexes[name] = np.load(os.path.join(path, name, 'index.npy'))
+            else:
+                self._tail, self._tail_rows = name, state['rows']
+
+    def __len__(self):
+        with self._lock:
+            sealed = sum(int(index['stop'].max(initial=0)) for index in self._indexes.values())
+            return sealed + self._tail_rows
+
+    @property
+    def fields(self):
+        """Field ids in the order they were first seen."""
+        return list(self._fields)
+
+    def _field_code(self, field_id):
+        code = self._field_codes.get(field_id)
+        if code is None:
+            if '\n' in field_id:
+                raise ValueError("Field ids cannot contain newlines")
+            code = self._field_codes[field_id] = len(self._fields)
+            self._fields.append(field_id)
+            with open(os.path.join(self.path, 'fields.txt'), 'a') as f:
+                f.write(field_id + '\n')
+        return code
+
+    def _columns(self, name):
+        """Memory-mapped columns of a segment (read-write for the tail)."""
+        columns = self._mapped.get(name)
+        if columns is not None:
+            self._mapped.move_to_end(name)
+            return columns
+        mode = 'r+' if name == self._tail else 'r'
+        columns = {column: np.load(os.path.join(self.path, name, f"{column}.npy"), mmap_mode=mode)
+                   for column in _COLUMNS}
+        self._mapped[name] = columns
+        while len(self._mapped) > self._open_segments:
+            self._mapped.popitem(last=False)
+        return columns
+
+    def _new_tail(self):
+        name = f"seg_{len(self._segments):08d}"
+        directory = os.path.join(self.path, name)
+        os.makedirs(directory)
+        shapes = {'field': (self.segment_rows,), 'time': (self.segment_rows,),
+                  'inputs': (self.segment_rows, len(self.input_names)),
+                  'scores': (self.segment_rows, len(self.diseases))}
+        dtypes = {'field': np.int32, 'time': np.int64, 'inputs': np.float32,
+                  'scores': SCORE_ENCODINGS[self.score_encoding]}
+        for column in _COLUMNS:
+            # Preallocated; on Linux the file stays sparse until rows are written
+            np.lib.format.open_memmap(os.path.join(directory, f"{column}.npy"), mode='w+',
+                                      dtype=dtypes[column], shape=shapes[column]).flush()
+        _write_json(os.path.join(directory, 'segment.json'), {'rows': 0, 'sealed': False})
+        self._segments.append(name)
+        self._tail, self._tail_rows = name, 0
+
+    def encode_scores(self, scores):
+        """Convert float scores to the stored encoding."""
+        scores = np.asarray(scores, dtype=np.float64)
+        if self.score_encoding == 'uint16':
+            return np.rint(np.clip(scores, 0.0, 1.0) * _UINT16_SCALE).astype(np.uint16)
+        return scores.astype(np.float32)
+
+    def decode_scores(self, stored):
+        """Convert stored scores back to float64."""
+        if self.score_encoding == 'uint16':
+            return stored / _UINT16_SCALE
+        return np.asarray(stored, dtype=np.float64)
+
+    def append(self, field_ids, timestamps, inputs, scores):
+        """
+        Append rows, e.g. one batch-scoring result.
+
+        Args:
+            field_ids: One field id per row (or a single id for all rows)
+            timestamps: datetime64 values or epoch seconds, one per row (or one for all)
+            inputs: Array of shape (N, n_inputs) in input_names order
+            scores: Array of shape (N, n_diseases) in diseases order
+        """
+        inputs = np.asarray(inputs, dtype=np.float32).reshape(-1, len(self.input_names))
+        scores = self.encode_scores(scores).reshape(-1, len(self.diseases))
+        n_rows = len(inputs)
+        if len(scores) != n_rows:
+            raise ValueError("inputs and scores must have the same number of rows")
+        times = np.broadcast_to(to_epoch_seconds(timestamps), (n_rows,))
+
+        with self._lock:
+            if isinstance(field_ids, str):
+                codes = np.full(n_rows, self._field_code(field_ids), dtype=np.int32)
+            else:
+                unique, inverse = np.unique(np.asarray(field_ids, dtype=str), return_inverse=True)
+                codes = np.array([self._field_code(str(field)) for field in unique], dtype=np.int32)[inverse]
+
+            done = 0
+            while done < n_rows:
+                if self._tail is None:
+                    self._new_tail()
+                columns = self._columns(self._tail)
+                take = min(n_rows - done, self.segment_rows - self._tail_rows)
+                rows = slice(self._tail_rows, self._tail_rows + take)
+                columns['field'][rows] = codes[done:done + take]
+                columns['time'][rows] = times[done:done + take]
+                columns['inputs'][rows] = inputs[done:done + take]
+                columns['scores'][rows] = scores[done:done + take]
+                for column in columns.values():
+                    column.flush()
+                self._tail_rows += take
+                done += take
+                # The row count is only advanced after the data is written
+                _write_json(os.path.join(self.path, self._tail, 'segment.json'),
+                            {'rows': self._tail_rows, 'sealed': False})
+                if self._tail_rows == self.segment_rows:
+                    self.seal()
+
+    def seal(self):
+        """Sort the tail segment by (field, time), write it at its exact size and index it."""
+        with self._lock:
+            if self._tail is None:
+                return
+            name, n_rows = self._tail, self._tail_rows
+            directory = os.path.join(self.path, name)
+            columns = self._columns(name)
+            order = np.lexsort((columns['time'][:n_rows], columns['field'][:n_rows]))
+            fields = columns['field'][:n_rows][order]
+            times = columns['time'][:n_rows][order]
+            for column in _COLUMNS:
+                np.save(os.path.join(directory, f"{column}.tmp.npy"), columns[column][:n_rows][order])
+
+            starts = np.flatnonzero(np.r_[True, fields[1:] != fields[:-1]]) if n_rows else np.zeros(0, np.intp)
+            stops = np.r_[starts[1:], n_rows].astype(np.int64)
+            index = np.zeros(len(starts), dtype=_INDEX_DTYPE)
+            index['field'], index['start'], index['stop'] = fields[starts], starts, stops
+            index['t_min'], index['t_max'] = times[starts], times[stops - 1]
+            np.save(os.path.join(directory, 'index.npy'), index)
+
+            self._mapped.pop(name, None)
+            del columns
+            for column in _COLUMNS:
+                os.replace(os.path.join(directory, f"{column}.tmp.npy"), os.path.join(directory, f"{column}.npy"))
+            _write_json(os.path.join(directory, 'segment.json'), {'rows': n_rows, 'sealed': True})
+            self._indexes[name] = index
+            self._tail, self._tail_rows = None, 0
+
+    def query(self, field_id, start=None, end=None):
+        """
+        Rows of one field with start <= time < end, segment by segment.
+
+        Chunks from sealed segments are views of the mapped columns (no copy);
+        the chunk from the unsealed tail segment is a copy.
+
+        Args:
+            field_id: Field id
+            start: Optional first timestamp (datetime64 or epoch seconds)
+            end: Optional end timestamp, exclusive
+
+        Returns:
+            list: Chunks {'time', 'inputs', 'scores'} in segment order; times are epoch
+                  seconds and scores are in the stored encoding (see decode_scores)
+        """
+        t_start = int(to_epoch_seconds(start)) if start is not None else np.iinfo(np.int64).min
+        t_end = int(to_epoch_seconds(end)) if end is not None else np.iinfo(np.int64).max
+        with self._lock:
+            code = self._field_codes.get(field_id)
+            if code is None:
+                return []
+
+            chunks = []
+            for name in self._segments:
+                if name == self._tail:
+                    columns = self._columns(name)
+                    times = columns['time'][:self._tail_rows]
+                    rows = np.flatnonzero((columns['field'][:self._tail_rows] == code)
+                                          & (times >= t_start) & (times < t_end))
+                    rows = rows[np.argsort(times[rows], kind='stable')]
+                    if len(rows):
+                        chunks.append({'time': times[rows], 'inputs': columns['inputs'][rows],
+                                       'scores': columns['scores'][rows]})
+                    continue
+
+                # Index entries are sorted by field code
+                index = self._indexes[name]
+                pos = int(np.searchsorted(index['field'], code))
+                if pos == len(index) or index['field'][pos] != code:
+                    continue
+                entry = index[pos]
+                if entry['t_max'] < t_start or entry['t_min'] >= t_end:
+                    continue
+                columns = self._columns(name)
+                first, last = int(entry['start']), int(entry['stop'])
+                field_times = columns['time'][first:last]
+                lo = first + int(np.searchsorted(field_times, t_start, side='left'))
+                hi = first + int(np.searchsorted(field_times, t_end, side='left'))
+                if hi > lo:
+                    chunks.append({column: columns[column][lo:hi] for column in ('time', 'inputs', 'scores')})
+            return chunks
+
+    def read(self, field_id, start=None, end=None):
+        """
+        query() concatenated into one copy, sorted by time, with decoded float64 scores.
+
+        Returns:
+            dict: {'time': datetime64[s] array, 'inputs': (M, n_inputs), 'scores': (M, n_diseases)}
+        """
+        chunks = self.query(field_id, start, end)
+        if not chunks:
+            return {'time': np.zeros(0, dtype='datetime64[s]'),
+                    'inputs': np.zeros((0, len(self.input_names)), dtype=np.float32),
+                    'scores': np.zeros((0, len(self.diseases)))}
+        times = np.concatenate([c['time'] for c in chunks])
+        order = np.argsort(times, kind='stable')
+        return {
+            'time': times[order].astype('datetime64[s]'),
+            'inputs': np.concatenate([c['inputs'] for c in chunks])[order],
+            'scores': self.decode_scores(np.concatenate([c['scores'] for c in chunks])[order]),
+        }
+
+
+def append_results(store, field_id, timestamp, input_values, results):
+    """
+    Append one diagnose_diseases result (input and result dicts) to a store.
+
+    Args:
+        store: HistoryStore
+        field_id: Field id
+        timestamp: datetime64 value or epoch seconds
+        input_values: Dictionary of input variable values
+        results: Dictionary of disease names to risk scores
+    """
+    store.append(field_id, timestamp,
+                 [[input_values[name] for name in store.input_names]],
+                 [[results.get(disease, 0.0) for disease in store.diseases]])
@@ -0,0 +1,120 @@
+"""
+Regional Roll-Ups
+Aggregates field risk scores by region (e.g. district): field counts, mean, max and
+quantile risk per disease, and the number of fields at each interpret_risk level. All
+aggregates are vectorized group-bys (bincount and sorted segments) with no per-field loop.
+"""
+
+import numpy as np
+from knowledge.batch_inference import RISK_LEVELS, interpret_risk_batch
+
+
+DEFAULT_QUANTILES = (0.5, 0.9)
+
+
+def encode_regions(region_names):
+    """
+    Map a region name per field to a region index per field.
+
+    Args:
+        region_names: Region name of every field
+
+    Returns:
+        tuple: (sorted unique region names, index array of shape (N,))
+    """
+    names, index = np.unique(np.asarray(region_names, dtype=str), return_inverse=True)
+    return names.tolist(), index.astype(np.intp)
+
+
+def region_rollup(region_index, scores, diseases, n_regions=None, region_names=None,
+                  quantiles=DEFAULT_QUANTILES):
+    """
+    Per-region aggregates of a score matrix.
+
+    Quantiles are exact (linear interpolation, as np.quantile): each disease
+    column is sorted once by (region, score) and the quantile positions are
+    read from every region's segment at once.
+
+    Args:
+        region_index: Region index of every field, shape (N,)
+        scores: Risk scores of shape (N, n_diseases), e.g. from diagnose_batch
+        diseases: Disease names of the score columns
+        n_regions: Number of regions (defaults to max index + 1)
+        region_names: Optional names of the regions
+        quantiles: Quantile levels in [0, 1]
+
+    Returns:
+        dict: regions, diseases, quantile_levels, risk_levels and arrays field_counts (R,),
+              mean (R, D), max (R, D), quantiles (R, D, Q) and level_counts (R, D, 3);
+              statistics of regions without fields are NaN
+    """
+    region_index = np.asarray(region_index, dtype=np.intp)
+    scores = np.asarray(scores, dtype=np.float64).reshape(len(region_index), -1)
+    if n_regions is None:
+        n_regions = int(region_index.max()) + 1 if len(region_index) else 0
+    n_diseases = scores.shape[1]
+    levels = np.asarray(quantiles, dtype=np.float64)
+
+    counts = np.bincount(region_index, minlength=n_regions)
+    has_fields = counts > 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sums = np.stack([np.bincount(region_index, weights=scores[:, d], minlength=n_regions)
+                         for d in range(n_diseases)], axis=1)
+        mean = sums / counts[:, None]
+
+    # Fields at each risk level: one bincount over (region, disease, level) codes
+    level_codes = interpret_risk_batch(scores).astype(np.intp)
+    flat = (region_index[:, None] * n_diseases + np.arange(n_diseases)) * len(RISK_LEVELS) + level_codes
+    level_counts = np.bincount(flat.ravel(), minlength=n_regions * n_diseases * len(RISK_LEVELS))
+    level_counts = level_counts.reshape(n_regions, n_diseases, len(RISK_LEVELS))
+
+    # Sorted segments: each non-empty region occupies [start, last] of every sorted column
+    starts = (np.cumsum(counts) - counts)[has_fields]
+    last = starts + counts[has_fields] - 1
+    positions = starts[:, None] + levels[None, :] * (last - starts)[:, None]
+    lower = np.floor(positions).astype(np.intp)
+    upper = np.minimum(lower + 1, last[:, None])
+    fraction = positions - lower
+
+    maximum = np.full((n_regions, n_diseases), np.nan)
+    quantile_values = np.full((n_regions, n_diseases, len(levels)), np.nan)
+    for d in range(n_diseases if len(region_index) else 0):
+        column = scores[np.lexsort((scores[:, d], region_index)), d]
+        maximum[has_fields, d] = column[last]
+        quantile_values[has_fields, d] = column[lower] + (column[upper] - column[lower]) * fraction
+
+    return {
+        'regions': list(region_names) if region_names is not None else list(range(n_regions)),
+        'diseases': list(diseases),
+        'quantile_levels': levels.tolist(),
+        'risk_levels': list(RISK_LEVELS),
+        'field_counts': counts,
+        'mean': mean,
+        'max': maximum,
+        'quantiles': quantile_values,
+        'level_counts': level_counts,
+    }
+
+
+def rollup_table(rollup, disease):
+    """
+    Rows of one disease's roll-up, e.g. for the region summary view.
+
+    Args:
+        rollup: Output of region_rollup
+        disease: Disease name
+
+    Returns:
+        list: One dict per region with region, fields, mean, max, p50, p90, ...,
+              and the field counts per risk level (Low, Moderate, High)
+    """
+    d = rollup['diseases'].index(disease)
+    rows = []
+    for r, region in enumerate(rollup['regions']):
+        row = {'region': region, 'fields': int(rollup['field_counts'][r]),
+               'mean': float(rollup['mean'][r, d]), 'max': float(rollup['max'][r, d])}
+        for q, level in enumerate(rollup['quantile_levels']):
+            row[f"p{int(round(level * 100))}"] = float(rollup['quantiles'][r, d, q])
+        row.update(zip(rollup['risk_levels'], rollup['level_counts'][r, d].tolist()))
+        rows.append(row)
+    return rows
@@ -0,0 +1,142 @@
+"""
+Change-Detection Re-Scoring
+Re-scores a fleet of fields after an input update (e.g. the nightly weather feed) while
+skipping fields whose inputs did not move beyond a tolerance since they were last scored
+with the current rule base; their previous scores are carried forward.
+"""
+
+import time
+
+import numpy as np
+from knowledge.batch_inference import diagnose_batch
+
+
+# Default per-variable tolerance: the input quantum of the persistent result cache
+DEFAULT_TOLERANCE = 0.01
+
+
+class ChangeDetectionRescorer:
+    """
+    Keeps a compact fingerprint per field and re-scores only what changed.
+
+    The fingerprint is the input vector the field was last scored with
+    (float32) plus a code for the rule-base version. Inputs are compared
+    against the last scored vector, not the last seen one, so slow drift
+    below the tolerance cannot accumulate unnoticed.
+
+    Args:
+        engine: Compiled engine from compile_rule_base
+        tolerance: Absolute tolerance, as a scalar or a dict of input name -> tolerance
+                   (inputs missing from the dict use DEFAULT_TOLERANCE)
+        score: Function scoring an (N, n_inputs) array into (N, n_diseases) scores
+               (defaults to diagnose_batch with the engine)
+    """
+
+    def __init__(self, engine, tolerance=DEFAULT_TOLERANCE, score=None):
+        self.engine = engine
+        names = engine['input_names']
+        if isinstance(tolerance, dict):
+            self.tolerance = np.array([tolerance.get(name, DEFAULT_TOLERANCE) for name in names], dtype=np.float64)
+        else:
+            self.tolerance = np.full(len(names), float(tolerance))
+        self.score = score if score is not None else (lambda inputs: diagnose_batch(inputs, engine))
+
+        self._rows = {}
+        self._inputs = np.zeros((0, len(names)), dtype=np.float32)
+        self._scores = np.zeros((0, len(engine['diseases'])), dtype=np.float32)
+        self._version_codes = np.zeros(0, dtype=np.int16)
+        self._versions = [engine['version']]
+        self._seconds_per_row = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def set_engine(self, engine, score=None):
+        """Switch to a new rule-base version; fields scored with an older one are re-scored next cycle."""
+        self.engine = engine
+        self.score = score if score is not None else (lambda inputs: diagnose_batch(inputs, engine))
+        if engine['version'] not in self._versions:
+            self._versions.append(engine['version'])
+
+    def _row_indices(self, field_ids):
+        """Row of every field id, registering new fields (their version code is -1)."""
+        new = [field for field in dict.fromkeys(field_ids) if field not in self._rows]
+        if new:
+            start = len(self._rows)
+            self._rows.update((field, start + i) for i, field in enumerate(new))
+            self._inputs = np.concatenate([self._inputs, np.zeros((len(new), self._inputs.shape[1]), np.float32)])
+            self._scores = np.concatenate([self._scores, np.zeros((len(new), self._scores.shape[1]), np.float32)])
+            self._version_codes = np.concatenate([self._version_codes, np.full(len(new), -1, np.int16)])
+        return np.array([self._rows[field] for field in field_ids], dtype=np.intp)
+
+    def changed(self, field_ids, inputs):
+        """
+        Which fields need re-scoring.
+
+        Args:
+            field_ids: Field ids
+            inputs: Array of shape (N, n_inputs) in engine['input_names'] order
+
+        Returns:
+            np.ndarray: Boolean mask of shape (N,)
+        """
+        rows = np.array([self._rows.get(field, -1) for field in field_ids], dtype=np.intp)
+        inputs = np.asarray(inputs, dtype=np.float64).reshape(len(rows), -1)
+        known = rows >= 0
+        mask = ~known
+        version_code = self._versions.index(self.engine['version'])
+        stale = self._version_codes[rows[known]] != version_code
+        current, stored = inputs[known], self._inputs[rows[known]]
+        # A value becoming or ceasing to be NaN is a change (NaN differences compare False)
+        moved = ((np.abs(current - stored) > self.tolerance) | (np.isnan(current) != np.isnan(stored))).any(axis=1)
+        mask[known] = stale | moved
+        return mask
+
+    def update(self, field_ids, inputs):
+        """
+        Run one update cycle.
+
+        Args:
+            field_ids: Field ids (unique within the call)
+            inputs: Array of shape (N, n_inputs) with each field's current inputs
+
+        Returns:
+            tuple: (scores of shape (N, n_diseases), report dict with fields, rescored,
+                    skipped, new_fields, scoring_s, estimated_saved_s); re-scored rows
+                    hold the scores just computed, skipped rows the stored float32 scores
+        """
+        field_ids = list(field_ids)
+        inputs = np.asarray(inputs, dtype=np.float64).reshape(len(field_ids), -1)
+        n_known = sum(field in self._rows for field in field_ids)
+        mask = self.changed(field_ids, inputs)
+        rows = self._row_indices(field_ids)
+
+        scores = self._scores[rows].astype(np.float64)
+        started = time.perf_counter()
+        if mask.any():
+            selected = rows[mask]
+            scores[mask] = self.score(inputs[mask])
+            self._scores[selected] = scores[mask]
+            self._inputs[selected] = inputs[mask]
+            self._version_codes[selected] = self._versions.index(self.engine['version'])
+        scoring_s = time.perf_counter() - started
+        if mask.any():
+            self._seconds_per_row = scoring_s / mask.sum()
+
+        skipped = int((~mask).sum())
+        report = {
+            'fields': len(field_ids),
+            'rescored': int(mask.sum()),
+            'skipped': skipped,
+            'new_fields': len(field_ids) - n_known,
+            'scoring_s': scoring_s,
+            'estimated_saved_s': skipped * self._seconds_per_row if self._seconds_per_row is not None else None,
+        }
+        return scores, report
+
+    def invalidate(self, field_ids):
+        """Force re-scoring of fields in the next cycle (e.g. after a field attribute changed)."""
+        for field in field_ids:
+            row = self._rows.get(field)
+            if row is not None:
+                self._version_codes[row] = -1
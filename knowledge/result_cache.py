@@ -0,0 +1,265 @@
+"""
+Persistent Result Cache
+Cross-process cache of diagnosis results stored in a local SQLite file (WAL mode).
+Entries are keyed by the rule-base version plus the quantized input vector, so separate
+Gradio and batch worker processes share results and warm restarts skip recomputation.
+Entries may also carry the rule firing strengths, from which explanations are rebuilt.
+"""
+
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from knowledge.batch_inference import diagnose_batch, explain_from_strengths, inputs_to_array
+from knowledge.fuzzy_system import diagnose_diseases
+from knowledge.disease_knowledge import get_all_diseases
+
+
+# Inputs are rounded to this step before lookup (all UI slider steps are multiples of it)
+DEFAULT_QUANTUM = 0.01
+
+DEFAULT_MAX_ENTRIES = 1_000_000
+
+# SQLite limits the number of bound parameters per statement
+_SELECT_BATCH = 500
+
+
+class PersistentResultCache:
+    """
+    SQLite-backed store of risk score vectors shared between processes.
+
+    Args:
+        path: Database file path (created if missing)
+        version: Rule-base version (engine['version']); other versions are never returned
+        quantum: Input quantization step
+        max_entries: Least recently used entries beyond this count are evicted
+    """
+
+    def __init__(self, path, version, quantum=DEFAULT_QUANTUM, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.version = version
+        self.quantum = quantum
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " version TEXT NOT NULL, key BLOB NOT NULL, scores BLOB NOT NULL, last_access REAL NOT NULL,"
+            " strengths BLOB, PRIMARY KEY (version, key)) WITHOUT ROWID"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(results)")]
+        if 'strengths' not in columns:
+            # Databases written before strengths were cached
+            self._conn.execute("ALTER TABLE results ADD COLUMN strengths BLOB")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+        self._conn.commit()
+
+        # Upper bound on the row count; only recounted when it exceeds max_entries
+        self._approx_count = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def quantize(self, inputs):
+        """Round inputs to the cache grid; returns (integer keys array, quantized float inputs)."""
+        steps = np.rint(np.asarray(inputs, dtype=np.float64) / self.quantum).astype(np.int32)
+        return steps, steps * self.quantum
+
+    def get_many(self, inputs, with_strengths=False):
+        """
+        Look up a batch of input rows.
+
+        Args:
+            inputs: Array of shape (N, n_inputs)
+            with_strengths: Also return rule firing strengths; entries stored
+                            without strengths then count as misses
+
+        Returns:
+            tuple: (scores array of shape (N, n_diseases) or None if nothing hit,
+                    boolean hit mask of shape (N,)); with_strengths inserts the
+                    strengths array of shape (N, n_rules) (or None) after the scores
+        """
+        steps, _ = self.quantize(inputs)
+        keys = [row.tobytes() for row in steps]
+        found = {}
+        strengths_found = {}
+
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            for start in range(0, len(unique_keys), _SELECT_BATCH):
+                batch = unique_keys[start:start + _SELECT_BATCH]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, scores, strengths FROM results WHERE version = ? AND key IN ({placeholders})"
+                    + (" AND strengths IS NOT NULL" if with_strengths else ""),
+                    [self.version, *batch]).fetchall()
+                for key, scores, strengths in rows:
+                    found[key] = scores
+                    strengths_found[key] = strengths
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE results SET last_access = ? WHERE version = ? AND key = ?",
+                                       [(now, self.version, key) for key in found])
+                self._conn.commit()
+            hit = np.array([key in found for key in keys], dtype=bool)
+            self.hits += int(hit.sum())
+            self.misses += int((~hit).sum())
+
+        if not found:
+            return (None, None, hit) if with_strengths else (None, hit)
+
+        scores = self._unpack(keys, hit, found)
+        if with_strengths:
+            return scores, self._unpack(keys, hit, strengths_found), hit
+        return scores, hit
+
+    @staticmethod
+    def _unpack(keys, hit, blobs):
+        """Stack the float64 blobs of the hit keys into rows (NaN for misses)."""
+        width = len(next(iter(blobs.values()))) // 8
+        rows = np.full((len(keys), width), np.nan)
+        for i, key in enumerate(keys):
+            if hit[i]:
+                rows[i] = np.frombuffer(blobs[key], dtype=np.float64)
+        return rows
+
+    def put_many(self, inputs, scores, strengths=None):
+        """
+        Store score rows for a batch of inputs, then evict if over max_entries.
+
+        Args:
+            inputs: Array of shape (N, n_inputs)
+            scores: Array of shape (N, n_diseases)
+            strengths: Optional rule firing strengths of shape (N, n_rules); when
+                       omitted, strengths already stored for an entry are kept
+        """
+        steps, _ = self.quantize(inputs)
+        scores = np.ascontiguousarray(scores, dtype=np.float64)
+        if strengths is None:
+            strength_blobs = [None] * len(scores)
+        else:
+            strength_blobs = [row.tobytes() for row in np.ascontiguousarray(strengths, dtype=np.float64)]
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO results (version, key, scores, last_access, strengths) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (version, key) DO UPDATE SET scores = excluded.scores,"
+                " last_access = excluded.last_access, strengths = COALESCE(excluded.strengths, strengths)",
+                [(self.version, key.tobytes(), row.tobytes(), now, blob)
+                 for key, row, blob in zip(steps, scores, strength_blobs)])
+            self._approx_count += len(scores)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Delete the least recently used entries beyond max_entries (caller holds the lock)."""
+        if self._approx_count <= self.max_entries:
+            return
+        count = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM results WHERE (version, key) IN "
+                "(SELECT version, key FROM results ORDER BY last_access LIMIT ?)", (excess,))
+        self._approx_count = min(count, self.max_entries)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def clear(self):
+        """Remove every entry, for all versions."""
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+            self._conn.commit()
+            self._approx_count = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def diagnose_batch_cached(inputs, engine, cache):
+    """
+    diagnose_batch with a persistent cache in front of it.
+
+    Misses are scored at their quantized values, so a cached entry does not
+    depend on which input of its quantization cell was scored first.
+
+    Args:
+        inputs: Array of shape (N, n_inputs)
+        engine: Compiled engine from compile_rule_base
+        cache: PersistentResultCache for engine['version']
+
+    Returns:
+        np.ndarray: Risk scores of shape (N, n_diseases)
+    """
+    inputs = np.asarray(inputs, dtype=np.float64).reshape(-1, len(engine['input_names']))
+    scores, hit = cache.get_many(inputs)
+    if scores is None:
+        scores = np.zeros((len(inputs), len(engine['diseases'])))
+    if not hit.all():
+        _, quantized = cache.quantize(inputs[~hit])
+        computed = diagnose_batch(quantized, engine)
+        scores[~hit] = computed
+        cache.put_many(quantized, computed)
+    return scores
+
+
+def diagnose_diseases_cached(input_values, disease_system, cache, input_names):
+    """
+    diagnose_diseases with a persistent cache in front of it.
+
+    Args:
+        input_values: Dictionary of input variable values
+        disease_system: Unified ControlSystemSimulation object
+        cache: PersistentResultCache for the current rule-base version
+        input_names: Input order used for the cache key (engine['input_names'])
+
+    Returns:
+        dict: Dictionary of disease names to risk scores (0-1)
+    """
+    row = inputs_to_array(input_values, {'input_names': input_names})
+    cached, hit = cache.get_many(row)
+    if hit[0]:
+        return dict(zip(get_all_diseases(), cached[0].tolist()))
+
+    _, quantized = cache.quantize(row)
+    results = diagnose_diseases(dict(zip(input_names, quantized[0].tolist())), disease_system)
+    cache.put_many(quantized, np.array([[results[d] for d in get_all_diseases()]], dtype=np.float64))
+    return results
+
+
+def diagnose_explained_cached(input_values, disease_system, cache, engine, threshold=0.01):
+    """
+    Scores and fired rules of one input, through the persistent cache.
+
+    A hit rebuilds the explanation from the cached firing strengths, so no
+    inference runs at all. A miss is scored with the skfuzzy simulation at
+    the quantized input and its strengths are computed by the batch engine on
+    the same quantized row, so scores and explanation always agree.
+
+    Args:
+        input_values: Dictionary of input variable values
+        disease_system: Unified ControlSystemSimulation object
+        cache: PersistentResultCache for engine['version']
+        engine: Compiled engine from compile_rule_base
+        threshold: Minimum strength for a rule to be listed (as in explain_diagnosis)
+
+    Returns:
+        tuple: ({disease: score} dict, explain_diagnosis-style fired rules dict)
+    """
+    row = inputs_to_array(input_values, engine)
+    cached, strengths, hit = cache.get_many(row, with_strengths=True)
+    if hit[0]:
+        results = dict(zip(engine['diseases'], cached[0].tolist()))
+        return results, explain_from_strengths(strengths[0], engine, threshold)
+
+    _, quantized = cache.quantize(row)
+    results = diagnose_diseases(dict(zip(engine['input_names'], quantized[0].tolist())), disease_system)
+    _, strengths = diagnose_batch(quantized, engine, return_strengths=True)
+    cache.put_many(quantized, np.array([[results[d] for d in engine['diseases']]], dtype=np.float64), strengths)
+    return results, explain_from_strengths(strengths[0], engine, threshold)
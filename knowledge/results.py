@@ -0,0 +1,243 @@
+"""
+Compact Diagnosis Results
+Array-backed result objects for batch and API use: a float32 score vector indexed by a
+shared disease table and a float32 rule firing-strength vector indexed by rule id. The dict
+shapes returned by diagnose_diseases and explain_diagnosis are rebuilt only when asked for.
+"""
+
+from collections.abc import Mapping
+
+import numpy as np
+from knowledge.fuzzy_system import INPUT_MF_PARAMS, create_output_variables
+from knowledge.batch_inference import (
+    RISK_LEVELS, compile_rule_base, diagnose_batch, explain_from_strengths, interpret_risk_batch,
+)
+
+
+# Minimum firing strength of a rule listed in explanations (as in explain_diagnosis)
+EXPLAIN_THRESHOLD = 0.01
+
+# Result tables built in this process, keyed by rule-base version
+_TABLES = {}
+
+
+class ResultTable:
+    """
+    Names shared by all results of one rule base: the diseases (score
+    columns) and the rules (strength columns), with an index by rule id.
+
+    Args:
+        engine: Compiled engine from compile_rule_base
+    """
+
+    __slots__ = ('engine', 'version', 'diseases', 'disease_index', 'rule_ids', 'rule_index')
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.version = engine['version']
+        self.diseases = tuple(engine['diseases'])
+        self.disease_index = {disease: i for i, disease in enumerate(self.diseases)}
+        self.rule_ids = np.asarray(engine['rule_ids'])
+        self.rule_index = {int(rule_id): i for i, rule_id in enumerate(self.rule_ids)}
+
+    def __reduce__(self):
+        # Pickle by rule-base version only, so results stay small and share one table when loaded
+        return _table_for_version, (self.version,)
+
+
+def get_result_table(engine):
+    """The shared ResultTable of an engine, built once per rule-base version."""
+    table = _TABLES.get(engine['version'])
+    if table is None:
+        table = _TABLES[engine['version']] = ResultTable(engine)
+    return table
+
+
+def _table_for_version(version):
+    """
+    The ResultTable of a rule-base version, for unpickling results.
+
+    A process that has not built the table yet gets it from the shipped rule
+    base when the versions match.
+
+    Raises:
+        LookupError: If the version is unknown in this process
+                     (call get_result_table with its engine first)
+    """
+    table = _TABLES.get(version)
+    if table is None:
+        engine = compile_rule_base(INPUT_MF_PARAMS, create_output_variables())
+        if engine['version'] != version:
+            raise LookupError(f"No result table for rule-base version {version}; "
+                              "call get_result_table with its engine before loading results")
+        table = get_result_table(engine)
+    return table
+
+
+class DiagnosisResult(Mapping):
+    """
+    Result of one diagnosis. Reads like the {disease: score} dict of
+    diagnose_diseases (result['Anthracnose'], result.items(), ...) while
+    storing only the two vectors and a reference to the shared table.
+
+    Args:
+        table: Shared ResultTable
+        scores: Risk scores of shape (n_diseases,) in table order
+        strengths: Optional rule firing strengths of shape (n_rules,) in table order
+    """
+
+    __slots__ = ('table', 'scores', 'strengths')
+
+    def __init__(self, table, scores, strengths=None):
+        self.table = table
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self.strengths = None if strengths is None else np.asarray(strengths, dtype=np.float32)
+
+    def __getitem__(self, disease):
+        return float(self.scores[self.table.disease_index[disease]])
+
+    def __iter__(self):
+        return iter(self.table.diseases)
+
+    def __len__(self):
+        return len(self.table.diseases)
+
+    def __repr__(self):
+        return f"DiagnosisResult({self.to_dict()!r})"
+
+    def to_dict(self):
+        """Scores as the {disease: float} dict returned by diagnose_diseases."""
+        return dict(zip(self.table.diseases, self.scores.tolist()))
+
+    def sorted_items(self):
+        """(disease, score) pairs by descending score, as the UI lists them."""
+        return sorted(self.to_dict().items(), key=lambda x: x[1], reverse=True)
+
+    def levels(self):
+        """{disease: interpret_risk level} for every disease."""
+        return {disease: RISK_LEVELS[code] for disease, code in zip(self.table.diseases, interpret_risk_batch(self.scores))}
+
+    def strength(self, rule_id):
+        """Firing strength of a rule by its id."""
+        return float(self.strengths[self.table.rule_index[rule_id]])
+
+    def fired_rules(self, threshold=EXPLAIN_THRESHOLD):
+        """
+        Rebuild the explain_diagnosis structure.
+
+        Args:
+            threshold: Minimum strength for a rule to be listed
+
+        Returns:
+            dict: Disease name -> list of fired rule dicts sorted by descending strength
+
+        Raises:
+            ValueError: If the result was created without firing strengths
+        """
+        if self.strengths is None:
+            raise ValueError("Result has no rule firing strengths")
+        return explain_from_strengths(self.strengths, self.table.engine, threshold)
+
+    @property
+    def nbytes(self):
+        """Bytes held by this result's vectors (the shared table is not counted)."""
+        return self.scores.nbytes + (0 if self.strengths is None else self.strengths.nbytes)
+
+
+class DiagnosisBatch:
+    """
+    Results of many diagnoses as two float32 matrices; indexing returns a
+    DiagnosisResult whose vectors are views into the matrices.
+
+    Args:
+        table: Shared ResultTable
+        scores: Risk scores of shape (N, n_diseases)
+        strengths: Optional rule firing strengths of shape (N, n_rules)
+    """
+
+    __slots__ = ('table', 'scores', 'strengths')
+
+    def __init__(self, table, scores, strengths=None):
+        self.table = table
+        self.scores = np.asarray(scores, dtype=np.float32).reshape(-1, len(table.diseases))
+        self.strengths = (None if strengths is None
+                          else np.asarray(strengths, dtype=np.float32).reshape(-1, len(table.rule_ids)))
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __getitem__(self, index):
+        return DiagnosisResult(self.table, self.scores[index],
+                               None if self.strengths is None else self.strengths[index])
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def to_dicts(self):
+        """Scores as a list of {disease: float} dicts."""
+        return [dict(zip(self.table.diseases, row)) for row in self.scores.tolist()]
+
+    def to_records(self):
+        """
+        Structured NumPy array with one record per result.
+
+        Returns:
+            np.ndarray: Fields 'scores' (float32, n_diseases) and, if present,
+                        'strengths' (float32, n_rules)
+        """
+        fields = [('scores', np.float32, (len(self.table.diseases),))]
+        if self.strengths is not None:
+            fields.append(('strengths', np.float32, (len(self.table.rule_ids),)))
+        records = np.zeros(len(self), dtype=fields)
+        records['scores'] = self.scores
+        if self.strengths is not None:
+            records['strengths'] = self.strengths
+        return records
+
+    @property
+    def nbytes(self):
+        """Bytes held by the score and strength matrices."""
+        return self.scores.nbytes + (0 if self.strengths is None else self.strengths.nbytes)
+
+
+def diagnose_compact(inputs, engine, return_strengths=True, **kwargs):
+    """
+    Score input rows with diagnose_batch into a DiagnosisBatch.
+
+    Args:
+        inputs: Array of shape (N, n_inputs) in engine['input_names'] order
+        engine: Compiled engine from compile_rule_base
+        return_strengths: Keep the rule firing strengths (needed for fired_rules)
+        **kwargs: Passed on to diagnose_batch (e.g. chunk_size)
+
+    Returns:
+        DiagnosisBatch
+    """
+    table = get_result_table(engine)
+    if return_strengths:
+        scores, strengths = diagnose_batch(inputs, engine, return_strengths=True, **kwargs)
+        return DiagnosisBatch(table, scores, strengths)
+    return DiagnosisBatch(table, diagnose_batch(inputs, engine, **kwargs))
+
+
+def result_from_dicts(results, engine, fired_rules=None):
+    """
+    Compact a diagnose_diseases result (and optionally its explain_diagnosis output).
+
+    Args:
+        results: {disease: score} dict
+        engine: Compiled engine of the same rule base
+        fired_rules: Optional explain_diagnosis output; rules not listed get strength 0
+
+    Returns:
+        DiagnosisResult
+    """
+    table = get_result_table(engine)
+    scores = np.array([results.get(disease, 0.0) for disease in table.diseases], dtype=np.float32)
+    strengths = None
+    if fired_rules is not None:
+        strengths = np.zeros(len(table.rule_ids), dtype=np.float32)
+        for fired in fired_rules.values():
+            for rule in fired:
+                strengths[table.rule_index[rule['rule_id']]] = rule['strength']
+    return DiagnosisResult(table, scores, strengths)
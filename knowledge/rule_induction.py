@@ -0,0 +1,305 @@
+"""
+Rule Induction From Labeled Records
+Learns candidate fuzzy rules in FUZZY_RULES format from records with observed risk levels,
+Wang-Mendel style, over the existing input term definitions. Records are fuzzified and vote
+for rule antecedents in vectorized chunks; the induced rules are simplified, merged with the
+expert rule base and checked against a hold-out set.
+"""
+
+import numpy as np
+from knowledge.disease_knowledge import FUZZY_RULES
+from knowledge.batch_inference import (
+    RISK_LEVELS,
+    compile_rule_base,
+    diagnose_batch,
+    fuzzify_batch,
+    interpret_risk_batch
+)
+
+
+# Records fuzzified per vectorized pass during induction
+INDUCTION_CHUNK_SIZE = 65536
+
+# Rows per pass when scoring the hold-out set (induced rule bases can have many rules)
+_HOLDOUT_CHUNK_SIZE = 512
+
+
+def label_codes(labels):
+    """
+    Convert risk labels to level codes.
+
+    Args:
+        labels: Array-like of shape (N, n_diseases) holding RISK_LEVELS names or codes
+                (0 = Low, 1 = Moderate, 2 = High); None, '' and -1 mark unknown labels
+
+    Returns:
+        np.ndarray: Integer codes of shape (N, n_diseases), -1 where unknown
+    """
+    labels = np.asarray(labels)
+    if labels.dtype.kind in 'iu':
+        return labels.astype(np.int64)
+    codes = np.full(labels.shape, -1, dtype=np.int64)
+    for code, level in enumerate(RISK_LEVELS):
+        codes[labels == level] = code
+    return codes
+
+
+def rule_variables(rules=None, diseases=None, input_names=None):
+    """
+    Input variables each disease's rules depend on, used as the antecedent of induced rules.
+
+    Args:
+        rules: Rule definitions in FUZZY_RULES format (defaults to FUZZY_RULES)
+        diseases: Disease names
+        input_names: Input names, in the order used for the result
+
+    Returns:
+        dict: Disease -> list of input names (all inputs for diseases without rules)
+    """
+    if rules is None:
+        rules = FUZZY_RULES
+    used = {disease: set() for disease in diseases}
+    for rule in rules:
+        if rule['disease'] in used:
+            used[rule['disease']].update(rule['conditions'])
+    return {disease: [name for name in input_names if name in names or not names]
+            for disease, names in used.items()}
+
+
+def _winning_terms(memberships, engine):
+    """Index and membership of the strongest term of every input variable, each of shape (N, n_inputs)."""
+    owner = engine['term_owner']
+    n_inputs = len(engine['input_names'])
+    terms = np.zeros((len(memberships), n_inputs), dtype=np.intp)
+    degrees = np.zeros((len(memberships), n_inputs))
+    for var_idx in range(n_inputs):
+        columns = np.flatnonzero(owner == var_idx)
+        block = memberships[:, columns]
+        terms[:, var_idx] = block.argmax(axis=1)
+        degrees[:, var_idx] = block.max(axis=1)
+    return terms, degrees
+
+
+def induce_rules(inputs, labels, engine, variables=None, min_support=1.0, min_confidence=0.5,
+                 chunk_size=INDUCTION_CHUNK_SIZE, start_id=None):
+    """
+    Generate candidate rules from labeled records (Wang-Mendel).
+
+    Every record is assigned, per variable, the term it belongs to most; the
+    product of those memberships is its degree. Records vote with their degree
+    for (antecedent cell, observed risk level); each cell gets the level with
+    the most votes. Votes are accumulated with one bincount per disease and
+    chunk, so memory does not grow with the number of records.
+
+    Args:
+        inputs: Array of shape (N, n_inputs) in engine['input_names'] order
+        labels: Risk labels of shape (N, n_diseases) in engine['diseases'] order (see label_codes)
+        engine: Compiled engine from compile_rule_base (provides the term definitions)
+        variables: Dict of disease -> input names used in its antecedents
+                   (defaults to rule_variables of the engine's rules)
+        min_support: Minimum total vote weight of a cell
+        min_confidence: Minimum share of the cell's votes for the winning level
+        chunk_size: Records fuzzified per pass
+        start_id: Id of the first induced rule (defaults to one past the engine's rules)
+
+    Returns:
+        list: Rules in FUZZY_RULES format, with support and confidence in the description
+    """
+    inputs = np.asarray(inputs, dtype=np.float64).reshape(-1, len(engine['input_names']))
+    codes = label_codes(labels).reshape(len(inputs), len(engine['diseases']))
+    input_names = engine['input_names']
+    if variables is None:
+        variables = rule_variables(engine['rules'], engine['diseases'], input_names)
+    term_names = [list(engine['input_params'][name]['terms']) for name in input_names]
+    n_levels = len(RISK_LEVELS)
+
+    columns = {disease: [input_names.index(name) for name in variables[disease]] for disease in variables}
+    shapes = {disease: tuple(len(term_names[c]) for c in cols) for disease, cols in columns.items()}
+    votes = {disease: np.zeros(int(np.prod(shape)) * n_levels) for disease, shape in shapes.items()}
+
+    for start in range(0, len(inputs), chunk_size):
+        terms, degrees = _winning_terms(fuzzify_batch(inputs[start:start + chunk_size], engine), engine)
+        for disease, cols in columns.items():
+            chunk_labels = codes[start:start + chunk_size, engine['diseases'].index(disease)]
+            known = chunk_labels >= 0
+            cells = np.ravel_multi_index(tuple(terms[known][:, cols].T), shapes[disease])
+            votes[disease] += np.bincount(cells * n_levels + chunk_labels[known],
+                                          weights=degrees[known][:, cols].prod(axis=1),
+                                          minlength=len(votes[disease]))
+
+    rules = []
+    next_id = start_id if start_id is not None else max([rule['id'] for rule in engine['rules']], default=0) + 1
+    for disease, cols in columns.items():
+        cell_votes = votes[disease].reshape(-1, n_levels)
+        support = cell_votes.sum(axis=1)
+        risk = cell_votes.argmax(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            confidence = cell_votes.max(axis=1) / support
+        kept = np.flatnonzero((support >= min_support) & (support > 0) & (confidence >= min_confidence))
+        cell_terms = np.stack(np.unravel_index(kept, shapes[disease]), axis=1).reshape(-1, len(cols))
+
+        cell_terms, risk, support, confidence = simplify_cells(
+            cell_terms, risk[kept], support[kept], confidence[kept], shapes[disease])
+        for row in range(len(cell_terms)):
+            conditions = {input_names[c]: term_names[c][t] for c, t in zip(cols, cell_terms[row]) if t >= 0}
+            rules.append(_induced_rule(next_id, disease, conditions, RISK_LEVELS[risk[row]],
+                                       support[row], confidence[row]))
+            next_id += 1
+    return rules
+
+
+def simplify_cells(cell_terms, risk, support, confidence, shape):
+    """
+    Merge rules that cover every term of a variable with the same risk level.
+
+    Such a group is replaced by one rule without that variable (term index -1),
+    repeatedly, as long as at least one condition remains. The merged rule
+    fires at least as strongly as the OR of the rules it replaces.
+
+    Args:
+        cell_terms: Term index per antecedent variable, shape (R, n_vars); -1 = no condition
+        risk: Risk level code per rule, shape (R,)
+        support: Vote weight per rule, shape (R,)
+        confidence: Winning vote share per rule, shape (R,)
+        shape: Number of terms of every antecedent variable
+
+    Returns:
+        tuple: (cell_terms, risk, support, confidence) of the simplified rules
+    """
+    changed = True
+    while changed and len(cell_terms):
+        changed = False
+        for var in range(len(shape)):
+            conditioned = (cell_terms >= 0).sum(axis=1)
+            candidates = np.flatnonzero((cell_terms[:, var] >= 0) & (conditioned > 1))
+            if len(candidates) < shape[var]:
+                continue
+            keys = np.column_stack([np.delete(cell_terms[candidates], var, axis=1), risk[candidates]])
+            _, group, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+            group = group.ravel()
+            full = np.flatnonzero(counts == shape[var])
+            if not len(full):
+                continue
+            merged_rows = candidates[np.isin(group, full)]
+            first = candidates[np.unique(group, return_index=True)[1][full]]
+            group_of_row = np.searchsorted(full, group[np.isin(group, full)])
+
+            new_terms = cell_terms[first].copy()
+            new_terms[:, var] = -1
+            new_support = np.bincount(group_of_row, weights=support[merged_rows], minlength=len(full))
+            new_confidence = np.full(len(full), np.inf)
+            np.minimum.at(new_confidence, group_of_row, confidence[merged_rows])
+
+            keep = np.setdiff1d(np.arange(len(cell_terms)), merged_rows)
+            cell_terms = np.concatenate([cell_terms[keep], new_terms])
+            risk = np.concatenate([risk[keep], risk[first]])
+            support = np.concatenate([support[keep], new_support])
+            confidence = np.concatenate([confidence[keep], new_confidence])
+            changed = True
+    return cell_terms, risk, support, confidence
+
+
+def _induced_rule(rule_id, disease, conditions, risk, support, confidence):
+    """One induced rule in FUZZY_RULES format."""
+    clauses = ', '.join(f"{name} {term}" for name, term in conditions.items())
+    return {
+        'id': int(rule_id),
+        'disease': disease,
+        'conditions': conditions,
+        'risk': risk,
+        'description': f"{risk} risk with {clauses} (induced; support {support:.1f}, confidence {confidence:.0%})",
+    }
+
+
+def merge_rule_bases(expert_rules, induced_rules):
+    """
+    Combine expert and induced rules; expert rules win.
+
+    Induced rules with the same disease and conditions as an expert rule are
+    dropped (whatever their risk level). The remaining induced rules are
+    renumbered after the highest expert rule id.
+
+    Args:
+        expert_rules: Rules in FUZZY_RULES format
+        induced_rules: Rules from induce_rules
+
+    Returns:
+        list: Merged rule base
+    """
+    def key(rule):
+        return rule['disease'], tuple(sorted(rule['conditions'].items()))
+
+    existing = {key(rule) for rule in expert_rules}
+    next_id = max([rule['id'] for rule in expert_rules], default=0) + 1
+    merged = list(expert_rules)
+    for rule in induced_rules:
+        if key(rule) in existing:
+            continue
+        existing.add(key(rule))
+        merged.append(dict(rule, id=next_id))
+        next_id += 1
+    return merged
+
+
+def holdout_accuracy(inputs, labels, engine):
+    """
+    Share of known labels whose level matches interpret_risk of the engine's score.
+
+    Args:
+        inputs: Array of shape (N, n_inputs)
+        labels: Risk labels of shape (N, n_diseases) (see label_codes)
+        engine: Compiled engine to evaluate
+
+    Returns:
+        dict: 'overall' accuracy and 'per_disease' dict of disease -> accuracy
+              (None for diseases without known labels)
+    """
+    codes = label_codes(labels).reshape(-1, len(engine['diseases']))
+    predicted = interpret_risk_batch(diagnose_batch(inputs, engine, chunk_size=_HOLDOUT_CHUNK_SIZE))
+    known = codes >= 0
+    correct = (predicted == codes) & known
+    per_disease = {disease: (float(correct[:, d].sum() / known[:, d].sum()) if known[:, d].any() else None)
+                   for d, disease in enumerate(engine['diseases'])}
+    overall = float(correct.sum() / known.sum()) if known.any() else None
+    return {'overall': overall, 'per_disease': per_disease}
+
+
+def learn_rule_base(inputs, labels, input_vars, output_vars, expert_rules=None, holdout=0.2, seed=0, **kwargs):
+    """
+    Induce rules on a training split, merge them with the expert rules and evaluate on the hold-out split.
+
+    Args:
+        inputs: Array of shape (N, n_inputs) in input_vars order
+        labels: Risk labels of shape (N, n_diseases) in output_vars order (see label_codes)
+        input_vars: Input variables or INPUT_MF_PARAMS style dicts (term definitions)
+        output_vars: Dictionary of output Consequent objects (from create_output_variables)
+        expert_rules: Rules to merge with (defaults to FUZZY_RULES; [] for induced rules only)
+        holdout: Fraction of records held out for evaluation
+        seed: Random seed of the split
+        **kwargs: Passed on to induce_rules (variables, min_support, min_confidence, ...)
+
+    Returns:
+        dict: rules (merged rule base), induced (number of induced rules kept), engine
+              (compiled merged rule base), accuracy and expert_accuracy on the hold-out set
+              (expert_accuracy is None without expert rules)
+    """
+    if expert_rules is None:
+        expert_rules = FUZZY_RULES
+    inputs = np.asarray(inputs, dtype=np.float64)
+    codes = label_codes(labels)
+    order = np.random.default_rng(seed).permutation(len(inputs))
+    n_holdout = int(round(len(inputs) * holdout))
+    test, train = order[:n_holdout], order[n_holdout:]
+
+    expert_engine = compile_rule_base(input_vars, output_vars, expert_rules or FUZZY_RULES)
+    induced = induce_rules(inputs[train], codes[train], expert_engine, **kwargs)
+    rules = merge_rule_bases(expert_rules, induced)
+    engine = compile_rule_base(input_vars, output_vars, rules)
+
+    return {
+        'rules': rules,
+        'induced': len(rules) - len(expert_rules),
+        'engine': engine,
+        'accuracy': holdout_accuracy(inputs[test], codes[test], engine),
+        'expert_accuracy': holdout_accuracy(inputs[test], codes[test], expert_engine) if expert_rules else None,
+    }
@@ -0,0 +1,339 @@
+"""
+Priority-Aware Inference Scheduler
+Runs fuzzy inference requests on a shared worker pool with separate priority classes
+(interactive, API, bulk). Classes share the workers by weighted fair queuing, bulk
+re-scores are split into small chunks so interactive requests can overtake them between
+chunks, and per-class queue depth and wait-time metrics are tracked.
+"""
+
+import functools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
+
+import numpy as np
+from knowledge.batch_inference import diagnose_batch
+
+
+PRIORITY_CLASSES = ('interactive', 'api', 'bulk')
+
+# Share of the workers each class receives when all classes are busy
+DEFAULT_WEIGHTS = {'interactive': 16.0, 'api': 4.0, 'bulk': 1.0}
+
+# Rows per bulk chunk; bounds how long an interactive request can wait behind bulk work
+DEFAULT_BULK_CHUNK_SIZE = 256
+
+# Number of recent wait / service times kept per class for percentiles
+DEFAULT_METRICS_WINDOW = 10000
+
+
+class _Task:
+    __slots__ = ('priority', 'func', 'args', 'future', 'cost', 'enqueued', 'job', 'rows')
+
+    def __init__(self, priority, func, args, future, cost, job=None, rows=None):
+        self.priority = priority
+        self.func = func
+        self.args = args
+        self.future = future
+        self.cost = cost
+        self.enqueued = time.perf_counter()
+        self.job = job
+        self.rows = rows
+
+
+def _resolve(future, result=None, error=None):
+    """Set a future's result or exception; returns False if it was already cancelled."""
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        return False
+    return True
+
+
+class _BulkJob:
+    """Collects chunk results into one score array and resolves the caller's future."""
+
+    def __init__(self, future, n_rows, n_columns, n_chunks):
+        self.future = future
+        self.scores = np.zeros((n_rows, n_columns))
+        self.remaining = n_chunks
+        self.finished = False
+        self.lock = threading.Lock()
+
+    def chunk_done(self, rows, scores):
+        """
+        Store one chunk.
+
+        Returns:
+            str: 'completed' when this chunk completed the job, 'cancelled' when the job
+                 was cancelled while its last chunk ran, otherwise None
+        """
+        with self.lock:
+            self.scores[rows] = scores
+            self.remaining -= 1
+            if self.remaining or self.finished:
+                return None
+            self.finished = True
+        return 'completed' if _resolve(self.future, self.scores) else 'cancelled'
+
+
+    def finish(self, error=None):
+        """Mark the job failed or cancelled; returns True only for the first call."""
+        with self.lock:
+            if self.finished:
+                return False
+            self.finished = True
+        if error is not None:
+            _resolve(self.future, error=error)
+        return True
+
+
+class InferenceScheduler:
+    """
+    Weighted-fair scheduler in front of the fuzzy engine.
+
+    Each priority class has its own FIFO queue and a virtual time that grows
+    by cost / weight for every dispatched task (cost = rows scored); workers
+    always take the head of the non-empty queue with the lowest virtual time.
+    A class that was idle restarts at the current virtual time, so it cannot
+    bank credit. Bulk work may be limited to fewer workers than the pool so
+    that some capacity is always free for interactive requests.
+
+    Args:
+        engine: Compiled engine from compile_rule_base
+        workers: Number of worker threads
+        weights: Overrides for DEFAULT_WEIGHTS
+        bulk_chunk_size: Rows per preemptible bulk chunk
+        bulk_max_workers: Maximum workers running bulk chunks at once
+                          (defaults to workers - 1, at least 1)
+        metrics_window: Number of recent samples kept per class for percentiles
+        statistics: Optional FleetRecorder (knowledge.fleet_stats) that every batch scored
+                    by submit() without diagnose_batch options is added to
+    """
+
+    def __init__(self, engine, workers=2, weights=None, bulk_chunk_size=DEFAULT_BULK_CHUNK_SIZE,
+                 bulk_max_workers=None, metrics_window=DEFAULT_METRICS_WINDOW, statistics=None):
+        self.engine = engine
+        self.statistics = statistics
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.bulk_chunk_size = bulk_chunk_size
+        self.bulk_max_workers = bulk_max_workers if bulk_max_workers is not None else max(workers - 1, 1)
+
+        self._queues = {name: deque() for name in PRIORITY_CLASSES}
+        self._virtual_time = {name: 0.0 for name in PRIORITY_CLASSES}
+        self._clock = 0.0
+        self._running = {name: 0 for name in PRIORITY_CLASSES}
+        self._condition = threading.Condition()
+        self._shutdown = False
+
+        self._waits = {name: deque(maxlen=metrics_window) for name in PRIORITY_CLASSES}
+        self._services = {name: deque(maxlen=metrics_window) for name in PRIORITY_CLASSES}
+        self._counts = {name: {'submitted': 0, 'completed': 0, 'failed': 0, 'cancelled': 0}
+                        for name in PRIORITY_CLASSES}
+
+        self._workers = [threading.Thread(target=self._worker, name=f"inference-worker-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._workers:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def _check_priority(self, priority):
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority class {priority!r}, expected one of {PRIORITY_CLASSES}")
+
+    def _enqueue(self, tasks):
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("Scheduler has been shut down")
+            for task in tasks:
+                queue = self._queues[task.priority]
+                if not queue and not self._running[task.priority]:
+                    # Idle class rejoins at the current virtual time
+                    self._virtual_time[task.priority] = max(self._virtual_time[task.priority], self._clock)
+                queue.append(task)
+            self._counts[tasks[0].priority]['submitted'] += 1
+            self._condition.notify(len(tasks))
+
+    def submit_call(self, priority, func, *args, cost=1.0):
+        """
+        Schedule an arbitrary callable in a priority class.
+
+        Args:
+            priority: One of PRIORITY_CLASSES
+            func: Callable to run on a worker
+            *args: Arguments for func
+            cost: Work units charged to the class (e.g. rows scored)
+
+        Returns:
+            concurrent.futures.Future: Resolves to func's return value
+        """
+        self._check_priority(priority)
+        future = Future()
+        self._enqueue([_Task(priority, func, args, future, cost)])
+        return future
+
+    def submit(self, inputs, priority='interactive', **kwargs):
+        """
+        Schedule scoring of input rows with diagnose_batch.
+
+        Bulk submissions are split into chunks of bulk_chunk_size rows that are
+        queued individually; cancelling the returned future drops the chunks
+        that have not started yet.
+
+        Args:
+            inputs: Array of shape (N, n_inputs)
+            priority: One of PRIORITY_CLASSES
+            **kwargs: Passed on to diagnose_batch (e.g. disease_indices)
+
+        Returns:
+            concurrent.futures.Future: Resolves to risk scores of shape (N, n_diseases)
+        """
+        self._check_priority(priority)
+        inputs = np.asarray(inputs, dtype=np.float64).reshape(-1, len(self.engine['input_names']))
+        future = Future()
+        if self.statistics is not None and not kwargs:
+            # Disease subsets would leave other columns at 0, so only full scoring is recorded
+            score = functools.partial(self.statistics.observe, engine=self.engine)
+        else:
+            score = functools.partial(diagnose_batch, engine=self.engine, **kwargs)
+
+        if priority != 'bulk' or len(inputs) <= self.bulk_chunk_size:
+            self._enqueue([_Task(priority, score, (inputs,), future, cost=max(len(inputs), 1))])
+            return future
+
+        starts = range(0, len(inputs), self.bulk_chunk_size)
+        job = _BulkJob(future, len(inputs), len(self.engine['diseases']), len(starts))
+        tasks = []
+        for start in starts:
+            rows = slice(start, min(start + self.bulk_chunk_size, len(inputs)))
+            tasks.append(_Task(priority, score, (inputs[rows],), future,
+                               cost=rows.stop - rows.start, job=job, rows=rows))
+        self._enqueue(tasks)
+        return future
+
+    def _next_task(self):
+        """Pop the next task by weighted fair queuing (caller holds the condition)."""
+        best = None
+        for name in PRIORITY_CLASSES:
+            if not self._queues[name]:
+                continue
+            if name == 'bulk' and self._running['bulk'] >= self.bulk_max_workers:
+                continue
+            if best is None or self._virtual_time[name] < self._virtual_time[best]:
+                best = name
+        if best is None:
+            return None
+
+        task = self._queues[best].popleft()
+        self._clock = self._virtual_time[best]
+        self._virtual_time[best] += task.cost / self.weights[best]
+        self._running[best] += 1
+        return task
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                task = self._next_task()
+                while task is None:
+                    if self._shutdown:
+                        return
+                    self._condition.wait()
+                    task = self._next_task()
+
+            outcome = None
+            try:
+                outcome = self._process(task)
+            finally:
+                with self._condition:
+                    if outcome:
+                        self._counts[task.priority][outcome] += 1
+                    self._running[task.priority] -= 1
+                    self._condition.notify()
+
+    def _process(self, task):
+        """Run a dequeued task unless it was cancelled; returns the outcome to count, if any."""
+        started = time.perf_counter()
+        if task.job is None:
+            # Single tasks move to RUNNING so a late cancel() cannot race the result
+            if not task.future.set_running_or_notify_cancel():
+                return 'cancelled'
+        elif task.future.cancelled():
+            # Bulk futures stay PENDING so the job can be cancelled between chunks
+            return 'cancelled' if task.job.finish() else None
+        elif task.job.finished:
+            return None  # Another chunk of this job failed
+
+        outcome = self._run(task)
+        self._waits[task.priority].append(started - task.enqueued)
+        self._services[task.priority].append(time.perf_counter() - started)
+        return outcome
+
+    def _run(self, task):
+        """Run a task and resolve its future; returns the outcome to count, if any."""
+        try:
+            result = task.func(*task.args)
+        except Exception as error:
+            if task.job is None:
+                _resolve(task.future, error=error)
+                return 'failed'
+            return 'failed' if task.job.finish(error) else None
+
+        if task.job is None:
+            _resolve(task.future, result)
+            return 'completed'
+        return task.job.chunk_done(task.rows, result)
+
+    def metrics(self):
+        """
+        Per-class queue and latency metrics.
+
+        Returns:
+            dict: Class name -> {'queued', 'running', 'submitted', 'completed', 'failed',
+                  'cancelled', 'wait_ms': {'p50', 'p95', 'p99', 'max'},
+                  'service_ms': {'mean', 'p99'}}; queued and running count tasks (bulk chunks)
+        """
+        with self._condition:
+            snapshot = {name: (len(self._queues[name]), self._running[name], dict(self._counts[name]),
+                               np.array(self._waits[name]), np.array(self._services[name]))
+                        for name in PRIORITY_CLASSES}
+
+        result = {}
+        for name, (queued, running, counts, waits, services) in snapshot.items():
+            waits_ms, services_ms = waits * 1000, services * 1000
+            result[name] = dict(counts, queued=queued, running=running)
+            result[name]['wait_ms'] = {
+                f"p{p}": float(np.percentile(waits_ms, p)) if len(waits_ms) else None for p in (50, 95, 99)}
+            result[name]['wait_ms']['max'] = float(waits_ms.max()) if len(waits_ms) else None
+            result[name]['service_ms'] = {
+                'mean': float(services_ms.mean()) if len(services_ms) else None,
+                'p99': float(np.percentile(services_ms, 99)) if len(services_ms) else None,
+            }
+        return result
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        """
+        Stop the workers once the queues are drained.
+
+        Args:
+            wait: Block until the worker threads have exited
+            cancel_pending: Cancel queued tasks instead of running them
+        """
+        with self._condition:
+            if cancel_pending:
+                for queue in self._queues.values():
+                    while queue:
+                        queue.popleft().future.cancel()
+            self._shutdown = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._workers:
+                thread.join()
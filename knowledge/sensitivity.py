@@ -0,0 +1,198 @@
+"""
+Global Sensitivity Analysis
+Morris elementary effects and Sobol first-order / total indices of every disease risk
+with respect to the 9 inputs, sampled over the universes from create_input_variables.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+from knowledge.batch_inference import diagnose_parallel
+
+
+# In-process cache of finished analyses, keyed by rule-base version and parameters
+_RESULT_CACHE = {}
+
+
+def input_bounds(engine):
+    """
+    Lower and upper bound of every input universe.
+
+    Args:
+        engine: Compiled engine from compile_rule_base
+
+    Returns:
+        tuple: (low, high) arrays of shape (n_inputs,)
+    """
+    return engine['input_bounds'][:, 0].copy(), engine['input_bounds'][:, 1].copy()
+
+
+def _cache_key(engine, method, params):
+    """Stable key for a given rule base, method and sampling parameters."""
+    payload = json.dumps({'version': engine['version'], 'method': method, 'params': params}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _cached_analysis(engine, method, params, cache_dir, compute):
+    """Return a cached analysis or compute it and store it in memory (and on disk if cache_dir)."""
+    key = _cache_key(engine, method, params)
+    if key in _RESULT_CACHE:
+        return _RESULT_CACHE[key]
+
+    path = os.path.join(cache_dir, f"{method}_{key}.npz") if cache_dir else None
+    if path and os.path.exists(path):
+        with np.load(path) as data:
+            result = {name: data[name] for name in data.files}
+    else:
+        result = compute()
+        if path:
+            os.makedirs(cache_dir, exist_ok=True)
+            np.savez(path, **result)
+
+    result = dict(result, inputs=list(engine['input_names']), diseases=list(engine['diseases']),
+                  method=method, version=engine['version'])
+    _RESULT_CACHE[key] = result
+    return result
+
+
+def morris_trajectories(n_inputs, n_trajectories, levels=4, seed=None):
+    """
+    Generate Morris one-at-a-time trajectories in the unit hypercube.
+
+    Each trajectory has n_inputs + 1 points; consecutive points differ in
+    exactly one input by +/- delta, where delta = levels / (2 * (levels - 1)).
+
+    Args:
+        n_inputs: Number of inputs (k)
+        n_trajectories: Number of trajectories (r)
+        levels: Number of grid levels (p), must be even
+        seed: Random seed
+
+    Returns:
+        np.ndarray: Array of shape (r, k + 1, k) with values in [0, 1]
+    """
+    rng = np.random.default_rng(seed)
+    k, r = n_inputs, n_trajectories
+    delta = levels / (2.0 * (levels - 1))
+
+    # Base points on the grid {0, 1/(p-1), ..., 1 - delta}
+    base_levels = np.arange(levels // 2) / (levels - 1)
+    base = rng.choice(base_levels, size=(r, 1, k))
+
+    # B: strictly lower-triangular ones, J: all ones
+    steps = np.tril(np.ones((k + 1, k)), -1)
+    ones = np.ones((k + 1, k))
+    directions = rng.choice([-1.0, 1.0], size=(r, 1, k))
+    trajectories = base + (delta / 2.0) * ((2.0 * steps - ones)[None, :, :] * directions + ones)
+
+    # Random order in which the inputs are stepped
+    permutations = np.argsort(rng.random((r, k)), axis=1)
+    return np.take_along_axis(trajectories, permutations[:, None, :], axis=2)
+
+
+def morris_analysis(engine, n_trajectories=1000, levels=4, seed=0, workers=None, cache_dir=None):
+    """
+    Morris screening: mean, mean absolute and standard deviation of elementary effects.
+
+    Elementary effects are expressed per unit of the normalized input range,
+    so they are comparable across inputs with different universes.
+
+    Args:
+        engine: Compiled engine from compile_rule_base
+        n_trajectories: Number of trajectories (r); costs r * (k + 1) evaluations
+        levels: Number of grid levels (p)
+        seed: Random seed
+        workers: Worker processes for diagnose_parallel
+        cache_dir: Optional directory for persisting results across runs
+
+    Returns:
+        dict: {'mu', 'mu_star', 'sigma'} arrays of shape (n_diseases, n_inputs),
+              plus 'inputs', 'diseases', 'method' and 'version'
+    """
+    params = {'n_trajectories': n_trajectories, 'levels': levels, 'seed': seed}
+
+    def compute():
+        low, high = input_bounds(engine)
+        k = len(low)
+        unit = morris_trajectories(k, n_trajectories, levels, seed)
+        scores = diagnose_parallel((low + unit * (high - low)).reshape(-1, k), engine, workers=workers)
+        scores = scores.reshape(n_trajectories, k + 1, -1)
+
+        # Which input moves at each step, and by how much
+        unit_steps = np.diff(unit, axis=1)
+        moved = np.abs(unit_steps).argmax(axis=2)
+        step_size = np.take_along_axis(unit_steps, moved[:, :, None], axis=2)[:, :, 0]
+        effects_by_step = np.diff(scores, axis=1) / step_size[:, :, None]
+
+        # Reorder steps so effects[t, i] is the effect of input i on trajectory t
+        order = np.argsort(moved, axis=1)
+        effects = np.take_along_axis(effects_by_step, order[:, :, None], axis=1)
+
+        return {
+            'mu': effects.mean(axis=0).T,
+            'mu_star': np.abs(effects).mean(axis=0).T,
+            'sigma': effects.std(axis=0, ddof=1).T if n_trajectories > 1 else np.zeros((scores.shape[2], k)),
+        }
+
+    return _cached_analysis(engine, 'morris', params, cache_dir, compute)
+
+
+def sobol_analysis(engine, n_samples=10000, seed=0, workers=None, cache_dir=None):
+    """
+    Sobol first-order and total-effect indices with the Saltelli sampling scheme.
+
+    Uses two independent sample matrices A and B plus one matrix per input
+    where that input's column of A is taken from B, for n_samples * (k + 2)
+    evaluations. First-order indices use the Saltelli (2010) estimator and
+    total indices the Jansen estimator. Diseases with zero output variance
+    get indices of 0.
+
+    Args:
+        engine: Compiled engine from compile_rule_base
+        n_samples: Base sample size (N)
+        seed: Random seed
+        workers: Worker processes for diagnose_parallel
+        cache_dir: Optional directory for persisting results across runs
+
+    Returns:
+        dict: {'S1', 'ST'} arrays of shape (n_diseases, n_inputs), 'variance' of shape (n_diseases,),
+              plus 'inputs', 'diseases', 'method' and 'version'
+    """
+    params = {'n_samples': n_samples, 'seed': seed}
+
+    def compute():
+        rng = np.random.default_rng(seed)
+        low, high = input_bounds(engine)
+        k = len(low)
+
+        a = low + rng.random((n_samples, k)) * (high - low)
+        b = low + rng.random((n_samples, k)) * (high - low)
+        ab = np.repeat(a[None, :, :], k, axis=0)
+        ab[np.arange(k), :, np.arange(k)] = b.T
+
+        design = np.concatenate([a, b, ab.reshape(-1, k)])
+        scores = diagnose_parallel(design, engine, workers=workers)
+        f_a = scores[:n_samples]
+        f_b = scores[n_samples:2 * n_samples]
+        f_ab = scores[2 * n_samples:].reshape(k, n_samples, -1)
+
+        variance = np.concatenate([f_a, f_b]).var(axis=0)
+        safe_variance = np.where(variance > 0, variance, 1.0)
+        first_order = (f_b[None] * (f_ab - f_a[None])).mean(axis=1) / safe_variance
+        total = 0.5 * ((f_a[None] - f_ab) ** 2).mean(axis=1) / safe_variance
+
+        zero = variance == 0
+        return {
+            'S1': np.where(zero, 0.0, first_order).T,
+            'ST': np.where(zero, 0.0, total).T,
+            'variance': variance,
+        }
+
+    return _cached_analysis(engine, 'sobol', params, cache_dir, compute)
+
+
+def clear_cache():
+    """Drop all in-process cached analyses."""
+    _RESULT_CACHE.clear()
@@ -0,0 +1,209 @@
+"""
+Simulation State Management
+scikit-fuzzy keeps per-input state (StatePerSimulation entries on every rule, term and
+variable) for each distinct input a ControlSystemSimulation computes, until its run-count
+flush. This module bounds that state in long-running servers: configurable caching, a
+periodic time-based flush, and an RSS watchdog that recycles the simulation when the
+process exceeds a memory budget.
+"""
+
+import gc
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from knowledge.fuzzy_system import reset_simulation
+
+
+# skfuzzy's own default number of distinct runs kept before it flushes
+DEFAULT_FLUSH_AFTER_RUN = 1000
+
+# Releases between RSS checks (reading /proc is cheap but not free)
+DEFAULT_RSS_CHECK_EVERY = 100
+
+# Share of RSS a recycle must release to count as effective; after an ineffective one
+# (memory held outside skfuzzy state) further recycles back off
+RECYCLE_MIN_RELEASE = 0.05
+
+# Largest back-off, in multiples of the RSS check interval
+MAX_RECYCLE_BACKOFF = 64
+
+
+def process_rss():
+    """Resident set size of this process in bytes (Linux /proc), or None if unavailable."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def simulation_state_size(simulation):
+    """
+    Count the per-input state entries a simulation's control system currently holds.
+
+    Args:
+        simulation: ControlSystemSimulation
+
+    Returns:
+        int: Number of StatePerSimulation entries across rules, terms and variables
+    """
+    def states(fuzzy_var):
+        yield fuzzy_var.input if hasattr(fuzzy_var, 'input') else fuzzy_var.output
+        for term in fuzzy_var.terms.values():
+            yield term.membership_value
+            yield term.cuts
+
+    count = 0
+    for rule in simulation.ctrl.rules:
+        count += len(rule.aggregate_firing._sim_data)
+        count += sum(len(c.activation._sim_data) for c in rule.consequent)
+    for fuzzy_var in list(simulation.ctrl.antecedents) + list(simulation.ctrl.consequents):
+        count += sum(len(state._sim_data) for state in states(fuzzy_var))
+    return count
+
+
+class ManagedSimulation:
+    """
+    Owner of the shared ControlSystemSimulation with bounded state.
+
+    Callers borrow the current simulation with acquire(); the lock also keeps
+    concurrent requests from interleaving their inputs. Maintenance runs when
+    a borrow ends: a flush when flush_interval seconds have passed since the
+    last one, and a recycle (flush, then a fresh simulation from the factory)
+    when the process RSS exceeds rss_budget_mb. When a recycle leaves RSS over
+    budget without releasing RECYCLE_MIN_RELEASE of it, the memory is not held
+    by skfuzzy state, so the next recycles wait twice as many checks each time
+    (up to MAX_RECYCLE_BACKOFF); an effective recycle resets the back-off.
+
+    Args:
+        factory: Callable taking (cache, flush_after_run) and returning a new
+                 ControlSystemSimulation (e.g. create_control_systems with its arguments bound)
+        cache: Keep skfuzzy's per-input results for repeated inputs
+        flush_after_run: Distinct runs skfuzzy keeps before flushing
+        flush_interval: Seconds between time-based flushes (None disables)
+        rss_budget_mb: Recycle the simulation above this RSS (None disables)
+        rss_check_every: Releases between RSS checks
+    """
+
+    def __init__(self, factory, cache=True, flush_after_run=DEFAULT_FLUSH_AFTER_RUN, flush_interval=None,
+                 rss_budget_mb=None, rss_check_every=DEFAULT_RSS_CHECK_EVERY):
+        self.factory = factory
+        self.cache = cache
+        self.flush_after_run = flush_after_run
+        self.flush_interval = flush_interval
+        self.rss_budget = rss_budget_mb * 1024 * 1024 if rss_budget_mb else None
+        self.rss_check_every = rss_check_every
+
+        self.uses = 0
+        self.flushes = 0
+        self.recycles = 0
+        self.skipped_recycles = 0
+        self.last_rss = None
+        self._recycle_backoff = 1
+        self._recycle_after_use = 0
+        self._lock = threading.RLock()
+        self._last_flush = time.monotonic()
+        self.simulation = factory(cache, flush_after_run)
+
+    @contextmanager
+    def acquire(self):
+        """Borrow the current simulation exclusively; maintenance runs afterwards."""
+        with self._lock:
+            try:
+                yield self.simulation
+            finally:
+                self.uses += 1
+                self._maintain()
+
+    def _maintain(self):
+        if self.rss_budget is not None and self.uses % self.rss_check_every == 0:
+            self.last_rss = process_rss()
+            if self.last_rss is not None and self.last_rss > self.rss_budget:
+                if self.uses < self._recycle_after_use:
+                    self.skipped_recycles += 1
+                else:
+                    self._recycle_over_budget()
+                    return
+        if self.flush_interval is not None and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _recycle_over_budget(self):
+        """Recycle for the RSS budget and back off if that did not release memory."""
+        before = self.last_rss
+        self.recycle()
+        if self.last_rss is None:
+            return
+        if self.last_rss > self.rss_budget and before - self.last_rss < RECYCLE_MIN_RELEASE * before:
+            self._recycle_backoff = min(self._recycle_backoff * 2, MAX_RECYCLE_BACKOFF)
+            self._recycle_after_use = self.uses + self._recycle_backoff * self.rss_check_every
+            print(f"⚠️  Recycling the simulation did not lower RSS ({before / 2 ** 20:.0f} MB -> "
+                  f"{self.last_rss / 2 ** 20:.0f} MB, budget {self.rss_budget / 2 ** 20:.0f} MB); "
+                  f"next recycle after {self._recycle_backoff * self.rss_check_every} more uses")
+        else:
+            self._recycle_backoff = 1
+            self._recycle_after_use = 0
+
+    def flush(self):
+        """Drop all per-input state held for the current simulation."""
+        with self._lock:
+            reset_simulation(self.simulation)
+            self.flushes += 1
+            self._last_flush = time.monotonic()
+
+    def recycle(self):
+        """Flush, then replace the simulation (and its control system) with a fresh one."""
+        with self._lock:
+            self.flush()
+            self.simulation = self.factory(self.cache, self.flush_after_run)
+            gc.collect()
+            self.recycles += 1
+            self.last_rss = process_rss()
+
+    def stats(self):
+        """
+        Current state and maintenance counters.
+
+        Returns:
+            dict: uses, flushes, recycles, skipped_recycles, state_entries, rss_mb
+        """
+        with self._lock:
+            rss = process_rss()
+            return {
+                'uses': self.uses,
+                'flushes': self.flushes,
+                'recycles': self.recycles,
+                'skipped_recycles': self.skipped_recycles,
+                'state_entries': simulation_state_size(self.simulation),
+                'rss_mb': rss / (1024 * 1024) if rss is not None else None,
+            }
+
+
+def managed_simulation_from_env(factory, environ=None):
+    """
+    Build a ManagedSimulation configured by environment variables.
+
+    DIAGNOSIS_SIM_CACHE (0/1), DIAGNOSIS_SIM_FLUSH_AFTER_RUN, DIAGNOSIS_SIM_FLUSH_SECONDS
+    and DIAGNOSIS_RSS_BUDGET_MB; unset variables keep the defaults.
+
+    Args:
+        factory: Simulation factory as for ManagedSimulation
+        environ: Mapping to read instead of os.environ
+
+    Returns:
+        ManagedSimulation
+    """
+    environ = os.environ if environ is None else environ
+    flush_seconds = environ.get('DIAGNOSIS_SIM_FLUSH_SECONDS')
+    budget = environ.get('DIAGNOSIS_RSS_BUDGET_MB')
+    return ManagedSimulation(
+        factory,
+        cache=environ.get('DIAGNOSIS_SIM_CACHE', '1') != '0',
+        flush_after_run=int(environ.get('DIAGNOSIS_SIM_FLUSH_AFTER_RUN', DEFAULT_FLUSH_AFTER_RUN)),
+        flush_interval=float(flush_seconds) if flush_seconds else None,
+        rss_budget_mb=float(budget) if budget else None,
+    )
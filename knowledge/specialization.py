@@ -0,0 +1,135 @@
+"""
+Field-Group Engine Specialization
+Keeps one partially evaluated engine per group of fields sharing the same static
+attributes (drainage, seed health, crop stage), so hourly weather scoring only
+evaluates the rules and inputs that still depend on the weather.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+from knowledge.batch_inference import diagnose_batch, specialize
+
+
+# Inputs that are usually fixed per field for weeks at a time
+DEFAULT_STATIC_INPUTS = ('Drain', 'SeedHealth', 'Stage')
+
+DEFAULT_MAX_ENGINES = 4096
+
+# Static values are rounded to this many decimals to form group keys
+_KEY_DECIMALS = 6
+
+
+class SpecializedEngineCache:
+    """
+    Specialized engines per field group, invalidated when a field's static attributes change.
+
+    Fields are registered with set_field_attributes. Fields with equal static
+    attributes share one specialized engine; an engine is dropped as soon as
+    no registered field uses it any more, and the least recently used engines
+    are evicted beyond max_engines.
+
+    Args:
+        engine: Compiled engine from compile_rule_base
+        static_inputs: Names of the inputs fixed per field
+        max_engines: Maximum number of specialized engines kept
+    """
+
+    def __init__(self, engine, static_inputs=DEFAULT_STATIC_INPUTS, max_engines=DEFAULT_MAX_ENGINES):
+        self.engine = engine
+        self.static_inputs = list(static_inputs)
+        self.dynamic_inputs = [name for name in engine['input_names'] if name not in self.static_inputs]
+        self.max_engines = max_engines
+        self.builds = 0
+        self._engines = OrderedDict()
+        self._field_keys = {}
+        self._key_fields = {}
+
+    def _key(self, attributes):
+        return tuple(round(float(attributes[name]), _KEY_DECIMALS) for name in self.static_inputs)
+
+    def engine_for(self, attributes):
+        """
+        Specialized engine for one combination of static attribute values.
+
+        Args:
+            attributes: Dictionary with a value for every static input
+
+        Returns:
+            dict: Engine taking the inputs in self.dynamic_inputs order
+        """
+        key = self._key(attributes)
+        if key in self._engines:
+            self._engines.move_to_end(key)
+            return self._engines[key]
+
+        specialized = specialize(self.engine, dict(zip(self.static_inputs, key)))
+        self.builds += 1
+        self._engines[key] = specialized
+        while len(self._engines) > self.max_engines:
+            self._engines.popitem(last=False)
+        return specialized
+
+    def set_field_attributes(self, field_id, attributes):
+        """
+        Register or update a field's static attributes.
+
+        Returns:
+            bool: True if the field moved to a different group
+        """
+        key = self._key(attributes)
+        old_key = self._field_keys.get(field_id)
+        if old_key == key:
+            return False
+        if old_key is not None:
+            self._release(field_id, old_key)
+        self._field_keys[field_id] = key
+        self._key_fields.setdefault(key, set()).add(field_id)
+        return True
+
+    def remove_field(self, field_id):
+        """Forget a field, dropping its group's engine if no other field uses it."""
+        key = self._field_keys.pop(field_id, None)
+        if key is not None:
+            self._release(field_id, key)
+
+    def _release(self, field_id, key):
+        fields = self._key_fields[key]
+        fields.discard(field_id)
+        if not fields:
+            del self._key_fields[key]
+            self._engines.pop(key, None)
+
+    def field_attributes(self, field_id):
+        """Static attributes currently registered for a field."""
+        return dict(zip(self.static_inputs, self._field_keys[field_id]))
+
+    def __len__(self):
+        return len(self._engines)
+
+    def diagnose(self, field_ids, dynamic_inputs, **kwargs):
+        """
+        Score registered fields from their dynamic inputs only.
+
+        Rows are grouped by field group and each group is scored with its
+        specialized engine.
+
+        Args:
+            field_ids: Sequence of registered field ids, one per row
+            dynamic_inputs: Array of shape (N, len(self.dynamic_inputs))
+            **kwargs: Passed on to diagnose_batch (e.g. chunk_size, disease_indices)
+
+        Returns:
+            np.ndarray: Risk scores of shape (N, n_diseases)
+        """
+        dynamic_inputs = np.asarray(dynamic_inputs, dtype=np.float64).reshape(-1, len(self.dynamic_inputs))
+        keys = [self._field_keys[field_id] for field_id in field_ids]
+        scores = np.zeros((len(keys), len(self.engine['diseases'])))
+
+        rows_by_key = {}
+        for row, key in enumerate(keys):
+            rows_by_key.setdefault(key, []).append(row)
+        for key, rows in rows_by_key.items():
+            specialized = self.engine_for(dict(zip(self.static_inputs, key)))
+            scores[rows] = diagnose_batch(dynamic_inputs[rows], specialized, **kwargs)
+        return scores
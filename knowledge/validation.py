@@ -0,0 +1,189 @@
+"""
+Vectorized Input Validation
+Checks batches of inputs before inference: schema (all input variables present and
+numeric), non-finite values and range checks against each universe. Invalid values are
+rejected, clipped or imputed according to a policy, and every row gets a status bitmask
+that is returned alongside its scores, so one bad row never costs the rest of a batch.
+"""
+
+import numpy as np
+from knowledge.batch_inference import diagnose_batch
+
+
+# Per-value status flags (combined with bitwise OR into the row status)
+STATUS_OK = 0
+STATUS_MISSING = 1          # Variable absent from the record
+STATUS_NON_NUMERIC = 2      # Value cannot be converted to a number
+STATUS_NON_FINITE = 4       # NaN or +/-inf
+STATUS_OUT_OF_RANGE = 8     # Finite value outside the variable's universe
+STATUS_CLIPPED = 16         # Value was clipped to the universe
+STATUS_IMPUTED = 32         # Value was replaced by the imputation value
+STATUS_REJECTED = 128       # Row was not scored
+
+STATUS_NAMES = {
+    STATUS_MISSING: 'missing',
+    STATUS_NON_NUMERIC: 'non-numeric',
+    STATUS_NON_FINITE: 'non-finite',
+    STATUS_OUT_OF_RANGE: 'out of range',
+    STATUS_CLIPPED: 'clipped',
+    STATUS_IMPUTED: 'imputed',
+    STATUS_REJECTED: 'rejected',
+}
+
+# What happens to invalid values under each policy:
+#   reject - any missing, non-numeric, non-finite or out-of-range value rejects the row
+#   clip   - out-of-range and infinite values are clipped to the universe; missing or NaN rejects the row
+#   impute - like clip, and missing, non-numeric or NaN values are replaced by the imputation value
+POLICIES = ('reject', 'clip', 'impute')
+
+
+def records_to_array(records, input_names):
+    """
+    Convert input dictionaries to an array without failing on bad records.
+
+    Args:
+        records: List of input dicts (as accepted by diagnose_diseases)
+        input_names: Variable order of the array columns
+
+    Returns:
+        tuple: (values array of shape (N, n_inputs) with NaN for unusable values,
+                per-value flags array of shape (N, n_inputs))
+    """
+    values = np.full((len(records), len(input_names)), np.nan)
+    flags = np.zeros(values.shape, dtype=np.uint8)
+    missing = object()
+
+    for col, name in enumerate(input_names):
+        column = [record.get(name, missing) if isinstance(record, dict) else missing for record in records]
+        try:
+            values[:, col] = np.array(column, dtype=np.float64)
+            continue
+        except (TypeError, ValueError):
+            pass
+        # Slow path, only for columns with bad entries
+        for row, value in enumerate(column):
+            if value is missing or value is None:
+                flags[row, col] |= STATUS_MISSING
+                continue
+            try:
+                values[row, col] = float(value)
+            except (TypeError, ValueError):
+                flags[row, col] |= STATUS_NON_NUMERIC
+
+    return values, flags
+
+
+def default_impute_values(engine):
+    """Midpoint of every input universe, used when no imputation values are given."""
+    return engine['input_bounds'].mean(axis=1)
+
+
+def validate_inputs(inputs, engine, policy='reject', impute_values=None, return_details=False):
+    """
+    Validate and repair a batch of inputs according to a policy.
+
+    Args:
+        inputs: Array of shape (N, n_inputs) in engine['input_names'] order,
+                or a list of input dicts
+        engine: Compiled engine from compile_rule_base
+        policy: One of POLICIES
+        impute_values: Dict of variable name -> value (or array in input order) used
+                       by the impute policy; defaults to the universe midpoints
+        return_details: Also return the per-value flags
+
+    Returns:
+        tuple: (cleaned inputs of shape (N, n_inputs), row status of shape (N,) as uint8),
+               plus per-value flags of shape (N, n_inputs) if return_details is True.
+               Rejected rows carry STATUS_REJECTED and keep their original values.
+
+    Raises:
+        ValueError: For an unknown policy or an array with the wrong number of columns
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown validation policy {policy!r}, expected one of {POLICIES}")
+
+    input_names = engine['input_names']
+    if isinstance(inputs, (list, tuple)) and (not inputs or isinstance(inputs[0], dict)):
+        values, flags = records_to_array(inputs, input_names)
+    elif isinstance(inputs, dict):
+        values, flags = records_to_array([inputs], input_names)
+    else:
+        values = np.array(inputs, dtype=np.float64)
+        if values.ndim != 2 or values.shape[1] != len(input_names):
+            raise ValueError(f"Expected inputs of shape (N, {len(input_names)}), got {values.shape}")
+        flags = np.zeros(values.shape, dtype=np.uint8)
+
+    low, high = engine['input_bounds'][:, 0], engine['input_bounds'][:, 1]
+    is_nan = np.isnan(values)
+    flags[is_nan & (flags == 0)] |= STATUS_NON_FINITE
+    flags[np.isinf(values)] |= STATUS_NON_FINITE
+    with np.errstate(invalid='ignore'):
+        outside = (values < low) | (values > high)
+    flags[outside & np.isfinite(values)] |= STATUS_OUT_OF_RANGE
+
+    if policy == 'reject':
+        bad = flags != 0
+    else:
+        # Out-of-range and infinite values can be clipped; NaN and missing values cannot
+        clippable = outside & ~is_nan
+        values = np.where(clippable, np.clip(values, low, high), values)
+        flags[clippable] |= STATUS_CLIPPED
+        unusable = is_nan
+        if policy == 'impute':
+            if impute_values is None:
+                fill = default_impute_values(engine)
+            elif isinstance(impute_values, dict):
+                fill = np.array([impute_values.get(name, np.nan) for name in input_names], dtype=np.float64)
+                fill = np.where(np.isnan(fill), default_impute_values(engine), fill)
+            else:
+                fill = np.asarray(impute_values, dtype=np.float64)
+            values = np.where(unusable, fill, values)
+            flags[unusable] |= STATUS_IMPUTED
+            unusable = np.zeros_like(unusable)
+        bad = unusable
+
+    status = np.bitwise_or.reduce(flags, axis=1) if flags.shape[1] else np.zeros(len(flags), dtype=np.uint8)
+    status = status.astype(np.uint8)
+    status[bad.any(axis=1)] |= STATUS_REJECTED
+
+    if return_details:
+        return values, status, flags
+    return values, status
+
+
+def diagnose_batch_validated(inputs, engine, policy='reject', impute_values=None, **kwargs):
+    """
+    diagnose_batch with validation in front of it.
+
+    Only rows that pass validation are scored; rejected rows get NaN scores,
+    so they cannot be mistaken for a 0.0 (no risk) result.
+
+    Args:
+        inputs: Array of shape (N, n_inputs) or a list of input dicts
+        engine: Compiled engine from compile_rule_base
+        policy: One of POLICIES
+        impute_values: Imputation values for the impute policy
+        **kwargs: Passed on to diagnose_batch
+
+    Returns:
+        tuple: (scores of shape (N, n_diseases), row status of shape (N,))
+    """
+    values, status = validate_inputs(inputs, engine, policy, impute_values)
+    scores = np.full((len(values), len(engine['diseases'])), np.nan)
+    accepted = (status & STATUS_REJECTED) == 0
+    if accepted.any():
+        scores[accepted] = diagnose_batch(values[accepted], engine, **kwargs)
+    return scores, status
+
+
+def describe_status(status):
+    """
+    Readable flag names of one row status value.
+
+    Args:
+        status: Row status bitmask
+
+    Returns:
+        list: Names of the flags that are set (empty if the row is valid)
+    """
+    return [name for flag, name in STATUS_NAMES.items() if int(status) & flag]
@@ -7,6 +7,14 @@ Author: Knowledge Representation and Reasoning Project
 Based on: Research paper on chilli crop diseases
 """
 
+import asyncio
+import csv
+import glob
+import os
+import threading
+from collections import OrderedDict
+from html import escape
+
 import gradio as gr
 import numpy as np
 import matplotlib.pyplot as plt
@@ -18,27 +26,99 @@ from knowledge.fuzzy_system import (
     diagnose_diseases,
     interpret_risk,
     get_risk_color,
-    explain_diagnosis
+    explain_diagnosis,
+    INPUT_MF_PARAMS
+)
+from knowledge.batch_inference import (
+    compile_rule_base,
+    evaluate_grid
 )
+from knowledge.codegen import get_evaluator
+from knowledge.scheduler import InferenceScheduler
+from knowledge.simulation_manager import managed_simulation_from_env
+from knowledge.result_cache import PersistentResultCache, diagnose_explained_cached
+from knowledge.history_store import HistoryStore, append_results
+from knowledge.fleet_stats import fleet_recorder_from_env, merge_snapshots
+from knowledge.validation import STATUS_REJECTED, validate_inputs
+from knowledge.regional import encode_regions, region_rollup, rollup_table
+from knowledge.results import DiagnosisResult, get_result_table
 from knowledge.disease_knowledge import get_disease_info, FUZZY_RULES, get_all_diseases
 from ui.visualizations import (
     plot_input_membership_functions,
     plot_output_membership_functions,
     plot_disease_comparison,
+    plot_risk_heatmap,
     create_membership_summary_table,
+    INPUT_LABELS,
     COLORS
 )
+from ui.profiling import profiled
 
 # Initialize fuzzy system components
 print("Initializing Fuzzy Inference System...")
 INPUT_VARS = create_input_variables()
 OUTPUT_VARS = create_output_variables()
 RULES = create_fuzzy_rules(INPUT_VARS, OUTPUT_VARS)
-DISEASE_SYSTEMS = create_control_systems(INPUT_VARS, OUTPUT_VARS, RULES)
+
+# The skfuzzy simulation keeps state per distinct input; its caching, flushing and
+# memory budget are set by the DIAGNOSIS_SIM_* / DIAGNOSIS_RSS_BUDGET_MB variables
+def build_disease_system(cache, flush_after_run):
+    """Fresh unified simulation on new variables and rules (used when recycling)."""
+    input_vars = create_input_variables()
+    output_vars = create_output_variables()
+    rules = create_fuzzy_rules(input_vars, output_vars)
+    return create_control_systems(input_vars, output_vars, rules, cache=cache, flush_after_run=flush_after_run)
+
+
+DISEASE_SYSTEMS = managed_simulation_from_env(build_disease_system)
+BATCH_ENGINE = compile_rule_base(INPUT_MF_PARAMS, OUTPUT_VARS)
+EVALUATOR = get_evaluator(BATCH_ENGINE)
+RESULT_TABLE = get_result_table(BATCH_ENGINE)
+
+# Fleet statistics of the batches scored through the scheduler, written as snapshots to
+# DIAGNOSIS_STATS_DIR (every DIAGNOSIS_STATS_SECONDS) and merged in the Rule Base tab
+FLEET_RECORDER = fleet_recorder_from_env(BATCH_ENGINE)
+
+# Engine work from the UI runs as interactive; bulk re-scores submitted to the same
+# scheduler are chunked so they cannot delay it (worker count: DIAGNOSIS_WORKERS)
+SCHEDULER = InferenceScheduler(BATCH_ENGINE, workers=int(os.environ.get('DIAGNOSIS_WORKERS', 2)),
+                               statistics=FLEET_RECORDER)
+
+# Optional cross-process result cache, enabled by pointing DIAGNOSIS_CACHE_PATH at a database file
+RESULT_CACHE = None
+if os.environ.get('DIAGNOSIS_CACHE_PATH'):
+    RESULT_CACHE = PersistentResultCache(os.environ['DIAGNOSIS_CACHE_PATH'], BATCH_ENGINE['version'])
+    print(f"Using persistent result cache at {RESULT_CACHE.path}")
+
+# Optional diagnosis history, enabled by pointing DIAGNOSIS_HISTORY_PATH at a directory;
+# UI diagnoses are recorded under the field id in DIAGNOSIS_FIELD_ID
+HISTORY_STORE = None
+if os.environ.get('DIAGNOSIS_HISTORY_PATH'):
+    HISTORY_STORE = HistoryStore(os.environ['DIAGNOSIS_HISTORY_PATH'], BATCH_ENGINE['input_names'],
+                                 BATCH_ENGINE['diseases'])
+    print(f"Recording diagnosis history in {HISTORY_STORE.path}")
+HISTORY_FIELD_ID = os.environ.get('DIAGNOSIS_FIELD_ID', 'ui')
+
+# Directory of fleet statistics snapshots (*.npz from FleetStatistics.save) shown in the Rule Base tab;
+# batch workers (python -m ui.cluster worker) write theirs to the same directory
+FLEET_STATS_DIR = os.environ.get('DIAGNOSIS_STATS_DIR')
 print(f"System initialized with {len(RULES)} rules for {len(OUTPUT_VARS)} diseases.")
 
+# Live mode: slider changes wait this long and are dropped if a newer change arrived meanwhile
+LIVE_DEBOUNCE_SECONDS = 0.25
+
+# Sessions tracked by live mode; the least recently active are dropped beyond this count
+# (closed sessions are removed on unload, the cap covers sessions that never unload)
+LIVE_MAX_SESSIONS = 10000
 
-def perform_diagnosis(temp, rh, rain, leafwet, soilm, drain, seedhealth, vector, stage):
+# Latest live request number per browser session, least recently active first
+_LIVE_REQUESTS = OrderedDict()
+_LIVE_LOCK = threading.Lock()
+
+
+@profiled
+def perform_diagnosis(temp, rh, rain, leafwet, soilm, drain, seedhealth, vector, stage,
+                      request: gr.Request = None):
     """
     Main diagnosis function that takes input values and returns results.
     
@@ -61,12 +141,46 @@ def perform_diagnosis(temp, rh, rain, leafwet, soilm, drain, seedhealth, vector,
         'Stage': stage
     }
     
-    # Perform fuzzy inference
-    results = diagnose_diseases(input_values, DISEASE_SYSTEMS)
+    with DISEASE_SYSTEMS.acquire() as disease_system:
+        # Perform fuzzy inference
+        if RESULT_CACHE is not None:
+            # Cached entries carry their firing strengths, so a hit needs no inference at all
+            results, fired_rules = diagnose_explained_cached(input_values, disease_system, RESULT_CACHE,
+                                                             BATCH_ENGINE)
+        else:
+            results = diagnose_diseases(input_values, disease_system)
+
+            # Get explainability - which rules fired
+            fired_rules = explain_diagnosis(input_values, disease_system)
     
+    if HISTORY_STORE is not None:
+        append_results(HISTORY_STORE, HISTORY_FIELD_ID, np.datetime64('now', 's'), input_values, results)
+
     # Sort by risk score
     sorted_results = sorted(results.items(), key=lambda x: x[1], reverse=True)
     
+    html = build_results_html(sorted_results)
+    
+    explanation_html = build_explanation_html(sorted_results, fired_rules)
+    
+    # Create comparison plot
+    fig = plot_disease_comparison(results)
+    
+    info_html = build_top_disease_html(sorted_results)
+    
+    return html, fig, info_html, explanation_html
+
+
+def build_results_html(sorted_results):
+    """
+    Build the ranked risk table.
+    
+    Args:
+        sorted_results: List of (disease, score) sorted by descending score
+    
+    Returns:
+        str: HTML table
+    """
     # Create HTML table for results
     html = f"""
     <div style="font-family: Arial, sans-serif; padding: 20px; background-color: {COLORS['black']}; border-radius: 10px;">
@@ -123,9 +237,20 @@ def perform_diagnosis(temp, rh, rain, leafwet, soilm, drain, seedhealth, vector,
     </div>
     """
     
-    # Get explainability - which rules fired
-    fired_rules = explain_diagnosis(input_values, DISEASE_SYSTEMS)
+    return html
+
+
+def build_explanation_html(sorted_results, fired_rules):
+    """
+    Build the explainability section listing the rules that fired for the top diseases.
     
+    Args:
+        sorted_results: List of (disease, score) sorted by descending score
+        fired_rules: Output of explain_diagnosis
+    
+    Returns:
+        str: HTML section
+    """
     # Create explanation section
     explanation_html = f"""
     <div style="font-family: Arial, sans-serif; padding: 20px; background-color: {COLORS['black']}; 
@@ -226,9 +351,19 @@ def perform_diagnosis(temp, rh, rain, leafwet, soilm, drain, seedhealth, vector,
     
     explanation_html += "</div>"
     
-    # Create comparison plot
-    fig = plot_disease_comparison(results)
+    return explanation_html
+
+
+def build_top_disease_html(sorted_results):
+    """
+    Build the primary diagnosis card with treatment recommendation.
+    
+    Args:
+        sorted_results: List of (disease, score) sorted by descending score
     
+    Returns:
+        str: HTML card
+    """
     # Get top disease information
     top_disease, top_score = sorted_results[0]
     top_risk = interpret_risk(top_score)
@@ -247,7 +382,153 @@ def perform_diagnosis(temp, rh, rain, leafwet, soilm, drain, seedhealth, vector,
     </div>
     """
     
-    return html, fig, info_html, explanation_html
+    return info_html
+
+
+@profiled
+def perform_whatif(disease, x_var, y_var, resolution,
+                   temp, rh, rain, leafwet, soilm, drain, seedhealth, vector, stage,
+                   request: gr.Request = None):
+    """
+    Evaluate one disease's risk over a grid of two inputs with batched inference.
+    All other inputs stay at the Diagnosis tab slider values.
+    
+    Returns:
+        matplotlib.figure.Figure: Risk heatmap
+    """
+    if x_var == y_var:
+        raise gr.Error("Choose two different input variables for the axes.")
+    
+    input_values = {
+        'Temp': temp,
+        'RH': rh,
+        'Rain': rain,
+        'LeafWet': leafwet,
+        'SoilM': soilm,
+        'Drain': drain,
+        'SeedHealth': seedhealth,
+        'Vector': vector,
+        'Stage': stage
+    }
+    
+    resolution = int(resolution)
+    input_names = BATCH_ENGINE['input_names']
+    x_low, x_high = BATCH_ENGINE['input_bounds'][input_names.index(x_var)]
+    y_low, y_high = BATCH_ENGINE['input_bounds'][input_names.index(y_var)]
+    x_values = np.linspace(x_low, x_high, resolution)
+    y_values = np.linspace(y_low, y_high, resolution)
+    
+    risk_grid = SCHEDULER.submit_call('interactive', evaluate_grid, input_values, x_var, x_values,
+                                      y_var, y_values, disease, BATCH_ENGINE,
+                                      cost=resolution * resolution).result()
+    fig = plot_risk_heatmap(risk_grid, x_var, x_values, y_var, y_values, disease,
+                            current_point=(input_values[x_var], input_values[y_var]))
+    # Every control change renders a new heatmap; closing keeps them out of pyplot's figure registry
+    plt.close(fig)
+    return fig
+
+
+def _register_live_request(request):
+    """Record a new live request for this session and return its number."""
+    session = request.session_hash if request is not None else None
+    with _LIVE_LOCK:
+        ticket = _LIVE_REQUESTS.pop(session, 0) + 1
+        _LIVE_REQUESTS[session] = ticket
+        while len(_LIVE_REQUESTS) > LIVE_MAX_SESSIONS:
+            _LIVE_REQUESTS.popitem(last=False)
+        return ticket
+
+
+def _forget_live_session(request: gr.Request = None):
+    """Drop a closed session's live request counter."""
+    if request is not None:
+        with _LIVE_LOCK:
+            _LIVE_REQUESTS.pop(request.session_hash, None)
+
+
+def _is_latest_live_request(request, ticket):
+    """Check whether no newer live request arrived for this session."""
+    session = request.session_hash if request is not None else None
+    with _LIVE_LOCK:
+        return _LIVE_REQUESTS.get(session) == ticket
+
+
+async def live_diagnosis(live_enabled, temp, rh, rain, leafwet, soilm, drain, seedhealth, vector, stage,
+                         request: gr.Request = None):
+    """
+    Debounced first stage of live mode: risk table and primary diagnosis only.
+    
+    Waits LIVE_DEBOUNCE_SECONDS and skips the work if a newer slider change
+    arrived for the same session. Scores with the generated single-call
+    evaluator, which also yields the rule strengths used by the second stage.
+    The handler is a coroutine, so neither the wait nor the scheduled scoring
+    holds a Gradio worker thread.
+    
+    Returns:
+        tuple: (diagnosis_html, top_disease_info, live_state)
+    """
+    if not live_enabled:
+        # Clearing the state keeps the second stage from re-rendering the last live result
+        return gr.update(), gr.update(), None
+    
+    ticket = _register_live_request(request)
+    await asyncio.sleep(LIVE_DEBOUNCE_SECONDS)
+    if not _is_latest_live_request(request, ticket):
+        return gr.update(), gr.update(), gr.update()
+    
+    input_values = {
+        'Temp': temp,
+        'RH': rh,
+        'Rain': rain,
+        'LeafWet': leafwet,
+        'SoilM': soilm,
+        'Drain': drain,
+        'SeedHealth': seedhealth,
+        'Vector': vector,
+        'Stage': stage
+    }
+    scores, strengths = await asyncio.wrap_future(SCHEDULER.submit_call(
+        'interactive', EVALUATOR.diagnose_with_strengths,
+        *(input_values[name] for name in EVALUATOR.INPUT_NAMES)))
+    return render_live_diagnosis(ticket, scores, strengths, request=request)
+
+
+@profiled
+def render_live_diagnosis(ticket, scores, strengths, request: gr.Request = None):
+    """
+    Build the first-stage live outputs from one evaluator result.
+    
+    Returns:
+        tuple: (diagnosis_html, top_disease_info, live_state)
+    """
+    result = DiagnosisResult(RESULT_TABLE, scores, strengths)
+    sorted_results = result.sorted_items()
+    
+    state = {'ticket': ticket, 'result': result}
+    return build_results_html(sorted_results), build_top_disease_html(sorted_results), state
+
+
+@profiled
+def live_details(live_state, request: gr.Request = None):
+    """
+    Second stage of live mode: comparison plot and rule explanation.
+    
+    Skipped when the first stage was skipped or a newer request superseded it.
+    
+    Returns:
+        tuple: (comparison_plot, explanation_html)
+    """
+    if not live_state or not _is_latest_live_request(request, live_state['ticket']):
+        return gr.update(), gr.update()
+    
+    result = live_state['result']
+    sorted_results = result.sorted_items()
+    fired_rules = result.fired_rules()
+    
+    fig = plot_disease_comparison(result.to_dict())
+    # Rendering does not need pyplot's figure registry; closing keeps live updates from accumulating figures
+    plt.close(fig)
+    return fig, build_explanation_html(sorted_results, fired_rules)
 
 
 def show_input_plots():
@@ -304,6 +585,120 @@ def show_rule_base():
     return html
 
 
+def show_rule_statistics():
+    """Generate HTML table of rule firing statistics merged from the fleet snapshots."""
+    if not FLEET_STATS_DIR:
+        return "<p><i>No fleet statistics configured (set DIAGNOSIS_STATS_DIR to a snapshot directory).</i></p>"
+    
+    if FLEET_RECORDER is not None:
+        FLEET_RECORDER.save()  # Include this process's latest batches
+    stats, n_snapshots = merge_snapshots(sorted(glob.glob(os.path.join(FLEET_STATS_DIR, '*.npz'))), BATCH_ENGINE)
+    if stats.rows == 0:
+        return f"<p><i>No snapshots for the current rule base in {FLEET_STATS_DIR}.</i></p>"
+    
+    def fmt(value):
+        return "–" if value is None else f"{value:.2f}"
+    
+    html = f"""
+    <div style="font-family: Arial, sans-serif; padding: 20px; background-color: {COLORS['black']}; 
+                border-radius: 10px; max-height: 600px; overflow-y: auto;">
+        <p>{stats.rows:,} scored rows from {n_snapshots} snapshot(s); 
+           {len(stats.never_fired())} rule(s) never fired.</p>
+        <table style="width: 100%; border-collapse: collapse; text-align: right;">
+            <tr style="color: {COLORS['brown']};">
+                <th style="text-align: left;">Rule</th><th style="text-align: left;">Disease</th>
+                <th style="text-align: left;">Risk</th><th>Fired</th><th>Mean strength</th>
+                <th>p50</th><th>p90</th><th>Max</th>
+            </tr>
+    """
+    for row in stats.rule_table():
+        style = "color: #999;" if row['fired'] == 0 else ""
+        html += f"""
+            <tr style="{style}">
+                <td style="text-align: left;">Rule {row['rule_id']}</td>
+                <td style="text-align: left;">{row['disease']}</td>
+                <td style="text-align: left;">{row['risk']}</td>
+                <td>{row['fired_share']:.1%}</td><td>{fmt(row['mean_strength'])}</td>
+                <td>{fmt(row['p50'])}</td><td>{fmt(row['p90'])}</td><td>{fmt(row['max_strength'])}</td>
+            </tr>
+        """
+    html += "</table></div>"
+    return html
+
+
+def perform_region_summary(fields_file, disease):
+    """
+    Score an uploaded field table and summarize risk per region.
+    
+    The CSV needs a 'region' column plus one column per input variable;
+    rows that fail validation are left out of the summary. The roll-up covers
+    all diseases, so switching the disease afterwards only re-renders it.
+    
+    Returns:
+        tuple: (summary_html, region_summary state for render_region_summary)
+    """
+    if fields_file is None:
+        return "<p><i>Upload a field CSV with a 'region' column and one column per input variable.</i></p>", None
+    
+    with open(fields_file, newline='') as handle:
+        records = list(csv.DictReader(handle))
+    if not records or 'region' not in records[0]:
+        return "<p><i>The CSV has no rows or no 'region' column.</i></p>", None
+    
+    inputs, status = validate_inputs(records, BATCH_ENGINE, policy='reject')
+    valid = (status & STATUS_REJECTED) == 0
+    if not valid.any():
+        return "<p><i>No field passed input validation.</i></p>", None
+    region_names, region_index = encode_regions([record['region'] for record in records])
+    scores = SCHEDULER.submit(inputs[valid], priority='bulk').result()
+    rollup = region_rollup(region_index[valid], scores, BATCH_ENGINE['diseases'],
+                           n_regions=len(region_names), region_names=region_names)
+    
+    summary = {'rollup': rollup, 'fields': len(records), 'scored': int(valid.sum())}
+    return render_region_summary(summary, disease), summary
+
+
+def render_region_summary(summary, disease):
+    """
+    HTML table of one disease's region roll-up.
+    
+    Args:
+        summary: Region summary state from perform_region_summary (None before an upload)
+        disease: Disease name
+    
+    Returns:
+        str: HTML table
+    """
+    if summary is None:
+        return "<p><i>Upload a field CSV with a 'region' column and one column per input variable.</i></p>"
+    
+    rollup = summary['rollup']
+    html = f"""
+    <div style="font-family: Arial, sans-serif; padding: 20px; background-color: {COLORS['black']}; 
+                border-radius: 10px; max-height: 600px; overflow-y: auto;">
+        <p>{summary['scored']:,} of {summary['fields']:,} fields scored across {len(rollup['regions'])} region(s); 
+           {summary['fields'] - summary['scored']:,} rejected by input validation.</p>
+        <table style="width: 100%; border-collapse: collapse; text-align: right;">
+            <tr style="color: {COLORS['brown']};">
+                <th style="text-align: left;">Region</th><th>Fields</th><th>Mean</th><th>p50</th>
+                <th>p90</th><th>Max</th><th>Low</th><th>Moderate</th><th>High</th>
+            </tr>
+    """
+    for row in sorted(rollup_table(rollup, disease), key=lambda row: -np.nan_to_num(row['mean'], nan=-1.0)):
+        if row['fields'] == 0:
+            continue
+        html += f"""
+            <tr>
+                <td style="text-align: left;">{escape(str(row['region']))}</td><td>{row['fields']:,}</td>
+                <td style="color: {get_risk_color(interpret_risk(row['mean']))};">{row['mean']:.2f}</td>
+                <td>{row['p50']:.2f}</td><td>{row['p90']:.2f}</td><td>{row['max']:.2f}</td>
+                <td>{row['Low']:,}</td><td>{row['Moderate']:,}</td><td>{row['High']:,}</td>
+            </tr>
+        """
+    html += "</table></div>"
+    return html
+
+
 def show_membership_params():
     """Show membership function parameters as text."""
     return f"""
@@ -367,7 +762,9 @@ with gr.Blocks(
                     stage_slider = gr.Slider(0, 3, value=1.5, step=0.1, 
                                             label="Crop Stage (0=Seedling, 1=Vegetative, 2=Flowering, 3=Fruiting)")
             
-            diagnose_btn = gr.Button("🔍 Diagnose Diseases", variant="primary", size="lg")
+            with gr.Row():
+                diagnose_btn = gr.Button("🔍 Diagnose Diseases", variant="primary", size="lg")
+                live_toggle = gr.Checkbox(value=False, label="⚡ Live mode (update while moving sliders)")
             
             gr.Markdown("### 📊 Diagnosis Results")
             diagnosis_output = gr.HTML()
@@ -381,20 +778,54 @@ with gr.Blocks(
             explanation_output = gr.HTML()
             
             # Connect diagnosis button
+            diagnosis_sliders = [temp_slider, rh_slider, rain_slider, leafwet_slider, soilm_slider,
+                                 drain_slider, seedhealth_slider, vector_slider, stage_slider]
             diagnose_btn.click(
                 fn=perform_diagnosis,
-                inputs=[temp_slider, rh_slider, rain_slider, leafwet_slider, soilm_slider,
-                       drain_slider, seedhealth_slider, vector_slider, stage_slider],
-                outputs=[diagnosis_output, comparison_plot, top_disease_info, explanation_output]
-            )
-            diagnose_btn.click(
-                fn=perform_diagnosis,
-                inputs=[temp_slider, rh_slider, rain_slider, leafwet_slider, soilm_slider,
-                       drain_slider, seedhealth_slider, vector_slider, stage_slider],
-                outputs=[diagnosis_output, comparison_plot, top_disease_info, explanation_output]
+                inputs=diagnosis_sliders,
+                outputs=[diagnosis_output, comparison_plot, top_disease_info, explanation_output],
+                api_name="diagnose"
             )
+            
+            # Live mode: debounced table update first, then plot and explanation.
+            # always_last keeps at most one pending run per session, dropping intermediate drags.
+            live_state = gr.State()
+            for slider in diagnosis_sliders + [live_toggle]:
+                slider.change(
+                    fn=live_diagnosis,
+                    inputs=[live_toggle] + diagnosis_sliders,
+                    outputs=[diagnosis_output, top_disease_info, live_state],
+                    trigger_mode="always_last",
+                    show_progress="hidden"
+                ).then(
+                    fn=live_details,
+                    inputs=live_state,
+                    outputs=[comparison_plot, explanation_output],
+                    show_progress="hidden"
+                )
         
-        # Tab 2: Membership Functions
+        # Tab 2: What-If Explorer
+        with gr.Tab("🗺️ What-If Explorer"):
+            gr.Markdown("### Risk Heatmap Over Two Inputs")
+            gr.Markdown("All other inputs are held at the values set on the Diagnosis tab.")
+            
+            with gr.Row():
+                whatif_disease = gr.Dropdown(get_all_diseases(), value='Anthracnose', label="Disease")
+                whatif_x = gr.Dropdown(list(INPUT_LABELS.keys()), value='Temp', label="X Axis Input")
+                whatif_y = gr.Dropdown(list(INPUT_LABELS.keys()), value='LeafWet', label="Y Axis Input")
+                whatif_resolution = gr.Slider(50, 300, value=200, step=10, label="Grid Resolution")
+            
+            whatif_btn = gr.Button("🗺️ Generate Heatmap", variant="primary")
+            whatif_plot = gr.Plot(label="What-If Risk Heatmap")
+            
+            whatif_inputs = [whatif_disease, whatif_x, whatif_y, whatif_resolution,
+                             temp_slider, rh_slider, rain_slider, leafwet_slider, soilm_slider,
+                             drain_slider, seedhealth_slider, vector_slider, stage_slider]
+            whatif_btn.click(fn=perform_whatif, inputs=whatif_inputs, outputs=whatif_plot)
+            for control in (whatif_disease, whatif_x, whatif_y, whatif_resolution):
+                control.change(fn=perform_whatif, inputs=whatif_inputs, outputs=whatif_plot)
+        
+        # Tab 3: Membership Functions
         with gr.Tab("📈 Membership Functions"):
             gr.Markdown("### Fuzzy Membership Function Visualizations")
             
@@ -410,10 +841,37 @@ with gr.Blocks(
             gr.Markdown("### 📝 Membership Function Parameters")
             membership_params = gr.HTML(value=show_membership_params())
         
-        # Tab 3: Rule Base
+        # Tab 4: Rule Base
         with gr.Tab("📋 Rule Base"):
             gr.Markdown("### Complete Fuzzy Rule Base")
             rules_display = gr.HTML(value=show_rule_base())
+            
+            gr.Markdown("### 📊 Rule Firing in the Field")
+            rule_stats_display = gr.HTML(value=show_rule_statistics())
+            refresh_stats_btn = gr.Button("Refresh Statistics", variant="secondary")
+            refresh_stats_btn.click(fn=show_rule_statistics, outputs=rule_stats_display)
+        
+        # Tab 5: Region Summary
+        with gr.Tab("🏘️ Region Summary"):
+            gr.Markdown("### Risk Roll-Up by Region")
+            gr.Markdown("Upload a CSV of fields with a `region` column and one column per input variable "
+                        f"({', '.join(BATCH_ENGINE['input_names'])}).")
+            
+            with gr.Row():
+                region_file = gr.File(label="Field Table (CSV)", file_types=[".csv"], type="filepath")
+                region_disease = gr.Dropdown(get_all_diseases(), value='Anthracnose', label="Disease")
+            
+            region_btn = gr.Button("🏘️ Summarize Regions", variant="primary")
+            region_display = gr.HTML()
+            # The roll-up is computed once per upload; changing the disease only re-renders it
+            region_summary = gr.State()
+            region_btn.click(fn=perform_region_summary, inputs=[region_file, region_disease],
+                             outputs=[region_display, region_summary])
+            region_disease.change(fn=render_region_summary, inputs=[region_summary, region_disease],
+                                  outputs=region_display)
+    
+    # Live mode keeps one request counter per session; drop it when the session closes
+    app.unload(_forget_live_session)
     
     gr.Markdown(
         """
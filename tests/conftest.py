@@ -0,0 +1,29 @@
+"""
+Shared fixtures: the batch engine of the shipped rule base and random inputs within its bounds.
+"""
+
+import numpy as np
+import pytest
+
+from knowledge.fuzzy_system import INPUT_MF_PARAMS, create_output_variables
+from knowledge.batch_inference import compile_rule_base
+
+
+@pytest.fixture(scope='session')
+def engine():
+    """Compiled engine of the shipped rule base (shared, do not modify)."""
+    return compile_rule_base(INPUT_MF_PARAMS, create_output_variables())
+
+
+@pytest.fixture
+def random_inputs(engine):
+    """
+    Factory of uniform random input rows within the engine's input bounds.
+
+    Returns:
+        callable: random_inputs(n, seed=0) -> array of shape (n, n_inputs)
+    """
+    def make(n, seed=0):
+        low, high = engine['input_bounds'].T
+        return np.random.default_rng(seed).uniform(low, high, size=(n, len(low)))
+    return make
@@ -0,0 +1,49 @@
+"""
+Tests for the hysteresis alerting stage.
+"""
+
+import numpy as np
+
+from knowledge.alerting import RiskAlertTracker
+
+DISEASES = ['Anthracnose', 'Powdery Mildew']
+
+
+def run(tracker, series):
+    """Feed a single field's Anthracnose scores and collect formatted events."""
+    events = []
+    for score in series:
+        events.extend(tracker.format_events(tracker.update(np.array([[score, 0.0]]))))
+    return events
+
+
+def test_oscillation_around_threshold_alerts_once():
+    tracker = RiskAlertTracker(1, DISEASES, {'min_dwell': 1, 'hysteresis': 0.05, 'cooldown': 0})
+    events = run(tracker, [0.5, 0.61, 0.59, 0.62, 0.58, 0.61, 0.59])
+    assert [e['transition'] for e in events] == ['Low→Moderate', 'Moderate→High']
+
+
+def test_drop_below_band_and_min_dwell():
+    tracker = RiskAlertTracker(1, DISEASES, {'min_dwell': 2, 'hysteresis': 0.05, 'cooldown': 0})
+    events = run(tracker, [0.7, 0.7, 0.5, 0.5, 0.7])
+    assert [e['transition'] for e in events] == ['Low→High', 'High→Moderate']
+    # A single spike does not commit under min_dwell=2
+    assert tracker.level[0, 0] == 1
+
+
+def test_cooldown_folds_flapping_into_net_transition():
+    tracker = RiskAlertTracker(1, DISEASES, {'min_dwell': 1, 'hysteresis': 0.0, 'cooldown': 5})
+    events = run(tracker, [0.7, 0.3, 0.7, 0.7, 0.7, 0.7])
+    assert [e['transition'] for e in events] == ['Low→High']
+
+    events = run(tracker, [0.3] * 6)
+    assert [(e['transition'], e['tick']) for e in events] == [('High→Low', 7)]
+
+
+def test_partial_ticks_address_field_indices():
+    tracker = RiskAlertTracker(5, DISEASES, {'min_dwell': 1})
+    events = tracker.update(np.array([[0.9, 0.1], [0.1, 0.5]]), field_indices=[3, 1])
+    formatted = tracker.format_events(events, field_ids=['a', 'b', 'c', 'd', 'e'])
+    assert {(e['field'], e['disease'], e['to']) for e in formatted} == {
+        ('d', 'Anthracnose', 'High'), ('b', 'Powdery Mildew', 'Moderate')}
+    assert tracker.level[[0, 2, 4]].sum() == 0
@@ -0,0 +1,58 @@
+"""
+Tests for Arrow and buffer-protocol batch scoring.
+"""
+
+import array
+
+import numpy as np
+import pytest
+
+from knowledge.batch_inference import diagnose_batch
+from knowledge.arrow_io import column_to_numpy, diagnose_arrow, diagnose_file, score_columns
+from knowledge.validation import STATUS_REJECTED
+
+
+def test_buffer_protocol_columns_score_like_diagnose_batch(engine, random_inputs):
+    inputs = random_inputs(300)
+    inputs[7, 0] = np.nan
+    columns = [array.array('d', inputs[:, i]) for i in range(inputs.shape[1])]
+    scores, status = score_columns([column_to_numpy(column) for column in columns], engine, chunk_size=128)
+
+    assert status[7] & STATUS_REJECTED and np.isnan(scores[7]).all()
+    keep = np.arange(300) != 7
+    np.testing.assert_allclose(scores[keep], diagnose_batch(inputs[keep], engine), atol=1e-6)
+
+
+def test_arrow_file_streaming_round_trip(tmp_path, engine, random_inputs):
+    pa = pytest.importorskip('pyarrow')
+    pq = pytest.importorskip('pyarrow.parquet')
+    inputs = random_inputs(1000)
+    columns = {name: pa.array(inputs[:, i]) for i, name in enumerate(engine['input_names'])}
+    columns['field_id'] = pa.array(np.arange(1000))
+    table = pa.table(columns)
+    assert np.shares_memory(column_to_numpy(table.column('Temp')),
+                            np.frombuffer(table.column('Temp').chunk(0).buffers()[1], dtype=np.float64))
+
+    pq.write_table(table, tmp_path / 'fields.parquet', row_group_size=300)
+    summary = diagnose_file(tmp_path / 'fields.parquet', tmp_path / 'scores.parquet', engine,
+                            keep_columns=('field_id',), batch_size=250)
+    result = pq.read_table(tmp_path / 'scores.parquet')
+
+    assert summary == {'rows': 1000, 'rejected': 0, 'batches': summary['batches']} and summary['batches'] >= 4
+    assert result.column('field_id').to_pylist() == list(range(1000))
+    expected = diagnose_batch(inputs, engine)
+    np.testing.assert_allclose(result.column('Nematodes').to_numpy(), expected[:, -1], atol=1e-6)
+    levels = result.column('Nematodes level').to_pylist()
+    assert set(levels) <= {'Low', 'Moderate', 'High'} and len(levels) == 1000
+
+
+def test_empty_tables_and_ipc_files(tmp_path, engine, random_inputs):
+    pa = pytest.importorskip('pyarrow')
+    empty = diagnose_arrow(pa.table({name: pa.array([], pa.float64()) for name in engine['input_names']}), engine)
+    assert empty.num_rows == 0 and 'Nematodes level' in empty.schema.names
+
+    table = pa.table({name: pa.array(column) for name, column in zip(engine['input_names'], random_inputs(50).T)})
+    with pa.ipc.new_file(str(tmp_path / 'fields.arrow'), table.schema) as writer:
+        writer.write_table(table, max_chunksize=20)
+    summary = diagnose_file(tmp_path / 'fields.arrow', tmp_path / 'scores.arrow', engine)
+    assert summary == {'rows': 50, 'rejected': 0, 'batches': 3}
@@ -0,0 +1,176 @@
+"""
+Tests for the batched fuzzy inference engine and ensemble scoring.
+Checks the vectorized engine against the skfuzzy reference simulation.
+"""
+
+import contextlib
+import io
+
+import numpy as np
+
+from knowledge.fuzzy_system import (
+    create_input_variables,
+    create_output_variables,
+    create_fuzzy_rules,
+    create_control_systems,
+    diagnose_diseases,
+    trimf_membership,
+    INPUT_MF_PARAMS
+)
+from knowledge.batch_inference import (
+    compile_rule_base,
+    disease_subset,
+    get_disease_subset,
+    fuzzify_batch,
+    diagnose_batch,
+    evaluate_grid,
+    inputs_to_array,
+    scores_to_dicts,
+    interpret_risk_batch
+)
+from knowledge.forecast import aggregate_daily, score_ensemble
+
+INPUT_VARS = create_input_variables()
+OUTPUT_VARS = create_output_variables()
+RULES = create_fuzzy_rules(INPUT_VARS, OUTPUT_VARS)
+with contextlib.redirect_stdout(io.StringIO()):
+    DISEASE_SYSTEMS = create_control_systems(INPUT_VARS, OUTPUT_VARS, RULES)
+ENGINE = compile_rule_base(INPUT_VARS, OUTPUT_VARS)
+
+SCENARIOS = [
+    {'Temp': 25.0, 'RH': 60.0, 'Rain': 150.0, 'LeafWet': 20.0, 'SoilM': 50.0,
+     'Drain': 5.0, 'SeedHealth': 5.0, 'Vector': 3.0, 'Stage': 3.0},
+    {'Temp': 25.0, 'RH': 30.0, 'Rain': 20.0, 'LeafWet': 4.0, 'SoilM': 45.0,
+     'Drain': 5.0, 'SeedHealth': 7.0, 'Vector': 2.0, 'Stage': 2.0},
+    {'Temp': 35.0, 'RH': 50.0, 'Rain': 30.0, 'LeafWet': 10.0, 'SoilM': 40.0,
+     'Drain': 6.0, 'SeedHealth': 5.0, 'Vector': 9.0, 'Stage': 1.0},
+    {'Temp': 30.0, 'RH': 80.0, 'Rain': 100.0, 'LeafWet': 16.0, 'SoilM': 70.0,
+     'Drain': 3.0, 'SeedHealth': 2.0, 'Vector': 6.0, 'Stage': 2.5},
+]
+
+
+def reference_scores(records):
+    """Score input dicts one at a time through the skfuzzy simulation."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return np.array([list(diagnose_diseases(record, DISEASE_SYSTEMS).values()) for record in records],
+                        dtype=np.float64)
+
+
+def random_records(n, seed=0):
+    """Random input dicts, including some values outside the universes."""
+    rng = np.random.default_rng(seed)
+    low = ENGINE['input_bounds'][:, 0]
+    high = ENGINE['input_bounds'][:, 1]
+    rows = rng.uniform(low - 1, high + 1, size=(n, len(low)))
+    return [dict(zip(ENGINE['input_names'], row)) for row in rows]
+
+
+def test_batch_matches_reference_on_scenarios():
+    scores = diagnose_batch(inputs_to_array(SCENARIOS, ENGINE), ENGINE)
+    np.testing.assert_allclose(scores, reference_scores(SCENARIOS), atol=1e-9)
+
+
+def test_batch_matches_reference_on_random_inputs():
+    records = random_records(100)
+    scores = diagnose_batch(inputs_to_array(records, ENGINE), ENGINE, chunk_size=16)
+    np.testing.assert_allclose(scores, reference_scores(records), atol=1e-9)
+
+
+def test_scores_to_dicts_round_trip():
+    scores = diagnose_batch(inputs_to_array(SCENARIOS[0], ENGINE), ENGINE)
+    result = scores_to_dicts(scores, ENGINE)[0]
+    assert list(result.keys()) == ENGINE['diseases']
+    assert result['Anthracnose'] > 0.6
+
+
+def test_interpret_risk_batch_thresholds():
+    levels = interpret_risk_batch(np.array([0.0, 0.39, 0.4, 0.59, 0.6, 1.0]))
+    assert levels.tolist() == [0, 0, 1, 1, 2, 2]
+
+
+def test_score_ensemble_shapes_and_probabilities():
+    rng = np.random.default_rng(1)
+    members, steps = 5, 48
+    hourly = np.empty((members, steps, 9))
+    hourly[..., :] = inputs_to_array(SCENARIOS[0], ENGINE)[0]
+    hourly[..., 0] += rng.normal(0, 2, size=(members, steps))
+    hourly[..., 2] = rng.uniform(0, 10, size=(members, steps))
+    hourly[..., 3] = rng.uniform(0, 1, size=(members, steps))
+
+    daily = aggregate_daily(hourly, ENGINE)
+    assert daily.shape == (members, 2, 9)
+    np.testing.assert_allclose(daily[..., 2], hourly[..., 2].reshape(members, 2, 24).sum(axis=2))
+
+    summary = score_ensemble(hourly, ENGINE, keep_scores=True)
+    n_diseases = len(ENGINE['diseases'])
+    assert summary['percentiles'].shape == (5, steps, n_diseases)
+    assert summary['exceedance'].shape == (2, steps, n_diseases)
+    assert np.all((summary['exceedance'] >= 0) & (summary['exceedance'] <= 1))
+    # P(risk >= 0.6) can never exceed P(risk >= 0.4)
+    assert np.all(summary['exceedance'][1] <= summary['exceedance'][0])
+    np.testing.assert_allclose(summary['mean'], summary['scores'].mean(axis=0))
+
+
+def test_evaluate_grid_matches_batch_rows():
+    x_values = np.linspace(10, 40, 7)
+    y_values = np.linspace(0, 24, 5)
+    grid = evaluate_grid(SCENARIOS[0], 'Temp', x_values, 'LeafWet', y_values, 'Anthracnose', ENGINE)
+    assert grid.shape == (5, 7)
+
+    record = dict(SCENARIOS[0], Temp=x_values[3], LeafWet=y_values[2])
+    expected = diagnose_batch(inputs_to_array(record, ENGINE), ENGINE)[0, 0]
+    assert abs(grid[2, 3] - expected) < 1e-12
+
+
+def test_analytic_fuzzification_matches_sampled_universes():
+    for var_name, var in INPUT_VARS.items():
+        values = np.concatenate([var.universe, np.linspace(var.universe.min(), var.universe.max(), 997)])
+        for term_name, term in var.terms.items():
+            expected = np.interp(values, var.universe, term.mf)
+            np.testing.assert_allclose(trimf_membership(values, INPUT_MF_PARAMS[var_name]['terms'][term_name]),
+                                       expected, atol=1e-12)
+
+
+def test_engine_from_parameters_needs_no_sampled_universes():
+    engine = compile_rule_base(INPUT_MF_PARAMS, OUTPUT_VARS)
+    assert engine['version'] == ENGINE['version']
+    assert 'universes' not in engine and engine['term_params'].shape == (ENGINE['n_terms'], 3)
+
+    # Triangle corners, where sampled universes used to leave tiny non-zero memberships
+    records = [dict(SCENARIOS[3], RH=80.0, Rain=50.0), dict(SCENARIOS[0], Temp=30.0, SoilM=65.0)]
+    inputs = inputs_to_array(records, engine)
+    np.testing.assert_array_equal(fuzzify_batch(inputs, engine), fuzzify_batch(inputs, ENGINE))
+    np.testing.assert_allclose(diagnose_batch(inputs, engine), reference_scores(records), atol=1e-9)
+
+
+def test_disease_subset_evaluates_only_the_needed_rules_and_inputs():
+    viral = ['Mosaic Viruses', 'Viral Leaf Curl']
+    subset = disease_subset(ENGINE, viral)
+    assert subset['diseases'] == viral
+    assert all(rule['disease'] in viral for rule in subset['rules'])
+    assert set(subset['input_names']) == {var for rule in subset['rules'] for var in rule['conditions']}
+    assert len(subset['input_names']) < len(ENGINE['input_names'])
+    assert get_disease_subset(ENGINE, viral) is get_disease_subset(ENGINE, viral)
+
+    records = random_records(200, seed=3)
+    inputs = inputs_to_array(records, ENGINE)
+    full = diagnose_batch(inputs, ENGINE)
+    columns = [ENGINE['diseases'].index(name) for name in viral]
+    np.testing.assert_allclose(diagnose_batch(inputs, ENGINE, diseases=viral), full[:, columns], atol=1e-12)
+
+    # The skfuzzy path takes the same subset and only needs the subset's inputs
+    partial = [{var: record[var] for var in subset['input_names']} for record in records[:20]]
+    with contextlib.redirect_stdout(io.StringIO()):
+        reference = [list(diagnose_diseases(record, DISEASE_SYSTEMS, diseases=viral).values()) for record in partial]
+    np.testing.assert_allclose(reference, full[:20, columns], atol=1e-9)
+
+
+def test_disease_subset_cache_is_bounded(monkeypatch):
+    import knowledge.batch_inference as batch_inference
+    monkeypatch.setattr(batch_inference, 'MAX_CACHED_SUBSETS', 2)
+    diseases = ENGINE['diseases']
+    first = get_disease_subset(ENGINE, diseases[:1])
+    for name in diseases[1:4]:
+        get_disease_subset(ENGINE, [name])
+    assert len(batch_inference._SUBSETS) == 2
+    assert get_disease_subset(ENGINE, diseases[:1]) is not first
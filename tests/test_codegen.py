@@ -0,0 +1,82 @@
+"""
+Tests for the generated straight-line evaluator.
+"""
+
+import contextlib
+import io
+
+import numpy as np
+
+from knowledge.fuzzy_system import (
+    INPUT_MF_PARAMS,
+    create_input_variables,
+    create_output_variables,
+    create_fuzzy_rules,
+    create_control_systems,
+    diagnose_diseases
+)
+from knowledge.batch_inference import compile_rule_base, diagnose_batch, specialize
+from knowledge.codegen import build_evaluator, generate_evaluator_source, get_evaluator
+from knowledge.disease_knowledge import FUZZY_RULES
+
+OUTPUT_VARS = create_output_variables()
+
+
+def test_generated_evaluator_matches_skfuzzy_reference(engine):
+    input_vars = create_input_variables()
+    with contextlib.redirect_stdout(io.StringIO()):
+        system = create_control_systems(input_vars, OUTPUT_VARS, create_fuzzy_rules(input_vars, OUTPUT_VARS))
+    evaluator = get_evaluator(engine)
+
+    rng = np.random.default_rng(7)
+    low, high = engine['input_bounds'].T
+    for row in np.round(rng.uniform(low, high, size=(60, len(low))), 1):
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = diagnose_diseases(dict(zip(engine['input_names'], row)), system)
+        scores, strengths = evaluator.diagnose_with_strengths(*row.tolist())
+        np.testing.assert_allclose(scores, [expected[d] for d in evaluator.DISEASES], atol=1e-9)
+        assert len(strengths) == len(FUZZY_RULES)
+
+
+def test_evaluator_is_regenerated_for_a_changed_rule_base(tmp_path, engine):
+    path = tmp_path / 'evaluator.py'
+    first = build_evaluator(engine, path=str(path))
+    assert first.RULE_BASE_VERSION == engine['version']
+
+    rules = [dict(rule, risk='High') if rule['id'] == 4 else rule for rule in FUZZY_RULES]
+    changed = compile_rule_base(INPUT_MF_PARAMS, OUTPUT_VARS, rules)
+    second = build_evaluator(changed, path=str(path))
+    assert second.RULE_BASE_VERSION == changed['version'] != engine['version']
+    assert "RULE_BASE_VERSION = '" + changed['version'] in path.read_text()
+
+    # An empty or one-line leftover (e.g. an interrupted write) is regenerated
+    for leftover in ('', '"""Generated fuzzy evaluator"""'):
+        path.write_text(leftover)
+        assert build_evaluator(engine, path=str(path)).RULE_BASE_VERSION == engine['version']
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_specialized_engine_generates_smaller_evaluator(engine):
+    specialized = specialize(engine, {'Drain': 3.0, 'SeedHealth': 6.2, 'Stage': 1.3})
+    assert len(generate_evaluator_source(specialized)) < len(generate_evaluator_source(engine))
+    evaluator = build_evaluator(specialized)
+
+    rng = np.random.default_rng(3)
+    low, high = specialized['input_bounds'].T
+    inputs = rng.uniform(low, high, size=(200, len(low)))
+    expected = diagnose_batch(inputs, specialized)
+    np.testing.assert_allclose([evaluator.diagnose(*row) for row in inputs.tolist()], expected, atol=1e-12)
+
+
+def test_nan_inputs_match_no_term_in_either_engine(engine):
+    evaluator = get_evaluator(engine)
+    low, high = engine['input_bounds'].T
+    inputs = np.random.default_rng(1).uniform(low, high, size=(len(low), len(low)))
+    inputs[np.diag_indices(len(low))] = np.nan
+
+    expected, expected_strengths = diagnose_batch(inputs, engine, return_strengths=True)
+    assert np.isfinite(expected).all() and np.isfinite(expected_strengths).all()
+    for row, scores, strengths in zip(inputs.tolist(), expected, expected_strengths):
+        actual, actual_strengths = evaluator.diagnose_with_strengths(*row)
+        np.testing.assert_allclose(actual, scores, atol=1e-9)
+        np.testing.assert_allclose(actual_strengths, strengths, atol=1e-12)
@@ -0,0 +1,40 @@
+"""
+Tests for the batched counterfactual search.
+"""
+
+import numpy as np
+
+from knowledge.fuzzy_system import interpret_risk
+from knowledge.batch_inference import diagnose_batch, inputs_to_array
+from knowledge.counterfactual import CONTROLLABLE_INPUTS, find_counterfactual
+
+# Hot, waterlogged and poorly drained: Fusarium Wilt is High
+WET_FIELD = {'Temp': 35.0, 'RH': 70.0, 'Rain': 80.0, 'LeafWet': 8.0, 'SoilM': 80.0,
+             'Drain': 1.0, 'SeedHealth': 5.0, 'Vector': 3.0, 'Stage': 2.0}
+
+
+def score_of(engine, input_values, disease):
+    scores = diagnose_batch(inputs_to_array(input_values, engine), engine)
+    return scores[0, engine['diseases'].index(disease)]
+
+
+def test_counterfactual_lowers_risk_with_a_small_change(engine):
+    result = find_counterfactual(WET_FIELD, 'Fusarium Wilt', engine)
+    assert result['level'] == 'High' and result['found']
+    assert set(result['changes']) <= set(CONTROLLABLE_INPUTS) and len(result['changes']) == 1
+
+    changed = dict(WET_FIELD, **{name: new for name, (_, new) in result['changes'].items()})
+    assert interpret_risk(score_of(engine, changed, 'Fusarium Wilt')) in ('Low', 'Moderate')
+    assert np.isclose(score_of(engine, changed, 'Fusarium Wilt'), result['new_score'])
+
+
+def test_weights_steer_which_input_changes(engine):
+    cheap_drainage = find_counterfactual(WET_FIELD, 'Fusarium Wilt', engine, weights={'SoilM': 100.0})
+    assert list(cheap_drainage['changes']) == ['Drain']
+    cheap_irrigation = find_counterfactual(WET_FIELD, 'Fusarium Wilt', engine, weights={'Drain': 100.0})
+    assert list(cheap_irrigation['changes']) == ['SoilM']
+
+    # Already at the lowest level: nothing to change
+    result = find_counterfactual(dict(WET_FIELD, SoilM=40.0, Drain=8.0), 'Fusarium Wilt', engine,
+                                 target_level='Low')
+    assert result['found'] and result['changes'] == {} and result['cost'] == 0.0
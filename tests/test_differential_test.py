@@ -0,0 +1,48 @@
+"""
+Tests for the differential testing harness between inference engines.
+"""
+
+import numpy as np
+
+from knowledge.batch_inference import diagnose_batch
+from ui.differential_test import SCORERS, breakpoints, generate_inputs, run_differential, shrink_report
+
+
+def faulty_scorer(engine):
+    """Batch engine with an injected error on the first disease above 33 degrees."""
+    def score(inputs):
+        scores = diagnose_batch(inputs, engine)
+        scores[:, 0] += 0.01 * (np.asarray(inputs)[:, 0] > 33)
+        return scores
+    return score
+
+
+def test_generated_inputs_cover_scenarios_and_breakpoints(engine):
+    scenarios = [{name: 1.0 for name in engine['input_names']}]
+    inputs, sources = generate_inputs(engine, 2000, seed=1, scenarios=scenarios)
+
+    assert inputs.shape == (2000, 9) and sources[0] == 0 and (inputs[0] == 1.0).all()
+    low, high = engine['input_bounds'].T
+    assert ((inputs[1:] >= low) & (inputs[1:] <= high)).all()
+    on_breakpoint = np.isin(inputs[sources == 2, 0], breakpoints(engine)[0])
+    assert 0.1 < on_breakpoint.mean() < 0.9
+
+
+def test_failures_are_detected_and_shrunk(engine):
+    inputs, _ = generate_inputs(engine, 3000, seed=2, scenarios=[])
+    scorers = dict(SCORERS, faulty=faulty_scorer)
+    report = run_differential(inputs, engine, 'batch', ('codegen', 'faulty'), workers=1, chunk_size=1000,
+                              scorers=scorers)
+
+    assert report['candidates']['codegen']['n_failing_rows'] == 0
+    faulty = report['candidates']['faulty']
+    assert not report['passed'] and faulty['n_failing_rows'] == (inputs[:, 0] > 33).sum()
+    assert faulty['tolerance_failures']['Anthracnose'] == faulty['n_failing_rows']
+    assert faulty['tolerance_failures']['Nematodes'] == 0
+
+    reproducer = shrink_report(report, inputs, engine, max_reproducers=1, scorers=scorers)[0]
+    low, high = engine['input_bounds'].T
+    midpoints = dict(zip(engine['input_names'], np.round((low + high) / 2)))
+    assert reproducer['candidate'] == 'faulty' and reproducer['disease'] == 'Anthracnose'
+    assert reproducer['inputs']['Temp'] > 33 and reproducer['difference'] > 0.009
+    assert all(value == midpoints[name] for name, value in reproducer['inputs'].items() if name != 'Temp')
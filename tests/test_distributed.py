@@ -0,0 +1,103 @@
+"""
+Tests for sharded batch scoring over TCP.
+"""
+
+import socket
+import socketserver
+import struct
+import threading
+
+import numpy as np
+import pytest
+
+from knowledge.batch_inference import diagnose_batch
+from knowledge.distributed import (
+    MSG_HELLO, MSG_SCORES, MSG_SHARD, ShardCoordinator, ShardStore, ShardWorker, recv_message, send_message,
+)
+
+
+class DroppingHandler(socketserver.BaseRequestHandler):
+    """A worker that streams one bogus score frame per shard and then drops the connection."""
+
+    def handle(self):
+        engine = self.server.engine
+        recv_message(self.request)
+        send_message(self.request, MSG_HELLO, {'version': engine['version'], 'worker': 'dropping'})
+        _, header, _ = recv_message(self.request, 10 ** 8, '<f8', len(engine['input_names']))
+        send_message(self.request, MSG_SCORES, {'shard_id': header['shard_id'], 'offset': 0},
+                     np.full((5, len(engine['diseases'])), 9.0, dtype=np.float32))
+
+
+def test_shards_are_retried_after_worker_loss_and_resumed(tmp_path, engine, random_inputs):
+    inputs = random_inputs(12000)
+    workers = [ShardWorker(('127.0.0.1', 0), engine, chunk_size=700) for _ in range(2)]
+    dropping = socketserver.ThreadingTCPServer(('127.0.0.1', 0), DroppingHandler)
+    dropping.daemon_threads = True
+    dropping.engine = engine
+    threading.Thread(target=dropping.serve_forever, daemon=True).start()
+    for worker in workers:
+        worker.start()
+    addresses = [('127.0.0.1', worker.server_address[1]) for worker in workers]
+    try:
+        coordinator = ShardCoordinator(addresses + [('127.0.0.1', dropping.server_address[1])], engine,
+                                       shard_size=1000, reconnect_delay=0.01, max_reconnects=2)
+        store = coordinator.run(inputs, output_dir=tmp_path)
+        status = coordinator.status()
+
+        np.testing.assert_allclose(store.scores(), diagnose_batch(inputs, engine), atol=1e-6)
+        assert status['committed'] == status['shards'] == 12 and status['retries'] >= 1
+        assert status['workers'][f"127.0.0.1:{dropping.server_address[1]}"]['state'] == 'lost'
+
+        # Re-running on the same directory finds every shard committed
+        resumed = ShardCoordinator(addresses[:1], engine, shard_size=1000)
+        resumed.run(inputs, output_dir=tmp_path)
+        assert resumed.worker_stats[f"127.0.0.1:{addresses[0][1]}"]['shards'] == 0
+    finally:
+        for worker in workers:
+            worker.stop()
+        dropping.shutdown()
+        dropping.server_close()
+
+
+def test_shard_commits_are_idempotent(tmp_path):
+    shards = [(0, 0, 3), (1, 3, 5)]
+    store = ShardStore(5, shards, 2, 'v1', output_dir=tmp_path)
+    assert store.commit(1, np.ones((2, 2)))
+    assert not store.commit(1, np.zeros((2, 2)))
+    np.testing.assert_array_equal(store.scores()[3:], 1.0)
+    assert np.isnan(store.scores()[:3]).all()
+
+    assert ShardStore(5, shards, 2, 'v1', output_dir=tmp_path).committed == {1}
+    with pytest.raises(ValueError, match="different job"):
+        ShardStore(5, shards, 2, 'v2', output_dir=tmp_path)
+
+
+def test_malformed_frames_and_wrong_secrets_are_refused(engine, random_inputs):
+    inputs = random_inputs(500)
+    worker = ShardWorker(('127.0.0.1', 0), engine, secret='s3cret', max_shard_rows=1000)
+    worker.start()
+    address = ('127.0.0.1', worker.server_address[1])
+    try:
+        # A frame announcing a huge payload is refused before anything is allocated
+        with socket.create_connection(address) as sock:
+            sock.sendall(struct.pack('!BIQ', MSG_HELLO, 2, 2 ** 62) + b'{}')
+            assert sock.recv(1) == b''
+
+        wrong = ShardCoordinator([address], engine, shard_size=100, reconnect_delay=0.01, max_reconnects=1,
+                                 secret='guess')
+        with pytest.raises(RuntimeError):
+            wrong.run(inputs)
+        assert wrong.worker_stats[f"127.0.0.1:{address[1]}"]['state'] == 'incompatible'
+
+        # Peer-chosen dtypes are rejected after authentication, too
+        coordinator = ShardCoordinator([address], engine, shard_size=100, secret='s3cret')
+        sock = coordinator._connect(address, f"127.0.0.1:{address[1]}")
+        with sock:
+            send_message(sock, MSG_SHARD, {'shard_id': 0}, inputs.astype('>i8'))
+            assert sock.recv(1) == b''
+
+        # The worker keeps serving coordinators that know the secret
+        store = ShardCoordinator([address], engine, shard_size=100, secret=b's3cret').run(inputs)
+        np.testing.assert_allclose(store.scores(), diagnose_batch(inputs, engine), atol=1e-6)
+    finally:
+        worker.stop()
@@ -0,0 +1,73 @@
+"""
+Tests for fleet-wide streaming statistics and mergeable snapshots.
+"""
+
+import numpy as np
+import pytest
+
+from knowledge.batch_inference import diagnose_batch
+from knowledge.fleet_stats import DEFAULT_BINS, FleetRecorder, FleetStatistics, load_snapshot, merge_snapshots
+from knowledge.scheduler import InferenceScheduler
+
+
+def test_streaming_statistics_match_exact_values(engine, random_inputs):
+    inputs = random_inputs(3000)
+    stats = FleetStatistics(engine)
+    for start in range(0, 3000, 500):
+        stats.observe(inputs[start:start + 500], engine)
+    scores, strengths = diagnose_batch(inputs, engine, return_strengths=True)
+
+    assert stats.rows == 3000
+    np.testing.assert_array_equal(stats.strengths.count, (strengths > 0).sum(axis=0))
+    np.testing.assert_allclose(stats.scores.mean(), scores.mean(axis=0))
+    tolerance = (engine['input_bounds'][:, 1] - engine['input_bounds'][:, 0]) / DEFAULT_BINS
+    assert (np.abs(stats.inputs.quantiles([0.5])[:, 0] - np.median(inputs, axis=0)) <= tolerance).all()
+
+    table = stats.rule_table()
+    assert [row['rule_id'] for row in table] == list(engine['rule_ids'])
+    fired = strengths[:, 0][strengths[:, 0] > 0]
+    assert np.isclose(table[0]['max_strength'], fired.max())
+    assert abs(table[0]['p50'] - np.median(fired)) <= 1 / DEFAULT_BINS
+    assert stats.never_fired() == [int(r) for r, n in zip(engine['rule_ids'], (strengths > 0).sum(axis=0)) if n == 0]
+
+
+def test_snapshots_merge_exactly(tmp_path, engine, random_inputs):
+    whole = FleetStatistics(engine)
+    whole.observe(random_inputs(1000, seed=1), engine)
+    paths = []
+    for worker, rows in enumerate((slice(0, 400), slice(400, 1000))):
+        part = FleetStatistics(engine)
+        part.observe(random_inputs(1000, seed=1)[rows], engine)
+        paths.append(str(tmp_path / f"worker{worker}.npz"))
+        part.save(paths[-1])
+
+    other = FleetStatistics(dict(engine, version='old'))
+    other.save(str(tmp_path / "old.npz"))
+    merged, n_merged = merge_snapshots(paths + [str(tmp_path / "old.npz")], engine)
+    assert n_merged == 2 and merged.rows == whole.rows
+    for name in ('strengths', 'scores', 'inputs'):
+        np.testing.assert_array_equal(getattr(merged, name).counts, getattr(whole, name).counts)
+    np.testing.assert_array_equal(merged.scores.maximum, whole.scores.maximum)
+    assert load_snapshot(paths[0], engine).rows == 400
+
+
+def test_scheduler_batches_are_recorded_and_bad_snapshots_skipped(tmp_path, engine, random_inputs):
+    recorder = FleetRecorder(engine, str(tmp_path), snapshot_seconds=0.0, name='app')
+    inputs = random_inputs(600, seed=2)
+    with InferenceScheduler(engine, workers=1, bulk_chunk_size=200, statistics=recorder) as scheduler:
+        scores = scheduler.submit(inputs, priority='bulk').result(timeout=60)
+    np.testing.assert_allclose(scores, diagnose_batch(inputs, engine))
+    assert recorder.snapshots == 3 and load_snapshot(recorder.path, engine).rows == 600
+
+    # A stale coarse snapshot sorted first neither changes nor displaces the real one
+    coarse = FleetStatistics(engine, bins=10)
+    coarse.observe(random_inputs(400, seed=3), engine)
+    coarse.save(str(tmp_path / '0-coarse.npz'))
+    (tmp_path / 'corrupt.npz').write_bytes(b'not a snapshot')
+    merged, n_merged = merge_snapshots(sorted(str(p) for p in tmp_path.glob('*.npz')), engine)
+    assert n_merged == 1 and merged.rows == 600
+    assert merged.rule_table()[0]['fired_share'] == recorder.statistics.rule_table()[0]['fired_share']
+
+    with pytest.raises(ValueError):
+        merged.merge(coarse)
+    assert merged.rows == 600
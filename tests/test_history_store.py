@@ -0,0 +1,57 @@
+"""
+Tests for the append-only columnar diagnosis history store.
+"""
+
+import numpy as np
+
+from knowledge.history_store import HistoryStore, append_results
+
+INPUT_NAMES = ['Temp', 'RH', 'Rain']
+DISEASES = ['Anthracnose', 'Powdery Mildew']
+
+
+def make_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    fields = rng.choice(['north', 'south', 'east'], size=n)
+    times = np.datetime64('2026-01-01', 's') + rng.integers(0, 86400 * 30, size=n).astype('timedelta64[s]')
+    return fields, times, rng.uniform(0, 100, size=(n, 3)), rng.uniform(0, 1, size=(n, 2))
+
+
+def expected_rows(fields, times, inputs, scores, field, start, end):
+    rows = np.flatnonzero((fields == field) & (times >= start) & (times < end))
+    rows = rows[np.lexsort((np.arange(len(rows)), times[rows]))]
+    return times[rows], inputs[rows], scores[rows]
+
+
+def test_appends_across_segments_and_range_queries(tmp_path):
+    store = HistoryStore(str(tmp_path), INPUT_NAMES, DISEASES, segment_rows=64)
+    fields, times, inputs, scores = make_rows(300)
+    for start in range(0, 300, 70):
+        store.append(fields[start:start + 70], times[start:start + 70],
+                     inputs[start:start + 70], scores[start:start + 70])
+    assert len(store) == 300
+
+    start, end = np.datetime64('2026-01-05'), np.datetime64('2026-01-20')
+    chunks = store.query('north', start, end)
+    # Sealed segments return views of the mapped columns
+    assert all(isinstance(chunk['inputs'], np.memmap) for chunk in chunks[:-1])
+
+    for reopened in (store, HistoryStore(str(tmp_path))):
+        result = reopened.read('north', start, end)
+        exp_times, exp_inputs, exp_scores = expected_rows(fields, times, inputs, scores, 'north', start, end)
+        np.testing.assert_array_equal(result['time'], exp_times)
+        np.testing.assert_allclose(result['inputs'], exp_inputs, rtol=1e-6)
+        np.testing.assert_allclose(result['scores'], exp_scores, rtol=1e-6)
+    assert store.query('west') == []
+
+
+def test_quantized_scores_and_single_results(tmp_path):
+    store = HistoryStore(str(tmp_path), INPUT_NAMES, DISEASES, segment_rows=8, score_encoding='uint16')
+    for day in range(10):
+        append_results(store, 'plot-7', np.datetime64('2026-03-01') + np.timedelta64(day, 'D'),
+                       {'Temp': 20 + day, 'RH': 80, 'Rain': 5}, {'Anthracnose': day / 10, 'Powdery Mildew': 0.5})
+
+    history = store.read('plot-7', np.datetime64('2026-03-03'))
+    assert len(history['time']) == 8
+    np.testing.assert_allclose(history['scores'][:, 0], np.arange(2, 10) / 10, atol=1e-5)
+    np.testing.assert_array_equal(history['inputs'][:, 0], np.arange(22, 30))
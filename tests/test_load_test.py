@@ -0,0 +1,70 @@
+"""
+Tests for the local load testing harness.
+Runs a short ramp against an in-process HTTP endpoint.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ui.load_test import (
+    INPUT_ORDER,
+    compare_reports,
+    json_caller,
+    make_input_sampler,
+    parse_ramp,
+    require_local,
+    run_load_test,
+    summarize,
+    users_at
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        status = 200 if set(body) == set(INPUT_ORDER) and body['Temp'] < 25 else 500
+        self.send_response(status)
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+
+def test_ramp_parsing_and_user_counts():
+    stages = parse_ramp('2:1, 2-6:2')
+    assert stages == [(2, 2, 1.0), (2, 6, 2.0)]
+    assert users_at(stages, 0.5) == 2
+    assert users_at(stages, 2.0) == 4
+    assert users_at(stages, 3.5) == 0
+
+
+def test_only_localhost_targets_are_allowed():
+    require_local('http://127.0.0.1:7860')
+    with pytest.raises(ValueError):
+        require_local('http://example.com/diagnose')
+
+
+def test_short_run_reports_throughput_latency_and_errors():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        stages = parse_ramp('1:0.3,3:0.3')
+        call = json_caller(f"http://127.0.0.1:{server.server_port}/diagnose", timeout=5)
+        raw = run_load_test(call, stages, make_input_sampler('uniform', seed=0))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    report = summarize(raw, stages, bucket_seconds=0.2)
+    overall = report['overall']
+    assert overall['requests'] > 0
+    assert 0 < overall['error_rate'] < 1   # Temp >= 25 is rejected by the stub endpoint
+    assert overall['p50_ms'] <= overall['p95_ms'] <= overall['p99_ms']
+    assert len(report['stages']) == 2 and len(report['timeline']) == 3
+
+    comparison = compare_reports(report, report)
+    assert comparison['throughput_rps'][2] == 0.0
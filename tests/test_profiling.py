@@ -0,0 +1,45 @@
+"""
+Tests for the opt-in per-request profiling hooks.
+"""
+
+import os
+
+from ui.profiling import profiled
+
+
+class FakeRequest:
+    def __init__(self, query_params):
+        self.query_params = query_params
+
+
+def handler(x, request=None):
+    return sum(i * x for i in range(1000))
+
+
+def test_disabled_returns_handler_unchanged(monkeypatch):
+    monkeypatch.delenv('DIAGNOSIS_PROFILE', raising=False)
+    assert profiled(handler) is handler
+
+
+def test_query_flag_writes_reports(monkeypatch, tmp_path):
+    monkeypatch.setenv('DIAGNOSIS_PROFILE', 'query')
+    monkeypatch.setenv('DIAGNOSIS_PROFILE_DIR', str(tmp_path))
+    wrapped = profiled(handler, name='unit')
+
+    assert wrapped(2, FakeRequest({})) == handler(2)
+    assert os.listdir(tmp_path) == []
+
+    assert wrapped(2, request=FakeRequest({'profile': '1'})) == handler(2)
+    suffixes = sorted(name.split('.', 1)[1] for name in os.listdir(tmp_path))
+    assert suffixes == ['alloc.txt', 'collapsed', 'prof']
+
+    collapsed = next(tmp_path.glob('*.collapsed')).read_text().splitlines()
+    assert any('handler (test_profiling.py' in line for line in collapsed)
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in collapsed)
+
+
+def test_sampling_rate_one_profiles_every_call(monkeypatch, tmp_path):
+    monkeypatch.setenv('DIAGNOSIS_PROFILE', '1.0')
+    monkeypatch.setenv('DIAGNOSIS_PROFILE_DIR', str(tmp_path))
+    profiled(handler)(3)
+    assert len(list(tmp_path.glob('*.prof'))) == 1
@@ -0,0 +1,40 @@
+"""
+Tests for vectorized regional roll-ups of field risk.
+"""
+
+import numpy as np
+
+from knowledge.batch_inference import interpret_risk_batch
+from knowledge.regional import encode_regions, region_rollup, rollup_table
+
+
+def test_rollup_matches_per_region_reference():
+    rng = np.random.default_rng(0)
+    region_index = rng.integers(0, 6, size=2000)
+    region_index[region_index == 4] = 5  # region 4 has no fields
+    scores = rng.random((2000, 3))
+    rollup = region_rollup(region_index, scores, ['A', 'B', 'C'], n_regions=7, quantiles=(0.1, 0.5, 0.9))
+
+    np.testing.assert_array_equal(rollup['field_counts'], np.bincount(region_index, minlength=7))
+    for region in (0, 3, 5):
+        rows = scores[region_index == region]
+        np.testing.assert_allclose(rollup['mean'][region], rows.mean(axis=0))
+        np.testing.assert_allclose(rollup['max'][region], rows.max(axis=0))
+        np.testing.assert_allclose(rollup['quantiles'][region], np.quantile(rows, [0.1, 0.5, 0.9], axis=0).T)
+        for d in range(3):
+            expected = np.bincount(interpret_risk_batch(rows[:, d]), minlength=3)
+            np.testing.assert_array_equal(rollup['level_counts'][region, d], expected)
+    for region in (4, 6):
+        assert rollup['field_counts'][region] == 0
+        assert np.isnan(rollup['mean'][region]).all() and np.isnan(rollup['quantiles'][region]).all()
+
+
+def test_rollup_table_uses_region_names():
+    names, region_index = encode_regions(['north', 'south', 'north', 'east'])
+    scores = np.array([[0.2], [0.5], [0.8], [0.1]])
+    table = rollup_table(region_rollup(region_index, scores, ['A'], region_names=names), 'A')
+
+    assert [row['region'] for row in table] == ['east', 'north', 'south']
+    north = table[1]
+    assert north['fields'] == 2 and north['max'] == 0.8 and north['p50'] == 0.5
+    assert (north['Low'], north['Moderate'], north['High']) == (1, 0, 1)
@@ -0,0 +1,63 @@
+"""
+Tests for change-detection re-scoring of field fleets.
+"""
+
+import numpy as np
+
+from knowledge.batch_inference import diagnose_batch
+from knowledge.rescoring import ChangeDetectionRescorer
+
+
+def test_only_changed_fields_are_rescored(engine, random_inputs):
+    fields = [f"field-{i}" for i in range(50)]
+    inputs = random_inputs(50)
+    rescorer = ChangeDetectionRescorer(engine, tolerance=0.05)
+
+    scores, report = rescorer.update(fields, inputs)
+    assert report['rescored'] == 50 and report['new_fields'] == 50
+    np.testing.assert_allclose(scores, diagnose_batch(inputs, engine), atol=1e-6)
+
+    # Sub-tolerance noise everywhere, real changes on five fields
+    updated = inputs + 0.01
+    updated[[3, 7, 11, 19, 42], 1] += 5.0
+    scores, report = rescorer.update(fields, updated)
+    assert report['rescored'] == 5 and report['skipped'] == 45
+    assert report['estimated_saved_s'] > 0
+    np.testing.assert_allclose(scores[[3, 7]], diagnose_batch(updated[[3, 7]], engine), atol=1e-6)
+    np.testing.assert_allclose(scores[0], diagnose_batch(inputs[:1], engine)[0], atol=1e-6)
+
+    # Drift is measured from the last scored inputs, so it cannot creep past the tolerance
+    _, report = rescorer.update(fields, inputs + 0.06)
+    assert report['rescored'] == 50
+
+
+def test_rule_base_change_and_invalidation_force_rescoring(engine, random_inputs):
+    fields = ['a', 'b', 'c']
+    inputs = random_inputs(3, seed=1)
+    rescorer = ChangeDetectionRescorer(engine)
+    rescorer.update(fields, inputs)
+
+    rescorer.invalidate(['b'])
+    _, report = rescorer.update(fields, inputs)
+    assert report['rescored'] == 1
+
+    rescorer.set_engine(dict(engine, version='next'))
+    _, report = rescorer.update(fields + ['d'], random_inputs(4, seed=1))
+    assert report['rescored'] == 4 and report['new_fields'] == 1
+
+
+def test_nan_transitions_count_as_changes(engine, random_inputs):
+    fields = ['a', 'b', 'c']
+    inputs = random_inputs(3, seed=2)
+    rescorer = ChangeDetectionRescorer(engine, score=lambda rows: np.full((len(rows), len(engine['diseases'])), 1 / 3))
+    scores, _ = rescorer.update(fields, inputs)
+    assert scores[0, 0] == 1 / 3  # Fresh scores are returned at full precision
+
+    missing = inputs.copy()
+    missing[0, 2] = np.nan
+    _, report = rescorer.update(fields, missing)
+    assert report['rescored'] == 1
+    _, report = rescorer.update(fields, missing)
+    assert report['rescored'] == 0
+    _, report = rescorer.update(fields, inputs)
+    assert report['rescored'] == 1
@@ -0,0 +1,72 @@
+"""
+Tests for the SQLite-backed persistent result cache.
+"""
+
+import numpy as np
+
+from knowledge.fuzzy_system import (
+    create_control_systems, create_fuzzy_rules, create_input_variables, create_output_variables, explain_diagnosis,
+)
+from knowledge.batch_inference import diagnose_batch
+from knowledge.result_cache import PersistentResultCache, diagnose_batch_cached, diagnose_explained_cached
+
+
+def sample_inputs(engine, n, seed=0):
+    rng = np.random.default_rng(seed)
+    low = engine['input_bounds'][:, 0]
+    high = engine['input_bounds'][:, 1]
+    return np.round(rng.uniform(low, high, size=(n, len(low))), 1)
+
+
+def test_cached_scores_match_and_survive_reopen(tmp_path, engine):
+    path = str(tmp_path / 'cache.db')
+    inputs = sample_inputs(engine, 50)
+
+    cache = PersistentResultCache(path, engine['version'])
+    first = diagnose_batch_cached(inputs, engine, cache)
+    np.testing.assert_allclose(first, diagnose_batch(inputs, engine), atol=1e-12)
+    assert cache.misses == 50 and cache.hits == 0
+    cache.close()
+
+    # A second process (connection) sees the stored results
+    reopened = PersistentResultCache(path, engine['version'])
+    second = diagnose_batch_cached(inputs, engine, reopened)
+    np.testing.assert_array_equal(first, second)
+    assert reopened.hits == 50 and reopened.misses == 0
+
+
+def test_other_versions_are_isolated(tmp_path, engine):
+    path = str(tmp_path / 'cache.db')
+    inputs = sample_inputs(engine, 5)
+    PersistentResultCache(path, 'old-version').put_many(inputs, np.ones((5, 10)))
+
+    cache = PersistentResultCache(path, engine['version'])
+    scores, hit = cache.get_many(inputs)
+    assert scores is None and not hit.any()
+
+
+def test_eviction_keeps_most_recent(tmp_path, engine):
+    cache = PersistentResultCache(str(tmp_path / 'cache.db'), engine['version'], max_entries=10)
+    inputs = sample_inputs(engine, 25)
+    for start in range(0, 25, 5):
+        cache.put_many(inputs[start:start + 5], np.zeros((5, 10)))
+    assert len(cache) == 10
+    _, hit = cache.get_many(inputs)
+    assert hit[-5:].all()
+
+
+def test_explanations_are_rebuilt_from_cached_strengths(tmp_path, engine):
+    input_vars, output_vars = create_input_variables(), create_output_variables()
+    system = create_control_systems(input_vars, output_vars, create_fuzzy_rules(input_vars, output_vars))
+    values = dict(zip(engine['input_names'], sample_inputs(engine, 1, seed=3)[0].tolist()))
+    cache = PersistentResultCache(str(tmp_path / 'cache.db'), engine['version'])
+
+    results, fired = diagnose_explained_cached(values, system, cache, engine)
+    expected = explain_diagnosis(values, system)
+    assert fired.keys() == expected.keys()
+    for disease, rules in expected.items():
+        assert [r['rule_id'] for r in fired[disease]] == [r['rule_id'] for r in rules]
+
+    # A hit returns the same pair without touching the simulation
+    assert diagnose_explained_cached(values, None, cache, engine) == (results, fired)
+    assert cache.hits == 1
@@ -0,0 +1,40 @@
+"""
+Tests for compact array-backed diagnosis results.
+"""
+
+import pickle
+
+import numpy as np
+
+from knowledge.batch_inference import diagnose_batch, explain_from_strengths, scores_to_dicts
+from knowledge.results import diagnose_compact, result_from_dicts
+
+
+def test_lazy_views_rebuild_dict_shapes(engine, random_inputs):
+    inputs = random_inputs(50)
+    batch = diagnose_compact(inputs, engine)
+    scores, strengths = diagnose_batch(inputs, engine, return_strengths=True)
+
+    assert len(batch) == 50 and batch.nbytes == 50 * 4 * (len(engine['diseases']) + len(engine['rule_ids']))
+    for result, expected, row in zip(batch, scores_to_dicts(scores, engine), strengths):
+        assert not hasattr(result, '__dict__')
+        assert result.keys() == expected.keys()
+        np.testing.assert_allclose(list(result.values()), list(expected.values()), rtol=1e-6)
+        assert result.fired_rules() == explain_from_strengths(row.astype(np.float32), engine)
+    assert np.shares_memory(batch[0].scores, batch.scores)
+    np.testing.assert_array_equal(batch.to_records()['strengths'], batch.strengths)
+
+
+def test_result_from_dicts_round_trip(engine, random_inputs):
+    scores, strengths = diagnose_batch(random_inputs(1, seed=3), engine, return_strengths=True)
+    fired = explain_from_strengths(strengths[0], engine)
+    result = result_from_dicts(scores_to_dicts(scores, engine)[0], engine, fired)
+
+    payload = pickle.dumps(result)
+    restored = pickle.loads(payload)
+    assert len(payload) < 1024 and restored.table is result.table
+    assert restored.to_dict() == result.to_dict()
+    assert [rule['rule_id'] for rules in restored.fired_rules().values() for rule in rules] == \
+        [rule['rule_id'] for rules in fired.values() for rule in rules]
+    rule_id = next(iter(fired.values()))[0]['rule_id']
+    assert abs(result.strength(rule_id) - next(iter(fired.values()))[0]['strength']) < 1e-6
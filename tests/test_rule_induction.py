@@ -0,0 +1,44 @@
+"""
+Tests for Wang-Mendel rule induction from labeled records.
+"""
+
+import numpy as np
+
+from knowledge.fuzzy_system import INPUT_MF_PARAMS, create_output_variables
+from knowledge.batch_inference import compile_rule_base, diagnose_batch, interpret_risk_batch
+from knowledge.rule_induction import induce_rules, learn_rule_base, merge_rule_bases, simplify_cells
+
+OUTPUT_VARS = create_output_variables()
+
+
+def labeled_records(engine, n, seed=0):
+    low, high = engine['input_bounds'].T
+    inputs = np.random.default_rng(seed).uniform(low, high, size=(n, len(low)))
+    return inputs, interpret_risk_batch(diagnose_batch(inputs, engine))
+
+
+def test_induced_rules_compile_and_recover_expert_labels(engine):
+    inputs, labels = labeled_records(engine, 20000)
+    rules = induce_rules(inputs, labels, engine, chunk_size=4096)
+
+    assert rules and all(set(rule) == {'id', 'disease', 'conditions', 'risk', 'description'} for rule in rules)
+    assert [rule['id'] for rule in rules] == list(range(31, 31 + len(rules)))
+    compile_rule_base(INPUT_MF_PARAMS, OUTPUT_VARS, rules)
+
+    result = learn_rule_base(inputs, labels, INPUT_MF_PARAMS, OUTPUT_VARS, expert_rules=[])
+    assert result['accuracy']['overall'] > 0.85
+    assert result['expert_accuracy'] is None
+
+
+def test_simplify_and_merge():
+    # Three rules covering every term of variable 1 with the same risk collapse into one
+    cell_terms = np.array([[0, 0], [0, 1], [0, 2], [1, 0]])
+    terms, risk, support, confidence = simplify_cells(
+        cell_terms, np.array([2, 2, 2, 1]), np.ones(4), np.array([1.0, 0.8, 0.9, 1.0]), (3, 3))
+    merged = {tuple(row): (r, s, c) for row, r, s, c in zip(terms.tolist(), risk, support, confidence)}
+    assert merged == {(1, 0): (1, 1.0, 1.0), (0, -1): (2, 3.0, 0.8)}
+
+    expert = [{'id': 1, 'disease': 'A', 'conditions': {'Temp': 'High'}, 'risk': 'High', 'description': ''}]
+    induced = [dict(expert[0], id=40, risk='Low'),
+               {'id': 41, 'disease': 'A', 'conditions': {'Temp': 'Low'}, 'risk': 'Low', 'description': ''}]
+    assert [(rule['id'], rule['risk']) for rule in merge_rule_bases(expert, induced)] == [(1, 'High'), (2, 'Low')]
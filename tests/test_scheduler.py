@@ -0,0 +1,65 @@
+"""
+Tests for the priority-aware inference scheduler.
+"""
+
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+from knowledge.batch_inference import diagnose_batch
+from knowledge.scheduler import InferenceScheduler, _BulkJob
+
+
+def test_bulk_chunks_reassemble_to_batch_scores(engine, random_inputs):
+    inputs = random_inputs(1000)
+    with InferenceScheduler(engine, workers=2, bulk_chunk_size=128, bulk_max_workers=2) as scheduler:
+        scores = scheduler.submit(inputs, priority='bulk').result(timeout=60)
+        metrics = scheduler.metrics()
+    np.testing.assert_allclose(scores, diagnose_batch(inputs, engine))
+    assert metrics['bulk']['submitted'] == 1 and metrics['bulk']['completed'] == 1
+    assert metrics['bulk']['queued'] == 0
+
+
+def test_interactive_requests_overtake_queued_bulk_work(engine, random_inputs):
+    with InferenceScheduler(engine, workers=1, bulk_chunk_size=64) as scheduler:
+        bulk = scheduler.submit(random_inputs(6400), priority='bulk')
+        interactive = [scheduler.submit(random_inputs(1, seed=i)) for i in range(5)]
+        for future in interactive:
+            future.result(timeout=60)
+        assert not bulk.done()
+        assert scheduler.metrics()['bulk']['queued'] > 0
+        bulk.result(timeout=120)
+        metrics = scheduler.metrics()
+
+    assert metrics['interactive']['completed'] == 5
+    assert metrics['interactive']['wait_ms']['max'] < metrics['bulk']['wait_ms']['max']
+
+
+def test_cancelled_bulk_job_and_failing_call(engine, random_inputs):
+    with InferenceScheduler(engine, workers=1, bulk_chunk_size=64) as scheduler:
+        blocker = scheduler.submit(random_inputs(6400), priority='bulk')
+        assert blocker.cancel()
+        failing = scheduler.submit_call('api', lambda: 1 / 0)
+        assert isinstance(failing.exception(timeout=60), ZeroDivisionError)
+        assert scheduler.submit_call('api', sum, [1, 2, 3]).result(timeout=60) == 6
+    metrics = scheduler.metrics()
+    assert metrics['bulk']['cancelled'] == 1
+    assert metrics['api']['failed'] == 1 and metrics['api']['completed'] == 1
+
+
+def test_cancelling_running_work_keeps_workers_alive(engine, random_inputs):
+    started, release = threading.Event(), threading.Event()
+    with InferenceScheduler(engine, workers=1) as scheduler:
+        running = scheduler.submit_call('api', lambda: started.set() or release.wait(60))
+        assert started.wait(60)
+        assert not running.cancel()
+        release.set()
+        assert running.result(timeout=60) is True
+        assert scheduler.submit(random_inputs(1)).result(timeout=60).shape == (1, len(engine['diseases']))
+
+    # The last chunk of a bulk job cancelled mid-run is counted, not raised
+    future = Future()
+    job = _BulkJob(future, 4, 1, 1)
+    assert future.cancel()
+    assert job.chunk_done(slice(0, 4), np.ones((4, 1))) == 'cancelled'
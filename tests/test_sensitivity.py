@@ -0,0 +1,42 @@
+"""
+Tests for Morris and Sobol sensitivity analysis over the fuzzy engine.
+"""
+
+import numpy as np
+
+from knowledge.disease_knowledge import get_rules_for_disease
+from knowledge.sensitivity import morris_trajectories, morris_analysis, sobol_analysis, clear_cache
+
+
+def unused_inputs(engine, disease):
+    """Inputs that appear in none of the disease's rules."""
+    used = {var for rule in get_rules_for_disease(disease) for var in rule['conditions']}
+    return [i for i, name in enumerate(engine['input_names']) if name not in used]
+
+
+def test_morris_trajectories_move_one_input_per_step():
+    unit = morris_trajectories(9, 20, levels=4, seed=3)
+    assert unit.shape == (20, 10, 9)
+    assert unit.min() >= 0 and unit.max() <= 1
+    changed = np.abs(np.diff(unit, axis=1)) > 1e-12
+    assert np.all(changed.sum(axis=2) == 1)
+    # Every input moves exactly once per trajectory
+    assert np.all(changed.sum(axis=1) == 1)
+
+
+def test_morris_unused_inputs_have_no_effect(engine):
+    result = morris_analysis(engine, n_trajectories=50, seed=1)
+    assert result['mu_star'].shape == (len(engine['diseases']), len(engine['input_names']))
+    for d, disease in enumerate(engine['diseases']):
+        assert np.all(result['mu_star'][d, unused_inputs(engine, disease)] == 0)
+
+
+def test_sobol_indices_and_cache(engine):
+    clear_cache()
+    result = sobol_analysis(engine, n_samples=2000, seed=2)
+    assert result['S1'].shape == result['ST'].shape == (len(engine['diseases']), len(engine['input_names']))
+    for d, disease in enumerate(engine['diseases']):
+        assert np.all(result['ST'][d, unused_inputs(engine, disease)] == 0)
+    assert np.all(result['ST'] >= 0)
+    assert result['version'] == engine['version']
+    assert sobol_analysis(engine, n_samples=2000, seed=2) is result
@@ -0,0 +1,48 @@
+"""
+Tests for bounded skfuzzy simulation state and the memory soak harness.
+"""
+
+from knowledge.fuzzy_system import diagnose_diseases
+from knowledge.simulation_manager import ManagedSimulation, managed_simulation_from_env, simulation_state_size
+from ui.soak_test import build_simulation, run_soak, summarize_soak
+
+INPUTS = {'Temp': 26, 'RH': 88, 'Rain': 60, 'LeafWet': 14, 'SoilM': 70,
+          'Drain': 2, 'SeedHealth': 5, 'Vector': 3, 'Stage': 2}
+
+
+def test_state_stays_bounded_over_distinct_inputs():
+    manager = ManagedSimulation(build_simulation, flush_after_run=20)
+    samples = run_soak(manager, 200, sample_every=10)
+    sizes = [s['state_entries'] for s in samples]
+    assert max(sizes) < 1.1 * max(sizes[:3])
+    assert summarize_soak(samples)['max_state_entries'] == max(sizes)
+
+    # Without skfuzzy's run-count flush, the time-based flush bounds the state
+    manager = ManagedSimulation(build_simulation, flush_after_run=10 ** 9, flush_interval=0.0)
+    run_soak(manager, 30, sample_every=10)
+    assert manager.flushes >= 30
+    with manager.acquire() as simulation:
+        assert simulation_state_size(simulation) < 1000
+
+
+def test_rss_watchdog_recycles_and_results_are_unchanged():
+    with ManagedSimulation(build_simulation).acquire() as simulation:
+        expected = diagnose_diseases(INPUTS, simulation)
+
+    manager = ManagedSimulation(build_simulation, rss_budget_mb=1, rss_check_every=2)
+    first = manager.simulation
+    for _ in range(8):
+        with manager.acquire() as simulation:
+            assert diagnose_diseases(INPUTS, simulation) == expected
+    assert manager.simulation is not first
+
+    # A 1 MB budget cannot be met, so recycles back off: at uses 2 and 6, skipped at 4 and 8
+    assert manager.recycles == 2 and manager.skipped_recycles == 2
+
+
+def test_configuration_from_environment():
+    manager = managed_simulation_from_env(build_simulation, {
+        'DIAGNOSIS_SIM_CACHE': '0', 'DIAGNOSIS_SIM_FLUSH_AFTER_RUN': '50',
+        'DIAGNOSIS_SIM_FLUSH_SECONDS': '30', 'DIAGNOSIS_RSS_BUDGET_MB': '512'})
+    assert manager.simulation.cache is False and manager.simulation._flush_after_run == 50
+    assert manager.flush_interval == 30.0 and manager.rss_budget == 512 * 1024 * 1024
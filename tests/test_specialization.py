@@ -0,0 +1,64 @@
+"""
+Tests for partial evaluation of the rule base for fixed per-field inputs.
+"""
+
+import numpy as np
+
+from knowledge.batch_inference import diagnose_batch, specialize
+from knowledge.specialization import SpecializedEngineCache
+
+STATIC = {'Drain': 3.0, 'SeedHealth': 6.2, 'Stage': 1.3}
+
+
+def full_inputs(engine, dynamic, names, fixed):
+    """Expand dynamic-input rows into full input rows with the fixed values filled in."""
+    rows = np.empty((len(dynamic), len(engine['input_names'])))
+    for name, value in fixed.items():
+        rows[:, engine['input_names'].index(name)] = value
+    for col, name in enumerate(names):
+        rows[:, engine['input_names'].index(name)] = dynamic[:, col]
+    return rows
+
+
+def random_dynamic(engine, names, n, seed=0):
+    bounds = engine['input_bounds'][[engine['input_names'].index(name) for name in names]]
+    return np.random.default_rng(seed).uniform(bounds[:, 0], bounds[:, 1], size=(n, len(names)))
+
+
+def test_specialized_engine_matches_full_engine(engine):
+    specialized = specialize(engine, STATIC)
+    assert specialized['input_names'] == ['Temp', 'RH', 'Rain', 'LeafWet', 'SoilM', 'Vector']
+    assert len(specialized['rules']) < len(engine['rules'])
+
+    dynamic = random_dynamic(engine, specialized['input_names'], 500)
+    expected = diagnose_batch(full_inputs(engine, dynamic, specialized['input_names'], STATIC), engine)
+    np.testing.assert_allclose(diagnose_batch(dynamic, specialized), expected, atol=1e-12)
+
+    # Specializing in two steps gives the same engine version and scores
+    stepwise = specialize(specialize(engine, {'Drain': 3.0}), {'SeedHealth': 6.2, 'Stage': 1.3})
+    assert stepwise['version'] == specialized['version']
+    np.testing.assert_allclose(diagnose_batch(dynamic, stepwise), expected, atol=1e-12)
+
+
+def test_cache_shares_engines_and_invalidates_on_attribute_change(engine):
+    cache = SpecializedEngineCache(engine)
+    cache.set_field_attributes('north', STATIC)
+    cache.set_field_attributes('south', STATIC)
+    cache.set_field_attributes('east', dict(STATIC, Stage=2.5))
+
+    dynamic = random_dynamic(engine, cache.dynamic_inputs, 6, seed=1)
+    fields = ['north', 'south', 'east', 'north', 'east', 'south']
+    scores = cache.diagnose(fields, dynamic)
+    assert cache.builds == 2 and len(cache) == 2
+
+    for row, field in enumerate(fields):
+        expected = diagnose_batch(full_inputs(engine, dynamic[row:row + 1], cache.dynamic_inputs,
+                                              cache.field_attributes(field)), engine)
+        np.testing.assert_allclose(scores[row:row + 1], expected, atol=1e-12)
+
+    # East moves to the next stage: its old group engine is dropped and rebuilt on demand
+    assert cache.set_field_attributes('east', dict(STATIC, Stage=3.0))
+    assert not cache.set_field_attributes('north', STATIC)
+    assert len(cache) == 1
+    cache.diagnose(['east'], dynamic[:1])
+    assert cache.builds == 3
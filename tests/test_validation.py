@@ -0,0 +1,59 @@
+"""
+Tests for vectorized input validation in front of batch inference.
+"""
+
+import numpy as np
+import pytest
+
+from knowledge.batch_inference import diagnose_batch
+from knowledge.validation import (
+    STATUS_CLIPPED, STATUS_IMPUTED, STATUS_MISSING, STATUS_NON_FINITE, STATUS_NON_NUMERIC,
+    STATUS_OUT_OF_RANGE, STATUS_REJECTED, describe_status, diagnose_batch_validated, validate_inputs,
+)
+
+
+def test_bad_rows_are_flagged_without_affecting_the_rest(engine, random_inputs):
+    inputs = random_inputs(6)
+    inputs[1, 0] = np.nan
+    inputs[2, 1] = engine['input_bounds'][1, 1] + 5.0
+    inputs[3, 2] = -np.inf
+
+    scores, status = diagnose_batch_validated(inputs, engine, policy='reject')
+    assert list(status & STATUS_REJECTED > 0) == [False, True, True, True, False, False]
+    assert status[1] & STATUS_NON_FINITE and status[2] & STATUS_OUT_OF_RANGE
+    assert np.isnan(scores[1:4]).all()
+    good = [0, 4, 5]
+    np.testing.assert_allclose(scores[good], diagnose_batch(inputs[good], engine))
+
+    # Clipping keeps the out-of-range and infinite rows, NaN is still rejected
+    cleaned, status = validate_inputs(inputs, engine, policy='clip')
+    assert status[1] & STATUS_REJECTED
+    assert status[2] == STATUS_OUT_OF_RANGE | STATUS_CLIPPED
+    assert cleaned[2, 1] == engine['input_bounds'][1, 1]
+    assert cleaned[3, 2] == engine['input_bounds'][2, 0]
+
+    # Imputation fills the NaN with the given value, or the universe midpoint by default
+    cleaned, status = validate_inputs(inputs, engine, policy='impute', impute_values={'Temp': 21.0})
+    assert not (status & STATUS_REJECTED).any()
+    assert status[1] == STATUS_NON_FINITE | STATUS_IMPUTED and cleaned[1, 0] == 21.0
+
+
+def test_record_schema_checks(engine, random_inputs):
+    names = engine['input_names']
+    good = dict(zip(names, random_inputs(1)[0]))
+    records = [good, {k: v for k, v in good.items() if k != 'RH'}, dict(good, Rain='heavy')]
+
+    cleaned, status, flags = validate_inputs(records, engine, return_details=True)
+    assert status[0] == 0
+    assert flags[1, names.index('RH')] & STATUS_MISSING and status[1] & STATUS_REJECTED
+    assert flags[2, names.index('Rain')] & STATUS_NON_NUMERIC and status[2] & STATUS_REJECTED
+    assert describe_status(status[1]) == ['missing', 'rejected']
+
+    cleaned, status = validate_inputs(records, engine, policy='impute')
+    assert not (status & STATUS_REJECTED).any()
+    assert cleaned[1, names.index('RH')] == engine['input_bounds'][names.index('RH')].mean()
+
+    with pytest.raises(ValueError):
+        validate_inputs(np.zeros((3, 4)), engine)
+    with pytest.raises(ValueError):
+        validate_inputs(random_inputs(2), engine, policy='ignore')
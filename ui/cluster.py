@@ -0,0 +1,258 @@
+"""
+Sharded Scoring Cluster
+Command line for the TCP worker / coordinator mode of batch scoring, with a throughput
+dashboard served by the coordinator (an auto-refreshing page and a JSON status endpoint).
+
+Usage:
+    python -m ui.cluster worker --port 7700
+    python -m ui.cluster coordinator inputs.npy --workers host1:7700,host2:7700 --output-dir scores/
+    python -m ui.cluster local inputs.npy --local-workers 4 --dashboard-port 8050
+
+Workers listen on localhost by default. To serve remote coordinators, set the same
+DIAGNOSIS_CLUSTER_SECRET on the workers and the coordinator and pass --host 0.0.0.0.
+"""
+
+import argparse
+import html
+import json
+import multiprocessing
+import os
+import secrets
+import signal
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from knowledge.fuzzy_system import INPUT_MF_PARAMS, create_output_variables
+from knowledge.batch_inference import compile_rule_base
+from knowledge.distributed import DEFAULT_SHARD_SIZE, ShardCoordinator, ShardWorker
+from knowledge.fleet_stats import FleetRecorder, fleet_recorder_from_env
+
+
+# Seconds between progress lines and dashboard refreshes
+REFRESH_SECONDS = 1.0
+
+
+def render_dashboard(status):
+    """HTML page of a coordinator status dict."""
+    def rate(value):
+        return "–" if value is None else f"{value:,.0f}"
+
+    rows = "".join(
+        f"<tr><td>{html.escape(key)}</td><td>{html.escape(str(worker['name'] or ''))}</td>"
+        f"<td>{worker['state']}</td><td>{worker['shards']:,}</td><td>{worker['rows']:,}</td>"
+        f"<td>{rate(worker['rows_per_s'])}</td><td>{worker['failures']}</td>"
+        f"<td>{html.escape(str(worker['last_error'] or ''))}</td></tr>"
+        for key, worker in status['workers'].items())
+    done = status['rows_done'] / status['rows'] if status['rows'] else 0.0
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><meta http-equiv="refresh" content="{REFRESH_SECONDS:.0f}">
+<title>Scoring Cluster</title>
+<style>body {{ font-family: Arial, sans-serif; background: #000000; color: #eeeeee; }}
+th {{ color: #573d1c; text-align: left; }} td, th {{ padding: 4px 12px; }}</style></head>
+<body><h2>🌿 Sharded Scoring</h2>
+<p>{status['rows_done']:,} / {status['rows']:,} rows ({done:.1%}) &middot;
+   {status['committed']} / {status['shards']} shards committed &middot; {status['inflight']} in flight &middot;
+   {status['pending']} pending &middot; {status['failed']} failed &middot; {status['retries']} retries</p>
+<p>Throughput: {rate(status['recent_rows_per_s'])} rows/s (last 10 s), {rate(status['rows_per_s'])} rows/s overall,
+   {status['elapsed_s']:.0f} s elapsed</p>
+<table><tr><th>Worker</th><th>Process</th><th>State</th><th>Shards</th><th>Rows</th><th>Rows/s</th>
+<th>Failures</th><th>Last error</th></tr>{rows}</table></body></html>"""
+
+
+def serve_dashboard(coordinator, host='127.0.0.1', port=8050):
+    """
+    Serve the dashboard of a coordinator in a daemon thread.
+
+    Args:
+        coordinator: ShardCoordinator
+        host: Interface to listen on
+        port: Port ('/' is the page, '/status.json' the raw status)
+
+    Returns:
+        ThreadingHTTPServer: Call shutdown() to stop it
+    """
+    class DashboardHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status = coordinator.status()
+            if self.path.startswith('/status.json'):
+                body, content_type = json.dumps(status).encode(), 'application/json'
+            else:
+                body, content_type = render_dashboard(status).encode(), 'text/html; charset=utf-8'
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), DashboardHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def build_engine():
+    """The batch engine of the shipped rule base (coordinator and workers must agree on its version)."""
+    return compile_rule_base(INPUT_MF_PARAMS, create_output_variables())
+
+
+def cluster_secret():
+    """Shared secret of the cluster from DIAGNOSIS_CLUSTER_SECRET, or None."""
+    return os.environ.get('DIAGNOSIS_CLUSTER_SECRET') or None
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def run_worker(host, port, ready=None, stats_dir=None, secret=None):
+    """
+    Run a worker server until interrupted; puts the bound port on the ready queue if given.
+
+    Fleet statistics of the scored rows are written to stats_dir, or to
+    DIAGNOSIS_STATS_DIR when stats_dir is not given (see knowledge.fleet_stats).
+    Coordinators must prove secret (default: DIAGNOSIS_CLUSTER_SECRET) when one is set.
+    """
+    engine = build_engine()
+    statistics = FleetRecorder(engine, stats_dir) if stats_dir else fleet_recorder_from_env(engine)
+    secret = secret or cluster_secret()
+    if secret is None and host not in ('127.0.0.1', 'localhost', '::1'):
+        print(f"⚠️  Worker on {host} accepts shards from anyone who can connect; "
+              f"set DIAGNOSIS_CLUSTER_SECRET to require a shared secret", flush=True)
+    worker = ShardWorker((host, port), engine, statistics=statistics, secret=secret)
+    # Terminated local workers still write their final statistics snapshot
+    signal.signal(signal.SIGTERM, _interrupt)
+    if ready is not None:
+        ready.put(worker.server_address[1])
+    print(f"Worker {worker.name} listening on {host}:{worker.server_address[1]}", flush=True)
+    try:
+        worker.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.server_close()
+        if statistics is not None:
+            statistics.save()
+
+
+def start_local_workers(n_workers, stats_dir=None, secret=None):
+    """
+    Start worker processes on free localhost ports.
+
+    Args:
+        n_workers: Number of worker processes
+        stats_dir: Optional fleet statistics snapshot directory passed to run_worker
+        secret: Optional shared secret the workers require
+
+    Returns:
+        tuple: (list of processes, list of (host, port) addresses)
+    """
+    context = multiprocessing.get_context('spawn')
+    ready = context.Queue()
+    processes = [context.Process(target=run_worker, args=('127.0.0.1', 0, ready, stats_dir, secret), daemon=True)
+                 for _ in range(n_workers)]
+    for process in processes:
+        process.start()
+    return processes, [('127.0.0.1', ready.get(timeout=120)) for _ in processes]
+
+
+def run_coordinator(source, addresses, args, secret=None):
+    """Score a source across workers, printing progress; returns the process exit code."""
+    coordinator = ShardCoordinator(addresses, build_engine(), shard_size=args.shard_size,
+                                   max_attempts=args.max_attempts, shard_timeout=args.shard_timeout,
+                                   secret=secret or cluster_secret())
+    dashboard = serve_dashboard(coordinator, args.dashboard_host, args.dashboard_port) if args.dashboard_port else None
+    if dashboard is not None:
+        print(f"Dashboard on http://{args.dashboard_host}:{dashboard.server_address[1]}/", flush=True)
+
+    result = {}
+
+    def run():
+        try:
+            result['store'] = coordinator.run(source, args.output_dir)
+        except Exception as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    while thread.is_alive():
+        thread.join(REFRESH_SECONDS)
+        if coordinator.store is not None:
+            status = coordinator.status()
+            print(f"\r  {status['rows_done']:>12,} / {status['rows']:,} rows  "
+                  f"{status['recent_rows_per_s']:>10,.0f} rows/s  retries {status['retries']}", end='', flush=True)
+    print()
+
+    if dashboard is not None:
+        dashboard.shutdown()
+    if 'error' in result:
+        print(f"Failed: {result['error']}")
+        return 1
+    if args.output:
+        np.save(args.output, result['store'].scores())
+    print(json.dumps({key: value for key, value in coordinator.status().items() if key != 'workers'}, indent=2))
+    return 0
+
+
+def parse_addresses(spec):
+    """'host:port,host:port' -> list of (host, port)."""
+    addresses = []
+    for item in spec.split(','):
+        host, port = item.rsplit(':', 1)
+        addresses.append((host, int(port)))
+    return addresses
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sharded batch scoring over TCP")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    worker = commands.add_parser('worker', help="Run a scoring worker")
+    worker.add_argument('--host', default='127.0.0.1',
+                        help="Interface to listen on (set DIAGNOSIS_CLUSTER_SECRET before exposing it)")
+    worker.add_argument('--port', type=int, default=7700)
+    worker.add_argument('--stats-dir', help="Write fleet statistics snapshots here (default: DIAGNOSIS_STATS_DIR)")
+
+    for name in ('coordinator', 'local'):
+        command = commands.add_parser(name, help="Score a .npy or .parquet file"
+                                      + (" on workers started on this host" if name == 'local' else ""))
+        command.add_argument('source', help="Input .npy (N x 9, engine input order) or .parquet file")
+        if name == 'coordinator':
+            command.add_argument('--workers', required=True, help="Comma-separated host:port list")
+        else:
+            command.add_argument('--local-workers', type=int, default=2)
+            command.add_argument('--stats-dir', help="Workers write fleet statistics snapshots here")
+        command.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE)
+        command.add_argument('--max-attempts', type=int, default=3)
+        command.add_argument('--shard-timeout', type=float, default=300.0)
+        command.add_argument('--output-dir', help="Commit shards here (re-running resumes the job)")
+        command.add_argument('--output', help="Write all scores to this .npy file")
+        command.add_argument('--dashboard-host', default='127.0.0.1')
+        command.add_argument('--dashboard-port', type=int, default=8050, help="0 disables the dashboard")
+    args = parser.parse_args(argv)
+
+    if args.command == 'worker':
+        run_worker(args.host, args.port, stats_dir=args.stats_dir)
+        return 0
+    if args.command == 'coordinator':
+        return run_coordinator(args.source, parse_addresses(args.workers), args)
+
+    # Local workers get a one-off secret unless the cluster has one
+    secret = cluster_secret() or secrets.token_hex(16)
+    processes, addresses = start_local_workers(args.local_workers, args.stats_dir, secret)
+    try:
+        return run_coordinator(args.source, addresses, args, secret)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+
+
+if __name__ == '__main__':
+    started = time.perf_counter()
+    code = main()
+    print(f"Finished in {time.perf_counter() - started:.1f} s")
+    raise SystemExit(code)
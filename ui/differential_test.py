@@ -0,0 +1,437 @@
+"""
+Differential Testing Between Inference Engines
+Scores generated inputs (random draws, trimf breakpoint values and the test_scenarios.py
+cases) through a reference engine and alternative engines in parallel batches, checks the
+per-disease tolerances and risk-level agreement, and shrinks failing inputs to minimal
+reproducers.
+
+The skfuzzy simulation scores about 40 rows per second, so it is the reference for a
+sample of the inputs (tier 1); the batch engine, checked against it there, is the
+reference for the full input set (tier 2).
+
+Usage:
+    python -m ui.differential_test --rows 1000000 --reference-rows 2000 --output diff.json
+"""
+
+import argparse
+import ast
+import contextlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from knowledge.fuzzy_system import (
+    INPUT_MF_PARAMS, create_input_variables, create_output_variables, create_fuzzy_rules,
+    create_control_systems, diagnose_diseases,
+)
+from knowledge.batch_inference import compile_rule_base, diagnose_batch, interpret_risk_batch
+from knowledge.codegen import get_evaluator
+
+
+# Default absolute score tolerance per disease
+DEFAULT_TOLERANCE = 1e-6
+
+# Score thresholds of interpret_risk (a level change within tolerance of one is not a failure)
+RISK_THRESHOLDS = np.array([0.4, 0.6])
+
+# Rows per task sent to a worker process
+DEFAULT_CHUNK_SIZE = 20000
+
+# Failing rows recorded per candidate and task
+MAX_FAILURES_PER_CHUNK = 20
+
+# Scenario cases of the test_scenarios.py script (read without running it)
+SCENARIO_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'tests', 'test_scenarios.py')
+
+# Input sources, as recorded per generated row
+SOURCES = ('scenario', 'random', 'boundary')
+
+
+def skfuzzy_scorer(engine):
+    """Reference scorer: one skfuzzy simulation run per row, without result caching."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        input_vars, output_vars = create_input_variables(), create_output_variables()
+        simulation = create_control_systems(input_vars, output_vars, create_fuzzy_rules(input_vars, output_vars),
+                                            cache=False)
+
+    def score(inputs):
+        rows = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for row in np.asarray(inputs, dtype=np.float64).tolist():
+                results = diagnose_diseases(dict(zip(engine['input_names'], row)), simulation)
+                rows.append([results[disease] for disease in engine['diseases']])
+        return np.array(rows, dtype=np.float64).reshape(-1, len(engine['diseases']))
+    return score
+
+
+def batch_scorer(engine):
+    """Vectorized engine (diagnose_batch)."""
+    return lambda inputs: diagnose_batch(inputs, engine)
+
+
+def codegen_scorer(engine):
+    """Generated straight-line evaluator, one call per row."""
+    evaluator = get_evaluator(engine)
+    return lambda inputs: np.array([evaluator.diagnose(*row) for row in np.asarray(inputs).tolist()],
+                                   dtype=np.float64).reshape(-1, len(engine['diseases']))
+
+
+# Engine name -> function building a scorer (inputs array -> scores array) from the engine
+SCORERS = {
+    'skfuzzy': skfuzzy_scorer,
+    'batch': batch_scorer,
+    'codegen': codegen_scorer,
+}
+
+
+def load_scenarios(path=SCENARIO_FILE):
+    """
+    Input dicts assigned to scenarioN variables in the scenario script.
+
+    The script runs the skfuzzy system on import, so it is parsed instead.
+
+    Args:
+        path: Path of test_scenarios.py
+
+    Returns:
+        list: Input dicts (empty if the file does not exist)
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    scenarios = []
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Assign) and isinstance(node.value, ast.Dict)
+                and any(isinstance(target, ast.Name) and target.id.startswith('scenario') for target in node.targets)):
+            scenarios.append(ast.literal_eval(node.value))
+    return scenarios
+
+
+def breakpoints(engine):
+    """Sorted trimf corners and universe bounds of every input, as a list of arrays."""
+    points = []
+    for var_idx, (low, high) in enumerate(engine['input_bounds']):
+        corners = engine['term_params'][engine['term_owner'] == var_idx].ravel()
+        points.append(np.unique(np.concatenate([corners, [low, high]])))
+    return points
+
+
+def generate_inputs(engine, n_rows, seed=0, boundary_share=0.5, scenarios=None):
+    """
+    Test inputs: the scenario cases, then random and boundary rows.
+
+    Boundary rows snap each input, with probability one half, to a trimf
+    breakpoint, optionally nudged by a tiny offset to either side.
+
+    Args:
+        engine: Compiled engine from compile_rule_base
+        n_rows: Total number of rows
+        seed: Random seed
+        boundary_share: Share of the generated (non-scenario) rows that are boundary rows
+        scenarios: Input dicts to include first (defaults to load_scenarios())
+
+    Returns:
+        tuple: (inputs of shape (n_rows, n_inputs), source code per row indexing SOURCES)
+    """
+    if scenarios is None:
+        scenarios = load_scenarios()
+    scenario_rows = np.array([[s[name] for name in engine['input_names']] for s in scenarios],
+                             dtype=np.float64).reshape(-1, len(engine['input_names']))[:n_rows]
+    rng = np.random.default_rng(seed)
+    low, high = engine['input_bounds'].T
+    n_generated = n_rows - len(scenario_rows)
+    generated = rng.uniform(low, high, size=(n_generated, len(low)))
+    boundary = rng.random(n_generated) < boundary_share
+
+    offsets = np.array([0.0, 0.0, -1e-9, 1e-9, -1e-6, 1e-6])
+    for var_idx, points in enumerate(breakpoints(engine)):
+        snap = boundary & (rng.random(n_generated) < 0.5)
+        values = rng.choice(points, size=snap.sum()) + rng.choice(offsets, size=snap.sum())
+        generated[snap, var_idx] = np.clip(values, low[var_idx], high[var_idx])
+
+    sources = np.concatenate([np.zeros(len(scenario_rows), np.int8), np.where(boundary, 2, 1).astype(np.int8)])
+    return np.concatenate([scenario_rows, generated]), sources
+
+
+def tolerance_vector(tolerance, engine):
+    """Per-disease tolerances from a scalar or a dict of disease -> tolerance."""
+    if isinstance(tolerance, dict):
+        return np.array([tolerance.get(d, DEFAULT_TOLERANCE) for d in engine['diseases']], dtype=np.float64)
+    return np.full(len(engine['diseases']), float(tolerance))
+
+
+def compare_scores(reference, candidate, tolerance):
+    """
+    Element-wise comparison of two score matrices.
+
+    A level disagreement counts as unexplained when the reference score is
+    farther than the tolerance from both interpret_risk thresholds.
+
+    Returns:
+        tuple: (absolute differences, tolerance failures, level mismatches,
+                unexplained level mismatches), each of shape (N, n_diseases)
+    """
+    difference = np.abs(candidate - reference)
+    over = ~(difference <= tolerance)  # NaN counts as a failure
+    mismatch = interpret_risk_batch(candidate) != interpret_risk_batch(reference)
+    near_threshold = (np.abs(reference[..., None] - RISK_THRESHOLDS) <= tolerance[:, None]).any(axis=-1)
+    return difference, over, mismatch, mismatch & ~near_threshold
+
+
+# Scorers of a worker process, built once by _init_worker
+_WORKER_SCORERS = None
+
+
+def _init_worker(engine, names, scorers):
+    global _WORKER_SCORERS
+    _WORKER_SCORERS = {name: scorers[name](engine) for name in names}
+
+
+def _compare_chunk(task):
+    """Score one chunk with the reference and every candidate; returns per-candidate summaries."""
+    start, inputs, reference, candidates, tolerance = task
+    reference_scores = _WORKER_SCORERS[reference](inputs)
+    summaries = {}
+    for name in candidates:
+        difference, over, mismatch, unexplained = compare_scores(reference_scores, _WORKER_SCORERS[name](inputs),
+                                                                 tolerance)
+        failing = np.flatnonzero((over | unexplained).any(axis=1))
+        summaries[name] = {
+            'max_difference': np.nan_to_num(difference, nan=np.inf).max(axis=0, initial=0.0),
+            'tolerance_failures': over.sum(axis=0),
+            'level_mismatches': mismatch.sum(axis=0),
+            'unexplained_level_mismatches': unexplained.sum(axis=0),
+            'failing_rows': (start + failing[:MAX_FAILURES_PER_CHUNK]).tolist(),
+            'n_failing_rows': len(failing),
+        }
+    return len(inputs), summaries
+
+
+def run_differential(inputs, engine, reference='batch', candidates=('codegen',), tolerance=DEFAULT_TOLERANCE,
+                     workers=None, chunk_size=DEFAULT_CHUNK_SIZE, scorers=None, progress=None):
+    """
+    Score inputs through a reference and candidate engines and compare them.
+
+    Args:
+        inputs: Array of shape (N, n_inputs)
+        engine: Compiled engine from compile_rule_base
+        reference: Name of the reference scorer
+        candidates: Names of the scorers checked against it
+        tolerance: Absolute score tolerance (scalar or dict of disease -> tolerance)
+        workers: Worker processes (defaults to os.cpu_count(); 1 runs in-process)
+        chunk_size: Rows per task
+        scorers: Scorer builders by name (defaults to SCORERS; must be picklable for workers > 1)
+        progress: Optional callback(rows_done, n_rows)
+
+    Returns:
+        dict: rows, elapsed_s, rows_per_s, reference, passed and per-candidate results with
+              max_difference, tolerance_failures, level_mismatches and
+              unexplained_level_mismatches (dicts by disease), failing_rows (a sample of
+              row indices) and n_failing_rows
+    """
+    scorers = scorers or SCORERS
+    inputs = np.asarray(inputs, dtype=np.float64).reshape(-1, len(engine['input_names']))
+    tolerance = tolerance_vector(tolerance, engine)
+    names = [reference, *candidates]
+    tasks = [(start, inputs[start:start + chunk_size], reference, tuple(candidates), tolerance)
+             for start in range(0, len(inputs), chunk_size)]
+    workers = workers or os.cpu_count()
+
+    started = time.perf_counter()
+    totals = {name: {'max_difference': np.zeros(len(tolerance)), 'tolerance_failures': 0, 'level_mismatches': 0,
+                     'unexplained_level_mismatches': 0, 'failing_rows': [], 'n_failing_rows': 0}
+              for name in candidates}
+    rows_done = 0
+
+    def collect(result):
+        nonlocal rows_done
+        n, summaries = result
+        rows_done += n
+        for name, summary in summaries.items():
+            total = totals[name]
+            total['max_difference'] = np.maximum(total['max_difference'], summary['max_difference'])
+            for key in ('tolerance_failures', 'level_mismatches', 'unexplained_level_mismatches', 'n_failing_rows'):
+                total[key] = total[key] + summary[key]
+            total['failing_rows'].extend(summary['failing_rows'])
+        if progress is not None:
+            progress(rows_done, len(inputs))
+
+    if workers == 1 or len(tasks) <= 1:
+        _init_worker(engine, names, scorers)
+        for task in tasks:
+            collect(_compare_chunk(task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(engine, names, scorers)) as pool:
+            for result in pool.map(_compare_chunk, tasks):
+                collect(result)
+
+    elapsed = time.perf_counter() - started
+    results = {}
+    for name, total in totals.items():
+        results[name] = {key: (dict(zip(engine['diseases'], np.broadcast_to(value, len(tolerance)).tolist()))
+                               if key in ('max_difference', 'tolerance_failures', 'level_mismatches',
+                                          'unexplained_level_mismatches') else value)
+                         for key, value in total.items()}
+    return {
+        'rows': len(inputs),
+        'elapsed_s': elapsed,
+        'rows_per_s': len(inputs) / elapsed if elapsed > 0 else None,
+        'reference': reference,
+        'passed': all(result['n_failing_rows'] == 0 for result in results.values()),
+        'candidates': results,
+    }
+
+
+def shrink_failure(row, disease, reference, candidate, engine, tolerance=DEFAULT_TOLERANCE, max_passes=4):
+    """
+    Reduce a failing input to a minimal reproducer.
+
+    Each input is, in turn, moved to the rounded universe midpoint, else to a
+    trimf breakpoint (the one closest to the midpoint that still fails), else
+    rounded to as few decimals as still fail. Every step scores its candidate
+    rows in one batch; passes repeat until nothing changes.
+
+    Args:
+        row: Failing input vector of shape (n_inputs,)
+        disease: Index of the failing disease
+        reference: Reference scorer (inputs array -> scores array)
+        candidate: Candidate scorer
+        engine: Compiled engine from compile_rule_base
+        tolerance: Absolute score tolerance (scalar or dict)
+        max_passes: Maximum passes over the inputs
+
+    Returns:
+        dict: inputs (name -> value), original_inputs, disease, reference_score,
+              candidate_score, difference, still_fails and evaluations
+    """
+    tolerance = tolerance_vector(tolerance, engine)
+    evaluations = 0
+
+    def failing(candidates):
+        nonlocal evaluations
+        candidates = np.atleast_2d(candidates)
+        evaluations += len(candidates)
+        _, over, _, unexplained = compare_scores(reference(candidates), candidate(candidates), tolerance)
+        return over[:, disease] | unexplained[:, disease]
+
+    original = np.asarray(row, dtype=np.float64)
+    current = original.copy()
+    low, high = engine['input_bounds'].T
+    midpoints = np.round((low + high) / 2)
+    points = breakpoints(engine)
+    still_fails = bool(failing(current)[0])
+
+    for _ in range(max_passes if still_fails else 0):
+        changed = False
+        for var_idx in range(len(current)):
+            if current[var_idx] == midpoints[var_idx]:
+                continue
+            options = [np.array([midpoints[var_idx]]),
+                       points[var_idx][np.argsort(np.abs(points[var_idx] - midpoints[var_idx]), kind='stable')],
+                       np.unique([np.round(current[var_idx], decimals) for decimals in range(10)])]
+            for values in options:
+                values = values[values != current[var_idx]]
+                if not len(values):
+                    continue
+                candidates = np.repeat(current[None, :], len(values), axis=0)
+                candidates[:, var_idx] = values
+                fails = failing(candidates)
+                if fails.any():
+                    current = candidates[np.argmax(fails)]
+                    changed = True
+                    break
+        if not changed:
+            break
+
+    reference_score = float(reference(current[None, :])[0, disease])
+    candidate_score = float(candidate(current[None, :])[0, disease])
+    return {
+        'inputs': dict(zip(engine['input_names'], current.tolist())),
+        'original_inputs': dict(zip(engine['input_names'], original.tolist())),
+        'disease': engine['diseases'][disease],
+        'reference_score': reference_score,
+        'candidate_score': candidate_score,
+        'difference': abs(candidate_score - reference_score),
+        'still_fails': still_fails,
+        'evaluations': evaluations,
+    }
+
+
+def shrink_report(report, inputs, engine, tolerance=DEFAULT_TOLERANCE, max_reproducers=5, scorers=None):
+    """
+    Shrink the first failing rows of every candidate in a run_differential report.
+
+    Returns:
+        list: Reproducer dicts (see shrink_failure) with the candidate name added
+    """
+    scorers = scorers or SCORERS
+    reference = scorers[report['reference']](engine)
+    tolerance_values = tolerance_vector(tolerance, engine)
+    reproducers = []
+    for name, result in report['candidates'].items():
+        if not result['failing_rows']:
+            continue
+        candidate = scorers[name](engine)
+        for row_idx in result['failing_rows'][:max_reproducers]:
+            row = inputs[row_idx]
+            _, over, _, unexplained = compare_scores(reference(row[None, :]), candidate(row[None, :]), tolerance_values)
+            disease = int(np.argmax((over | unexplained)[0]))
+            reproducers.append(dict(shrink_failure(row, disease, reference, candidate, engine, tolerance),
+                                    candidate=name, row=int(row_idx)))
+    return reproducers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Differential testing between fuzzy inference engines")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Rows checked against the batch engine")
+    parser.add_argument('--reference-rows', type=int, default=2000, help="Rows checked against skfuzzy")
+    parser.add_argument('--candidates', default='batch,codegen', help="Comma-separated scorer names")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--max-reproducers', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the reports and reproducers to this JSON file")
+    args = parser.parse_args(argv)
+
+    engine = compile_rule_base(INPUT_MF_PARAMS, create_output_variables())
+    candidates = [name for name in args.candidates.split(',') if name]
+
+    def progress(done, total):
+        print(f"\r  {done:>10,} / {total:,} rows", end='', flush=True)
+
+    tiers = [('skfuzzy', candidates, args.reference_rows, args.chunk_size // 100 or 1),
+             ('batch', [name for name in candidates if name != 'batch'], args.rows, args.chunk_size)]
+    output = {'tiers': [], 'reproducers': []}
+    for reference, tier_candidates, n_rows, chunk_size in tiers:
+        if not tier_candidates or n_rows <= 0:
+            continue
+        print(f"{reference} reference vs {', '.join(tier_candidates)} on {n_rows:,} rows")
+        inputs, sources = generate_inputs(engine, n_rows, seed=args.seed)
+        report = run_differential(inputs, engine, reference, tier_candidates, args.tolerance,
+                                  args.workers, chunk_size, progress=progress)
+        print(f"\n  {report['rows_per_s']:,.0f} rows/s, {'passed' if report['passed'] else 'FAILED'}")
+        for name, result in report['candidates'].items():
+            print(f"  {name}: max difference {max(result['max_difference'].values()):.3g}, "
+                  f"{result['n_failing_rows']} failing rows")
+        report['sources'] = dict(zip(SOURCES, np.bincount(sources, minlength=len(SOURCES)).tolist()))
+        output['tiers'].append(report)
+        output['reproducers'] += shrink_report(report, inputs, engine, args.tolerance, args.max_reproducers)
+
+    for reproducer in output['reproducers']:
+        print(f"Reproducer ({reproducer['candidate']}, {reproducer['disease']}): {reproducer['inputs']} "
+              f"reference {reproducer['reference_score']:.6f} vs {reproducer['candidate_score']:.6f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+    return 0 if all(report['passed'] for report in output['tiers']) else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
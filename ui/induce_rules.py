@@ -0,0 +1,74 @@
+"""
+Rule Induction Command
+Learns candidate rules from a labeled CSV (one column per input variable and one risk-level
+column per disease; empty cells are unknown), merges them with the expert rule base and
+reports hold-out accuracy against the expert rules alone.
+
+Usage:
+    python -m ui.induce_rules records.csv --holdout 0.2 --output merged_rules.json
+"""
+
+import argparse
+import csv
+import json
+
+import numpy as np
+from knowledge.fuzzy_system import INPUT_MF_PARAMS, create_output_variables
+from knowledge.rule_induction import learn_rule_base
+from knowledge.validation import records_to_array
+
+
+def read_labeled_csv(path, input_names, diseases):
+    """
+    Read records and risk labels from a CSV file.
+
+    Args:
+        path: CSV file path
+        input_names: Input columns, in engine order
+        diseases: Label columns, in engine order
+
+    Returns:
+        tuple: (inputs of shape (N, n_inputs), labels of shape (N, n_diseases) as strings)
+    """
+    with open(path, newline='') as handle:
+        records = list(csv.DictReader(handle))
+    inputs, _ = records_to_array(records, input_names)
+    labels = np.array([[record.get(disease) or '' for disease in diseases] for record in records], dtype=str)
+    return inputs, labels.reshape(len(records), len(diseases))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Induce fuzzy rules from labeled records")
+    parser.add_argument('records', help="Labeled CSV file")
+    parser.add_argument('--holdout', type=float, default=0.2, help="Fraction of records held out")
+    parser.add_argument('--min-support', type=float, default=1.0)
+    parser.add_argument('--min-confidence', type=float, default=0.5)
+    parser.add_argument('--induced-only', action='store_true', help="Do not merge with the expert rules")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the merged rule base and accuracy to this JSON file")
+    args = parser.parse_args(argv)
+
+    output_vars = create_output_variables()
+    inputs, labels = read_labeled_csv(args.records, list(INPUT_MF_PARAMS), list(output_vars))
+    finite = np.isfinite(inputs).all(axis=1)
+    result = learn_rule_base(inputs[finite], labels[finite], INPUT_MF_PARAMS, output_vars,
+                             expert_rules=[] if args.induced_only else None, holdout=args.holdout,
+                             seed=args.seed, min_support=args.min_support, min_confidence=args.min_confidence)
+
+    summary = {
+        'records': int(finite.sum()),
+        'skipped_records': int((~finite).sum()),
+        'rules': len(result['rules']),
+        'induced': result['induced'],
+        'accuracy': result['accuracy'],
+        'expert_accuracy': result['expert_accuracy'],
+    }
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'summary': summary, 'rules': result['rules']}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,421 @@
+"""
+Local Load Testing Harness
+Drives the diagnosis endpoint of a locally running app with concurrent virtual users,
+following a ramp profile, and reports throughput, latency percentiles, error rate and
+server memory over time. Results are saved as JSON so builds can be compared.
+
+Only localhost targets are accepted.
+
+Usage:
+    python main.py &
+    python -m ui.load_test --ramp 1:10,4:20,8:30 --server-pid $! --label my-build
+    python -m ui.load_test --ramp 8:30 --compare load_tests/my-build_*.json
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import numpy as np
+from knowledge.fuzzy_system import INPUT_MF_PARAMS, universe_bounds
+
+
+DEFAULT_URL = 'http://127.0.0.1:7860'
+DEFAULT_API_NAME = 'diagnose'
+DEFAULT_API_PREFIX = '/gradio_api'
+DEFAULT_RESULTS_DIR = 'load_tests'
+DEFAULT_TIMEOUT = 30.0
+
+# Inputs in the order of the Diagnosis tab sliders (and the diagnose API)
+INPUT_ORDER = ['Temp', 'RH', 'Rain', 'LeafWet', 'SoilM', 'Drain', 'SeedHealth', 'Vector', 'Stage']
+
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '::1')
+
+PERCENTILES = (50, 95, 99)
+
+# Seconds between server RSS samples
+RSS_INTERVAL = 1.0
+
+
+def require_local(url):
+    """
+    Refuse to target anything but this machine.
+
+    Raises:
+        ValueError: If the URL host is not a loopback name or address
+    """
+    host = urllib.parse.urlsplit(url).hostname
+    if host not in LOCAL_HOSTS and not (host or '').startswith('127.'):
+        raise ValueError(f"Load tests may only target localhost, not {host!r}")
+    return url
+
+
+def parse_ramp(spec):
+    """
+    Parse a ramp profile of the form "users:seconds,users:seconds,...".
+
+    Each stage holds the given number of concurrent users for its duration;
+    a stage written "a-b:seconds" ramps linearly from a to b users.
+
+    Args:
+        spec: Ramp specification string
+
+    Returns:
+        list: Stages as (start_users, end_users, seconds) tuples
+    """
+    stages = []
+    for part in spec.split(','):
+        users, seconds = part.strip().split(':')
+        start, _, end = users.partition('-')
+        stages.append((int(start), int(end or start), float(seconds)))
+    return stages
+
+
+def users_at(stages, elapsed):
+    """Number of active users at a given time into the ramp (0 once it has finished)."""
+    for start, end, seconds in stages:
+        if elapsed < seconds:
+            return int(round(start + (end - start) * elapsed / seconds))
+        elapsed -= seconds
+    return 0
+
+
+def make_input_sampler(distribution='uniform', seed=None):
+    """
+    Build a sampler of random input vectors over the input universes (INPUT_MF_PARAMS).
+
+    Args:
+        distribution: 'uniform' over each universe, 'center' (normal around the
+                      middle, sd of 1/6 range, clipped) or 'edges' (universe bounds
+                      and triangle corners, which exercise the membership function kinks)
+        seed: Random seed
+
+    Returns:
+        callable: Function returning a list of input values in INPUT_ORDER
+    """
+    low, high = np.array([universe_bounds(INPUT_MF_PARAMS[name]) for name in INPUT_ORDER]).T
+    rng = np.random.default_rng(seed)
+    lock = threading.Lock()
+
+    if distribution == 'uniform':
+        def draw():
+            return rng.uniform(low, high)
+    elif distribution == 'center':
+        def draw():
+            return np.clip(rng.normal((low + high) / 2, (high - low) / 6), low, high)
+    elif distribution == 'edges':
+        points = []
+        for name, lo, hi in zip(INPUT_ORDER, low, high):
+            corners = {float(lo), float(hi)}
+            for params in INPUT_MF_PARAMS[name]['terms'].values():
+                corners.update(float(np.clip(p, lo, hi)) for p in params)
+            points.append(sorted(corners))
+
+        def draw():
+            return np.array([rng.choice(values) for values in points])
+    else:
+        raise ValueError(f"Unknown input distribution: {distribution}")
+
+    def sample():
+        with lock:
+            return [round(float(value), 2) for value in draw()]
+
+    return sample
+
+
+def gradio_caller(base_url, api_name=DEFAULT_API_NAME, api_prefix=DEFAULT_API_PREFIX, timeout=DEFAULT_TIMEOUT):
+    """
+    Request function for a Gradio app, using its two-step call API.
+
+    Args:
+        base_url: App URL, e.g. http://127.0.0.1:7860
+        api_name: Endpoint name given to the event listener
+        api_prefix: Gradio API path prefix
+
+    Returns:
+        callable: Function taking an input list and raising on any failure
+    """
+    endpoint = require_local(base_url).rstrip('/') + f"{api_prefix}/call/{api_name}"
+
+    def call(values):
+        request = urllib.request.Request(endpoint, data=json.dumps({'data': values}).encode(),
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            event_id = json.loads(response.read())['event_id']
+        with urllib.request.urlopen(f"{endpoint}/{event_id}", timeout=timeout) as response:
+            stream = response.read().decode()
+        if 'event: complete' not in stream:
+            raise RuntimeError(f"Request did not complete: {stream[-200:]!r}")
+
+    return call
+
+
+def json_caller(url, timeout=DEFAULT_TIMEOUT):
+    """
+    Request function for a plain local HTTP endpoint taking a JSON object of inputs.
+
+    Args:
+        url: Endpoint URL; the body is {"Temp": ..., "RH": ..., ...}
+
+    Returns:
+        callable: Function taking an input list and raising on any failure
+    """
+    require_local(url)
+
+    def call(values):
+        request = urllib.request.Request(url, data=json.dumps(dict(zip(INPUT_ORDER, values))).encode(),
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+
+    return call
+
+
+def read_rss(pid):
+    """Resident set size of a process in bytes (Linux /proc), or None if unavailable."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def run_load_test(call, stages, sample_inputs, server_pid=None, rss_interval=RSS_INTERVAL):
+    """
+    Run a ramp profile against a request function.
+
+    One thread per virtual user is started up front; user i sends requests
+    back to back (closed loop) whenever the ramp has more than i users active.
+
+    Args:
+        call: Request function taking an input list (raises on error)
+        stages: Ramp stages from parse_ramp
+        sample_inputs: Function returning an input list
+        server_pid: Optional PID of the server process to sample RSS from
+        rss_interval: Seconds between RSS samples
+
+    Returns:
+        dict: Raw samples: 'requests' (start offset, latency, ok, users) and 'rss' (offset, bytes)
+    """
+    max_users = max(max(start, end) for start, end, _ in stages)
+    duration = sum(seconds for _, _, seconds in stages)
+    records = []
+    rss = []
+    records_lock = threading.Lock()
+    started = time.perf_counter()
+    stop = threading.Event()
+
+    def user(index):
+        while not stop.is_set():
+            elapsed = time.perf_counter() - started
+            active = users_at(stages, elapsed)
+            if elapsed >= duration:
+                return
+            if index >= active:
+                time.sleep(0.05)
+                continue
+            values = sample_inputs()
+            begin = time.perf_counter()
+            try:
+                call(values)
+                ok = True
+            except (OSError, ValueError, RuntimeError, urllib.error.URLError):
+                ok = False
+            end = time.perf_counter()
+            with records_lock:
+                records.append((begin - started, end - begin, ok, active))
+
+    def sample_rss():
+        while True:
+            value = read_rss(server_pid)
+            if value is not None:
+                rss.append((time.perf_counter() - started, value))
+            if stop.wait(rss_interval):
+                return
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(max_users)]
+    if server_pid is not None:
+        threads.append(threading.Thread(target=sample_rss, daemon=True))
+    for thread in threads:
+        thread.start()
+    for thread in threads[:max_users]:
+        thread.join()
+    stop.set()
+    for thread in threads[max_users:]:
+        thread.join()
+
+    return {'duration': duration, 'requests': sorted(records), 'rss': rss}
+
+
+def summarize(raw, stages, bucket_seconds=1.0):
+    """
+    Aggregate raw samples into the report saved for comparison.
+
+    Args:
+        raw: Output of run_load_test
+        stages: Ramp stages the run used
+        bucket_seconds: Width of the throughput / latency time series buckets
+
+    Returns:
+        dict: Overall and per-stage throughput, latency percentiles (ms) and
+              error rate, plus per-bucket time series and RSS samples
+    """
+    requests = np.array([(start, latency, ok, users) for start, latency, ok, users in raw['requests']],
+                        dtype=np.float64).reshape(-1, 4)
+
+    def stats(rows, seconds):
+        ok = rows[:, 2] > 0
+        latencies = rows[ok, 1] * 1000
+        result = {
+            'requests': int(len(rows)),
+            'errors': int((~ok).sum()),
+            'error_rate': float((~ok).mean()) if len(rows) else 0.0,
+            'throughput_rps': float(ok.sum() / seconds) if seconds > 0 else 0.0,
+        }
+        for p in PERCENTILES:
+            result[f"p{p}_ms"] = float(np.percentile(latencies, p)) if len(latencies) else None
+        result['mean_ms'] = float(latencies.mean()) if len(latencies) else None
+        return result
+
+    per_stage = []
+    offset = 0.0
+    for start, end, seconds in stages:
+        in_stage = (requests[:, 0] >= offset) & (requests[:, 0] < offset + seconds)
+        per_stage.append(dict(stats(requests[in_stage], seconds), users=[start, end],
+                              start_s=offset, seconds=seconds))
+        offset += seconds
+
+    n_buckets = max(int(np.ceil(raw['duration'] / bucket_seconds)), 1)
+    bucket = np.minimum((requests[:, 0] // bucket_seconds).astype(int), n_buckets - 1)
+    timeline = []
+    for b in range(n_buckets):
+        rows = requests[bucket == b]
+        entry = stats(rows, bucket_seconds)
+        timeline.append({'t': b * bucket_seconds, 'rps': entry['throughput_rps'],
+                         'p50_ms': entry['p50_ms'], 'p99_ms': entry['p99_ms'],
+                         'errors': entry['errors'],
+                         'users': int(rows[:, 3].max()) if len(rows) else 0})
+
+    rss_bytes = [value for _, value in raw['rss']]
+    return {
+        'overall': stats(requests, raw['duration']),
+        'stages': per_stage,
+        'timeline': timeline,
+        'rss': {
+            'samples': [{'t': round(t, 3), 'bytes': value} for t, value in raw['rss']],
+            'start_bytes': rss_bytes[0] if rss_bytes else None,
+            'peak_bytes': max(rss_bytes) if rss_bytes else None,
+            'end_bytes': rss_bytes[-1] if rss_bytes else None,
+        },
+    }
+
+
+def save_report(report, directory=DEFAULT_RESULTS_DIR, label='run'):
+    """Write a report as <directory>/<label>_<timestamp>.json and return the path."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{label}_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def compare_reports(baseline, current):
+    """
+    Relative change of the headline metrics between two reports.
+
+    Args:
+        baseline: Report dict of the reference build
+        current: Report dict of the build under test
+
+    Returns:
+        dict: Metric name to (baseline, current, relative change or None)
+    """
+    metrics = {}
+    for key in ('throughput_rps', 'mean_ms', *(f"p{p}_ms" for p in PERCENTILES), 'error_rate'):
+        before, after = baseline['overall'].get(key), current['overall'].get(key)
+        change = (after - before) / before if before and after is not None else None
+        metrics[key] = (before, after, change)
+    before, after = baseline['rss']['peak_bytes'], current['rss']['peak_bytes']
+    metrics['peak_rss_bytes'] = (before, after, (after - before) / before if before and after else None)
+    return metrics
+
+
+def format_report(report, comparison=None):
+    """Readable text summary of a report (and optional comparison)."""
+    overall = report['overall']
+    lines = [f"Target: {report['target']}  ramp: {report['ramp']}  inputs: {report['distribution']}",
+             f"{'stage':<12}{'users':>8}{'req':>8}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}"]
+
+    def row(name, users, stats):
+        fmt = lambda value: f"{value:9.1f}" if value is not None else f"{'-':>9}"
+        lines.append(f"{name:<12}{users:>8}{stats['requests']:>8}{stats['throughput_rps']:9.1f}"
+                     f"{fmt(stats['p50_ms'])}{fmt(stats['p95_ms'])}{fmt(stats['p99_ms'])}"
+                     f"{stats['error_rate'] * 100:7.1f}%")
+
+    for i, stage in enumerate(report['stages']):
+        start, end = stage['users']
+        row(f"#{i + 1}", str(start) if start == end else f"{start}-{end}", stage)
+    row('overall', '', overall)
+
+    if report['rss']['peak_bytes']:
+        rss = report['rss']
+        lines.append(f"Server RSS: start {rss['start_bytes'] / 2**20:.1f} MiB, "
+                     f"peak {rss['peak_bytes'] / 2**20:.1f} MiB, end {rss['end_bytes'] / 2**20:.1f} MiB")
+
+    if comparison:
+        lines.append("Compared with baseline:")
+        for key, (before, after, change) in comparison.items():
+            if change is not None:
+                lines.append(f"  {key:<16}{before:>14.4g} -> {after:<14.4g}{change * 100:+.1f}%")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the local diagnosis app.")
+    parser.add_argument('--url', default=DEFAULT_URL, help="Gradio app URL (localhost only)")
+    parser.add_argument('--json-endpoint', help="Plain JSON endpoint URL instead of the Gradio API")
+    parser.add_argument('--api-name', default=DEFAULT_API_NAME)
+    parser.add_argument('--api-prefix', default=DEFAULT_API_PREFIX)
+    parser.add_argument('--ramp', default='1:10,4:20,8:20', help="Stages users:seconds or a-b:seconds")
+    parser.add_argument('--distribution', default='uniform', choices=['uniform', 'center', 'edges'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--server-pid', type=int, help="Server PID to sample RSS from")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT)
+    parser.add_argument('--label', default='run', help="Build label used in the result file name")
+    parser.add_argument('--output-dir', default=DEFAULT_RESULTS_DIR)
+    parser.add_argument('--compare', help="Earlier result file to compare against")
+    args = parser.parse_args(argv)
+
+    if args.json_endpoint:
+        target = args.json_endpoint
+        call = json_caller(target, timeout=args.timeout)
+    else:
+        target = f"{args.url.rstrip('/')}{args.api_prefix}/call/{args.api_name}"
+        call = gradio_caller(args.url, args.api_name, args.api_prefix, timeout=args.timeout)
+
+    stages = parse_ramp(args.ramp)
+    raw = run_load_test(call, stages, make_input_sampler(args.distribution, args.seed), args.server_pid)
+    report = dict(summarize(raw, stages), target=target, ramp=args.ramp, distribution=args.distribution,
+                  label=args.label, timestamp=time.strftime('%Y-%m-%dT%H:%M:%S'))
+
+    comparison = None
+    if args.compare:
+        with open(args.compare) as f:
+            comparison = compare_reports(json.load(f), report)
+        report['compared_with'] = args.compare
+
+    path = save_report(report, args.output_dir, args.label)
+    print(format_report(report, comparison))
+    print(f"Saved results to {path}")
+
+
+if __name__ == '__main__':
+    main()
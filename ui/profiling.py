@@ -0,0 +1,206 @@
+"""
+Per-Request Profiling Hooks
+Opt-in cProfile + tracemalloc wrapping of UI/API handlers, writing flamegraph-ready
+collapsed stacks and top-allocation reports to a local directory.
+
+Enable with the DIAGNOSIS_PROFILE environment variable:
+    unset or 0  - disabled; handlers are returned unwrapped (no overhead)
+    query       - profile only requests carrying ?profile=1
+    0 < rate <= 1 - profile that fraction of requests (and any ?profile=1 request)
+Output goes to DIAGNOSIS_PROFILE_DIR (default: profiles/).
+"""
+
+import cProfile
+import functools
+import inspect
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+
+
+DEFAULT_PROFILE_DIR = 'profiles'
+
+# Number of allocation sites listed in each allocation report
+TOP_ALLOCATIONS = 25
+
+# tracemalloc is process-wide, so profiled requests run one at a time
+_PROFILE_LOCK = threading.Lock()
+
+
+def profiling_config():
+    """
+    Read the profiling settings from the environment.
+
+    Returns:
+        dict: {'enabled': bool, 'rate': float, 'directory': str}
+    """
+    setting = os.environ.get('DIAGNOSIS_PROFILE', '').strip().lower()
+    if setting in ('', '0', 'off', 'false'):
+        rate, enabled = 0.0, False
+    elif setting == 'query':
+        rate, enabled = 0.0, True
+    else:
+        try:
+            rate = min(max(float(setting), 0.0), 1.0)
+        except ValueError:
+            rate = 1.0 if setting in ('on', 'true') else 0.0
+        enabled = True
+    return {
+        'enabled': enabled,
+        'rate': rate,
+        'directory': os.environ.get('DIAGNOSIS_PROFILE_DIR', DEFAULT_PROFILE_DIR)
+    }
+
+
+def _function_label(func_key):
+    """Readable frame label for a pstats function key (file, line, name)."""
+    filename, line, name = func_key
+    if filename == '~':
+        return name.strip('<>').replace(';', ',')
+    return f"{name} ({os.path.basename(filename)}:{line})".replace(';', ',')
+
+
+def stats_to_collapsed(stats):
+    """
+    Convert cProfile statistics to collapsed-stack (flamegraph) lines.
+
+    cProfile records caller/callee pairs rather than full stacks, so stacks
+    are rebuilt from the roots down, splitting each function's time among its
+    callers in proportion to the cumulative time each caller accounted for.
+
+    Args:
+        stats: pstats.Stats object
+
+    Returns:
+        list: Lines of the form "root;child;leaf <microseconds>"
+    """
+    raw = stats.stats
+    callees = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller in callers:
+            callees.setdefault(caller, []).append(func)
+
+    roots = [func for func, (_, _, _, _, callers) in raw.items() if not callers]
+    folded = {}
+
+    def walk(func, path, budget):
+        _, _, self_time, cumulative, _ = raw[func]
+        if cumulative <= 0 or budget <= 0:
+            return
+        share = budget / cumulative
+        stack = path + (_function_label(func),)
+        folded[stack] = folded.get(stack, 0.0) + self_time * share
+        for callee in callees.get(func, []):
+            if _function_label(callee) in stack:
+                continue  # Recursion: already attributed on this path
+            walk(callee, stack, raw[callee][4][func][3] * share)
+
+    for root in roots:
+        walk(root, (), raw[root][3])
+
+    return [f"{';'.join(stack)} {int(round(seconds * 1e6))}"
+            for stack, seconds in sorted(folded.items()) if seconds * 1e6 >= 1]
+
+
+def _allocation_report(snapshot, limit=TOP_ALLOCATIONS):
+    """Text report of the largest allocation sites in a tracemalloc snapshot."""
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, cProfile.__file__),
+    ])
+    top = snapshot.statistics('lineno')
+    total = sum(stat.size for stat in top)
+    lines = [f"Top {min(limit, len(top))} allocation sites ({total / 1024:.1f} KiB live at end of request)", ""]
+    for rank, stat in enumerate(top[:limit], 1):
+        frame = stat.traceback[0]
+        lines.append(f"{rank:3d}. {frame.filename}:{frame.lineno}: "
+                     f"{stat.size / 1024:.1f} KiB in {stat.count} blocks")
+    return "\n".join(lines) + "\n"
+
+
+def _should_profile(config, request):
+    """Decide whether this request is profiled (query flag or sampling)."""
+    if request is not None:
+        query = getattr(request, 'query_params', None) or {}
+        if str(query.get('profile', '')).lower() in ('1', 'true', 'yes'):
+            return True
+    return config['rate'] > 0 and random.random() < config['rate']
+
+
+def run_profiled(name, func, args, kwargs, directory):
+    """
+    Run func under cProfile and tracemalloc and write the reports.
+
+    Writes <directory>/<timestamp>_<name>_<pid>.prof (pstats dump),
+    .collapsed (flamegraph input) and .alloc.txt (top allocations).
+
+    Returns:
+        The return value of func
+    """
+    with _PROFILE_LOCK:
+        return _run_profiled_locked(name, func, args, kwargs, directory)
+
+
+def _run_profiled_locked(name, func, args, kwargs, directory):
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}_{int(time.time() * 1000) % 1000:03d}"
+                                   f"_{name}_{os.getpid()}")
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    profiler = cProfile.Profile()
+    try:
+        result = profiler.runcall(func, *args, **kwargs)
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        if started_tracing:
+            tracemalloc.stop()
+
+        profiler.dump_stats(base + '.prof')
+        stats = pstats.Stats(profiler)
+        with open(base + '.collapsed', 'w') as f:
+            f.write("\n".join(stats_to_collapsed(stats)) + "\n")
+        with open(base + '.alloc.txt', 'w') as f:
+            f.write(_allocation_report(snapshot))
+
+    return result
+
+
+def profiled(func=None, *, name=None):
+    """
+    Decorator making a handler profilable per request.
+
+    When profiling is disabled in the environment at import time the
+    handler itself is returned, so the disabled path costs nothing. The
+    handler's `request` argument (gr.Request), if any, is inspected for the
+    ?profile=1 query flag.
+
+    Args:
+        func: Handler to wrap
+        name: Label used in output file names (defaults to the function name)
+    """
+    if func is None:
+        return lambda f: profiled(f, name=name)
+
+    config = profiling_config()
+    if not config['enabled']:
+        return func
+
+    label = name or func.__name__
+    parameters = list(inspect.signature(func).parameters)
+    request_index = parameters.index('request') if 'request' in parameters else None
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        request = kwargs.get('request')
+        if request is None and request_index is not None and len(args) > request_index:
+            request = args[request_index]
+        if _should_profile(config, request):
+            return run_profiled(label, func, args, kwargs, config['directory'])
+        return func(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,139 @@
+"""
+Memory Soak Test
+Feeds a long stream of distinct inputs through the managed skfuzzy simulation and samples
+the process RSS and simulation state along the way, to show memory stays flat over time.
+
+Usage:
+    python -m ui.soak_test --inputs 1000000 --sample-every 10000 --output soak.json
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+from knowledge.fuzzy_system import (
+    INPUT_MF_PARAMS, create_input_variables, create_output_variables, create_fuzzy_rules,
+    create_control_systems, universe_bounds,
+)
+from knowledge.simulation_manager import (
+    DEFAULT_FLUSH_AFTER_RUN, ManagedSimulation, process_rss, simulation_state_size,
+)
+
+
+# RSS growth between the early and the late part of the run that still counts as flat
+DEFAULT_TOLERANCE_MB = 16.0
+
+
+def build_simulation(cache, flush_after_run):
+    """Unified simulation on fresh variables and rules, as main.py builds it."""
+    input_vars = create_input_variables()
+    output_vars = create_output_variables()
+    rules = create_fuzzy_rules(input_vars, output_vars)
+    return create_control_systems(input_vars, output_vars, rules, cache=cache, flush_after_run=flush_after_run)
+
+
+def run_soak(manager, n_inputs, sample_every=1000, seed=0, progress=None):
+    """
+    Compute n_inputs distinct random inputs and sample memory every sample_every of them.
+
+    Args:
+        manager: ManagedSimulation
+        n_inputs: Number of inputs to compute
+        sample_every: Inputs between samples
+        seed: Random seed
+        progress: Optional callback taking each sample dict
+
+    Returns:
+        list: Samples {'inputs', 'elapsed_s', 'rss_mb', 'state_entries', 'flushes', 'recycles'}
+    """
+    rng = np.random.default_rng(seed)
+    names = list(INPUT_MF_PARAMS)
+    low, high = np.array([universe_bounds(INPUT_MF_PARAMS[name]) for name in names]).T
+    samples = []
+    started = time.perf_counter()
+
+    for done in range(1, n_inputs + 1):
+        values = rng.uniform(low, high)
+        with manager.acquire() as simulation:
+            for name, value in zip(names, values):
+                simulation.input[name] = value
+            simulation.compute()
+
+        if done % sample_every == 0 or done == n_inputs:
+            rss = process_rss()
+            with manager.acquire() as simulation:
+                state_entries = simulation_state_size(simulation)
+            sample = {
+                'inputs': done,
+                'elapsed_s': time.perf_counter() - started,
+                'rss_mb': rss / (1024 * 1024) if rss is not None else None,
+                'state_entries': state_entries,
+                'flushes': manager.flushes,
+                'recycles': manager.recycles,
+            }
+            samples.append(sample)
+            if progress is not None:
+                progress(sample)
+    return samples
+
+
+def summarize_soak(samples, tolerance_mb=DEFAULT_TOLERANCE_MB):
+    """
+    Compare memory early and late in a soak run.
+
+    RSS is compared between the second quarter (after warm-up) and the last
+    quarter of the samples, using medians so single allocator spikes do not count.
+
+    Args:
+        samples: Samples from run_soak
+        tolerance_mb: Allowed RSS growth
+
+    Returns:
+        dict: inputs, rss_growth_mb, max_state_entries, flushes, recycles, flat
+    """
+    rss = np.array([s['rss_mb'] for s in samples if s['rss_mb'] is not None], dtype=np.float64)
+    quarter = max(len(rss) // 4, 1)
+    early = rss[quarter:2 * quarter] if len(rss) >= 4 else rss[:1]
+    growth = float(np.median(rss[-quarter:]) - np.median(early)) if len(rss) else None
+    return {
+        'inputs': samples[-1]['inputs'] if samples else 0,
+        'rss_growth_mb': growth,
+        'max_state_entries': max((s['state_entries'] for s in samples), default=0),
+        'flushes': samples[-1]['flushes'] if samples else 0,
+        'recycles': samples[-1]['recycles'] if samples else 0,
+        'flat': growth is None or growth <= tolerance_mb,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory soak test of the managed fuzzy simulation")
+    parser.add_argument('--inputs', type=int, default=1_000_000, help="Number of distinct inputs")
+    parser.add_argument('--sample-every', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-cache', action='store_true', help="Disable skfuzzy result caching")
+    parser.add_argument('--flush-after-run', type=int, default=DEFAULT_FLUSH_AFTER_RUN)
+    parser.add_argument('--flush-seconds', type=float, help="Time-based flush interval")
+    parser.add_argument('--rss-budget-mb', type=float, help="Recycle the simulation above this RSS")
+    parser.add_argument('--tolerance-mb', type=float, default=DEFAULT_TOLERANCE_MB)
+    parser.add_argument('--output', help="Write samples and summary to this JSON file")
+    args = parser.parse_args(argv)
+
+    manager = ManagedSimulation(build_simulation, cache=not args.no_cache, flush_after_run=args.flush_after_run,
+                                flush_interval=args.flush_seconds, rss_budget_mb=args.rss_budget_mb)
+
+    def progress(sample):
+        print(f"{sample['inputs']:>10} inputs  {sample['elapsed_s']:8.0f} s  RSS {sample['rss_mb']:.1f} MB  "
+              f"state {sample['state_entries']}  flushes {sample['flushes']}  recycles {sample['recycles']}")
+
+    samples = run_soak(manager, args.inputs, args.sample_every, args.seed, progress)
+    summary = summarize_soak(samples, args.tolerance_mb)
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'summary': summary, 'samples': samples}, f, indent=2)
+    return 0 if summary['flat'] else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -3,10 +3,15 @@ Visualization Module for Fuzzy Membership Functions
 Creates matplotlib plots for all input and output membership functions.
 """
 
+import functools
+import json
+
 import numpy as np
 import matplotlib.pyplot as plt
 import skfuzzy as fuzz
 from matplotlib.figure import Figure
+from matplotlib.colors import ListedColormap, BoundaryNorm
+from knowledge.fuzzy_system import create_input_variable
 
 
 # Custom color scheme: ff4b3e, 81c14b, 573d1c, 454545, 000000
@@ -18,13 +23,50 @@ COLORS = {
     'black': '#000000'
 }
 
+# Display labels for the 9 input variables
+INPUT_LABELS = {
+    'Temp': 'Temperature (°C)',
+    'RH': 'Relative Humidity (%)',
+    'Rain': 'Rainfall (mm)',
+    'LeafWet': 'Leaf Wetness Duration (hours)',
+    'SoilM': 'Soil Moisture (%)',
+    'Drain': 'Soil Drainage (0-10)',
+    'SeedHealth': 'Seed Health (0-10)',
+    'Vector': 'Vector Pressure (0-10)',
+    'Stage': 'Crop Stage (0-3)'
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _sample_input_variable(var_name, spec_json):
+    return create_input_variable(var_name, json.loads(spec_json))
+
+
+def sampled_input_variable(var_name, var):
+    """
+    Sampled variable for plotting.
+
+    Inference works on trimf parameters only, so parameter dicts (INPUT_MF_PARAMS
+    format) are sampled into an Antecedent here, on first use, and reused.
+
+    Args:
+        var_name: Name of the variable
+        var: skfuzzy Antecedent object or parameter dict
+
+    Returns:
+        skfuzzy Antecedent object
+    """
+    if isinstance(var, dict):
+        return _sample_input_variable(var_name, json.dumps(var, sort_keys=True))
+    return var
+
 
 def plot_input_membership_functions(input_vars):
     """
     Create comprehensive plots for all 9 input membership functions.
     
     Args:
-        input_vars: Dictionary of skfuzzy Antecedent objects
+        input_vars: Dictionary of skfuzzy Antecedent objects or INPUT_MF_PARAMS style dicts
     
     Returns:
         matplotlib.figure.Figure: Figure with all subplots
@@ -32,21 +74,11 @@ def plot_input_membership_functions(input_vars):
     fig = plt.figure(figsize=(16, 12))
     fig.suptitle('Input Variable Membership Functions', fontsize=16, fontweight='bold')
     
-    var_configs = [
-        ('Temp', 'Temperature (°C)', 1),
-        ('RH', 'Relative Humidity (%)', 2),
-        ('Rain', 'Rainfall (mm)', 3),
-        ('LeafWet', 'Leaf Wetness Duration (hours)', 4),
-        ('SoilM', 'Soil Moisture (%)', 5),
-        ('Drain', 'Soil Drainage (0-10)', 6),
-        ('SeedHealth', 'Seed Health (0-10)', 7),
-        ('Vector', 'Vector Pressure (0-10)', 8),
-        ('Stage', 'Crop Stage (0-3)', 9)
-    ]
+    var_configs = [(name, label, pos) for pos, (name, label) in enumerate(INPUT_LABELS.items(), 1)]
     
     for var_name, label, pos in var_configs:
         ax = fig.add_subplot(3, 3, pos)
-        var = input_vars[var_name]
+        var = sampled_input_variable(var_name, input_vars[var_name])
         
         # Plot each membership function
         colors_list = [COLORS['green'], COLORS['black'], COLORS['red']]
@@ -112,11 +144,12 @@ def plot_single_input_variable(var_name, var_obj):
     
     Args:
         var_name: Name of the variable
-        var_obj: skfuzzy Antecedent object
+        var_obj: skfuzzy Antecedent object or INPUT_MF_PARAMS style dict
     
     Returns:
         matplotlib.figure.Figure: Figure for single variable
     """
+    var_obj = sampled_input_variable(var_name, var_obj)
     fig, ax = plt.subplots(figsize=(8, 5))
     
     colors_list = [COLORS['green'], COLORS['brown'], COLORS['red']]
@@ -187,6 +220,47 @@ def plot_disease_comparison(disease_results):
     return fig
 
 
+def plot_risk_heatmap(risk_grid, x_var, x_values, y_var, y_values, disease, current_point=None):
+    """
+    Create a what-if heatmap of one disease's risk over two input variables.
+    Cells are colored by risk level using the same thresholds as the comparison chart.
+    
+    Args:
+        risk_grid: 2D array of risk scores, shape (len(y_values), len(x_values))
+        x_var: Name of the input on the x axis
+        x_values: 1D array of x axis values
+        y_var: Name of the input on the y axis
+        y_values: 1D array of y axis values
+        disease: Disease name (for the title)
+        current_point: Optional (x, y) of the current slider values to mark
+    
+    Returns:
+        matplotlib.figure.Figure: Heatmap figure
+    """
+    fig, ax = plt.subplots(figsize=(10, 7))
+    
+    # Risk zones: Low < 0.4 <= Moderate < 0.6 <= High
+    cmap = ListedColormap([COLORS['green'], COLORS['black'], COLORS['red']])
+    norm = BoundaryNorm([0, 0.4, 0.6, 1.0], cmap.N)
+    
+    mesh = ax.pcolormesh(x_values, y_values, risk_grid, cmap=cmap, norm=norm, shading='auto')
+    
+    if current_point is not None:
+        ax.plot(*current_point, marker='X', markersize=14, color='white',
+                markeredgecolor=COLORS['brown'], markeredgewidth=2, label='Current inputs')
+        ax.legend(loc='upper right')
+    
+    cbar = fig.colorbar(mesh, ax=ax, ticks=[0.2, 0.5, 0.8])
+    cbar.ax.set_yticklabels(['Low', 'Moderate', 'High'])
+    
+    ax.set_xlabel(INPUT_LABELS.get(x_var, x_var), fontsize=12, fontweight='bold')
+    ax.set_ylabel(INPUT_LABELS.get(y_var, y_var), fontsize=12, fontweight='bold')
+    ax.set_title(f'{disease} Risk: {x_var} × {y_var}', fontsize=14, fontweight='bold')
+    
+    plt.tight_layout()
+    return fig
+
+
 def create_membership_summary_table():
     """
     Create a text summary of all membership function parameters.